@@ -0,0 +1,76 @@
+"""
+Compare diagonal matrix and broadcast scaling in Portfolio.backtest_portfolio
+
+Backtests a buy and hold portfolio over 20 years of daily prices for a
+growing number of funds, with the previous n x n diagonal matrix product
+as reference.
+
+Usage:
+    python -m benchmarks.backtest_portfolio
+"""
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.modules.portfolio import Portfolio
+
+
+def diagonal_backtest(
+    codes: list, amounts: list, timeseries: pd.DataFrame
+) -> pd.DataFrame:
+    """Previous implementation, scaling columns with a diagonal matrix"""
+    n_funds = len(codes)
+    fund_diagonal = np.zeros((n_funds, n_funds))
+    np.fill_diagonal(fund_diagonal, amounts)
+    result = timeseries[codes].dot(fund_diagonal)
+    result.columns = codes
+    result["portfolio"] = result.sum(axis=1)
+    result["date"] = timeseries["date"]
+    return result
+
+
+def best_of(function, repeat: int = 5) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main() -> None:
+    dates = pd.date_range("2003-01-01", "2022-12-31")
+    rng = np.random.default_rng(0)
+    for n_funds in (10, 50, 100, 250, 500, 1000):
+        codes = [f"F{i:08d}" for i in range(n_funds)]
+        timeseries = pd.DataFrame(
+            np.exp(np.cumsum(rng.normal(0, 0.01, (len(dates), n_funds)), 0)),
+            columns=codes,
+        )
+        timeseries["date"] = dates
+        amounts = list(rng.uniform(100, 1000, n_funds))
+        portfolio = Portfolio(
+            codes=codes,
+            amounts=amounts,
+            start_date="2003-01-01",
+            end_date="2022-12-31",
+            timeseries=timeseries,
+            rebalance=False,
+        )
+        diagonal = best_of(
+            lambda: diagonal_backtest(codes, amounts, timeseries)
+        )
+        broadcast = best_of(
+            lambda: portfolio.backtest_portfolio(amounts, timeseries)
+        )
+        print(
+            f"funds={n_funds:>5d} "
+            f"diagonal={diagonal * 1000:9.2f}ms "
+            f"broadcast={broadcast * 1000:9.2f}ms "
+            f"speedup={diagonal / broadcast:6.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Compare per-portfolio metrics with the cross-sectional metrics kernel
+
+Computes the metrics of a growing number of portfolios over 20 years of
+daily index levels against one market series, one DataFrame at a time as
+reference for Metrics.batch_metrics. The risk free rate is synthetic, so
+the benchmark runs without the market data bucket.
+
+Usage:
+    python -m benchmarks.batch_metrics
+"""
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.modules.market_data import RiskFreeRate
+from src.modules.metrics import Metrics
+
+
+def best_of(function, repeat: int = 3) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main() -> None:
+    dates = pd.date_range("2003-01-01", "2022-12-31")
+    rng = np.random.default_rng(0)
+    market = np.cumprod(1 + rng.normal(0.0003, 0.01, len(dates)))
+    business_days = pd.bdate_range(dates[0], dates[-1])
+    risk_free = RiskFreeRate(
+        business_days.to_numpy(), np.full(len(business_days), 0.0001)
+    )
+    for n_portfolios in (1, 10, 100, 500):
+        portfolios = np.cumprod(
+            1 + rng.normal(0.0003, 0.01, (len(dates), n_portfolios)), axis=0
+        )
+
+        def single():
+            for j in range(n_portfolios):
+                projection = pd.DataFrame(
+                    {
+                        "date": dates,
+                        "portfolio": portfolios[:, j],
+                        "market": market,
+                    }
+                )
+                Metrics(risk_free=risk_free).metrics(projection)["metrics"]
+
+        single_time = best_of(single)
+        batch_time = best_of(
+            lambda: Metrics(risk_free=risk_free).batch_metrics(
+                portfolios, market, dates.to_numpy()
+            )
+        )
+        print(
+            f"portfolios={n_portfolios:>4d} "
+            f"single={single_time * 1000:9.2f}ms "
+            f"batch={batch_time * 1000:9.2f}ms "
+            f"speedup={single_time / batch_time:6.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
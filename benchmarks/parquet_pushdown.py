@@ -0,0 +1,115 @@
+"""
+Compare full parquet reads against column / date pushdown reads
+
+Writes a synthetic fund price panel to a temporary directory and loads a
+two ticker, one year window through DataLoader with and without pushdown,
+reporting bytes read from disk and wall time for each.
+
+Usage:
+    python -m benchmarks.parquet_pushdown
+"""
+import tempfile
+import time
+from pathlib import Path
+
+import fsspec
+import numpy as np
+import pandas as pd
+from fsspec.implementations.local import LocalFileSystem
+
+from src.modules.data_loader import DataLoader, config
+
+
+class CountingFileSystem(LocalFileSystem):
+    """Local filesystem that counts bytes read through its file handles"""
+
+    protocol = "counting"
+    bytes_read = 0
+
+    def _open(self, path, mode="rb", **kwargs):
+        handle = super()._open(self._strip_protocol(path), mode, **kwargs)
+        original_read = handle.read
+
+        def read(*args, **kwargs):
+            data = original_read(*args, **kwargs)
+            CountingFileSystem.bytes_read += len(data)
+            return data
+
+        handle.read = read
+        return handle
+
+    @classmethod
+    def _strip_protocol(cls, path):
+        if isinstance(path, str) and path.startswith("counting://"):
+            path = path[len("counting://") :]
+        return super()._strip_protocol(path)
+
+
+def write_panel(
+    directory: Path, n_funds: int = 500, n_years: int = 20
+) -> None:
+    """
+    Write synthetic fund prices in the same layout as the market bucket
+
+    Args:
+        directory (Path): Directory to write to
+        n_funds (int): Number of tickers
+        n_years (int): Number of years of daily prices
+    """
+    dates = pd.bdate_range(end="2022-12-30", periods=n_years * 261)
+    rng = np.random.default_rng(0)
+    returns = rng.normal(0.0003, 0.01, (len(dates), n_funds))
+    prices = pd.DataFrame(
+        100 * np.exp(np.cumsum(returns, axis=0)),
+        columns=[f"F{i:08d}" for i in range(n_funds)],
+    )
+    prices.insert(0, "date", dates.strftime("%Y-%m-%d"))
+    path = directory / config["fund_prices"]
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # One row group per year so date filters can skip them
+    prices.to_parquet(path, index=False, row_group_size=261)
+
+
+def run(loader: DataLoader, repeat: int = 3) -> dict:
+    """
+    Time a two ticker, one year window load
+
+    Args:
+        loader (DataLoader): Loader to benchmark
+        repeat (int): Number of runs
+
+    Returns:
+        dict: Bytes read and best wall time
+    """
+    columns = ["F00000001", "F00000002"]
+    timings = []
+    for _ in range(repeat):
+        CountingFileSystem.bytes_read = 0
+        start = time.perf_counter()
+        if loader.pushdown:
+            loader.read_window(
+                "fund_prices", columns, "2021-01-01", "2021-12-31"
+            )
+        else:
+            data = loader.read_dataset("fund_prices")
+            data.loc["2021-01-01":"2021-12-31", columns]
+        timings.append(time.perf_counter() - start)
+    return {"bytes": CountingFileSystem.bytes_read, "seconds": min(timings)}
+
+
+def main() -> None:
+    fsspec.register_implementation("counting", CountingFileSystem, True)
+    with tempfile.TemporaryDirectory() as directory:
+        write_panel(Path(directory))
+        base_path = f"counting://{directory}/"
+        for pushdown in (False, True):
+            result = run(DataLoader(base_path=base_path, pushdown=pushdown))
+            print(
+                f"pushdown={pushdown!s:<5} "
+                f"bytes_read={result['bytes']:>12,d} "
+                f"seconds={result['seconds']:.4f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+import hashlib
+import inspect
+import os
+from collections import OrderedDict
+from functools import wraps
+from threading import RLock
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+import orjson
+from fastapi import Header, Request
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel
+
+from src.modules.data_loader import DataLoader
+
+config = {
+    "max_entries": int(os.environ.get("AURORA_CACHE_MAX_ENTRIES", 1024)),
+    "max_bytes": int(os.environ.get("AURORA_CACHE_MAX_BYTES", 128 * 2**20)),
+}
+
+
+class ResponseCache:
+    """
+    Rendered responses by content hash, least recently used dropped first
+
+    Entries are evicted once there are more than max_entries of them or
+    their bodies add up to more than max_bytes.
+
+    Args:
+        max_entries (int): Most responses kept
+        max_bytes (int): Most body bytes kept, 0 disables the cache
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.lock = RLock()
+        self.size = 0
+        self._entries: "OrderedDict[str, Tuple[bytes, str]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[Tuple[bytes, str]]:
+        """
+        Body and media type stored under key, marked as recently used
+
+        Args:
+            key (str): Content hash
+
+        Returns:
+            Optional[Tuple[bytes, str]]: Stored response, None if missing
+        """
+        with self.lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: str, body: bytes, media_type: str) -> None:
+        """
+        Store a response body, evicting old entries to stay within limits
+
+        Args:
+            key (str): Content hash
+            body (bytes): Rendered body
+            media_type (str): Media type of the body
+        """
+        if len(body) > self.max_bytes:
+            return
+        with self.lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous[0])
+            self._entries[key] = (body, media_type)
+            self.size += len(body)
+            while (
+                len(self._entries) > self.max_entries
+                or self.size > self.max_bytes
+            ):
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self) -> None:
+        """Drop every stored response"""
+        with self.lock:
+            self._entries.clear()
+            self.size = 0
+
+
+response_cache = ResponseCache(config["max_entries"], config["max_bytes"])
+
+
+def content_key(
+    path: str, arguments: Dict[str, Any], data_version: Dict[str, List[str]]
+) -> str:
+    """
+    Hash of an endpoint call and the version of the market data it reads
+
+    Args:
+        path (str): Endpoint path
+        arguments (Dict[str, Any]): Validated arguments of the endpoint
+        data_version (Dict[str, List[str]]): Storage versions of the
+            datasets read, see DataLoader.data_version
+
+    Returns:
+        str: Hex digest
+    """
+    canonical = {
+        "path": path,
+        "data_version": data_version,
+        "arguments": {
+            name: value.dict() if isinstance(value, BaseModel) else value
+            for name, value in arguments.items()
+        },
+    }
+    encoded = orjson.dumps(
+        canonical,
+        option=orjson.OPT_SORT_KEYS
+        | orjson.OPT_NON_STR_KEYS
+        | orjson.OPT_SERIALIZE_NUMPY,
+    )
+    return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+
+def matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Check whether an If-None-Match header lists an entity tag
+
+    Args:
+        if_none_match (Optional[str]): If-None-Match header of the request
+        etag (str): Quoted entity tag
+
+    Returns:
+        bool: True if the client copy is current
+    """
+    if if_none_match is None:
+        return False
+    tags = [i.strip().removeprefix("W/") for i in if_none_match.split(",")]
+    return etag in tags or "*" in tags
+
+
+def cached(
+    datasets: Union[List[str], Callable[..., List[str]]]
+) -> Callable[[Callable], Callable]:
+    """
+    Serve an endpoint from the response cache, with ETag validation
+
+    The endpoint must be a pure function of its validated arguments and
+    the market datasets it reads. Its response is keyed by a hash of the
+    path, the arguments and the storage versions of those datasets, which
+    is also its ETag, so a matching If-None-Match is answered 304 without
+    running the endpoint. Loading other datasets does not change the key.
+    Streamed responses are passed through uncached.
+
+    Args:
+        datasets (Union[List[str], Callable[..., List[str]]]): Dataset
+            names in config read by the endpoint, or a function of its
+            arguments returning them
+
+    Returns:
+        Callable[[Callable], Callable]: Decorator adding the request and
+            If-None-Match header to the endpoint parameters
+    """
+
+    def decorator(function: Callable) -> Callable:
+        signature = inspect.signature(function)
+
+        def key(path: str, arguments: Dict[str, Any]) -> str:
+            names = datasets(**arguments) if callable(datasets) else datasets
+            return content_key(
+                path, arguments, DataLoader().data_version(names)
+            )
+
+        @wraps(function)
+        def wrapper(
+            *args,
+            cache_request: Request,
+            if_none_match: Optional[str] = None,
+            **kwargs,
+        ):
+            arguments = signature.bind(*args, **kwargs).arguments
+            path = cache_request.url.path
+            etag = f'"{key(path, arguments)}"'
+            if matches(if_none_match, etag):
+                return Response(status_code=304, headers={"ETag": etag})
+            entry = response_cache.get(etag)
+            if entry is not None:
+                body, media_type = entry
+                return Response(
+                    body, media_type=media_type, headers={"ETag": etag}
+                )
+            response = function(*args, **kwargs)
+            if isinstance(response, StreamingResponse) or not isinstance(
+                response, Response
+            ):
+                return response
+            # Datasets loaded by this call are now part of the version
+            etag = f'"{key(path, arguments)}"'
+            response_cache.put(etag, response.body, response.media_type)
+            response.headers["ETag"] = etag
+            return response
+
+        wrapper.__signature__ = signature.replace(
+            parameters=list(signature.parameters.values())
+            + [
+                inspect.Parameter(
+                    "cache_request",
+                    inspect.Parameter.KEYWORD_ONLY,
+                    annotation=Request,
+                ),
+                inspect.Parameter(
+                    "if_none_match",
+                    inspect.Parameter.KEYWORD_ONLY,
+                    default=Header(None),
+                    annotation=Optional[str],
+                ),
+            ]
+        )
+        return wrapper
+
+    return decorator
@@ -1,28 +1,40 @@
-import json
-from typing import Dict
+from typing import Dict, Optional
 
-from fastapi import APIRouter
+import numpy as np
+import pandas as pd
+from fastapi import APIRouter, Header
+from fastapi.responses import StreamingResponse
 
 from src import schemas
+from src.api.cache import cached
+from src.api.responses import (
+    ARROW_STREAM_MEDIA_TYPE,
+    NDJSON_MEDIA_TYPE,
+    ArrowResponse,
+    Orient,
+    ORJSONResponse,
+    accepts,
+    arrow_table,
+    ndjson_stream,
+)
 from src.modules.data_loader import DataLoader
 from src.modules.metrics import Metrics
-from src.modules.portfolio import Portfolio
+from src.modules.portfolio import Portfolio, PortfolioBatch
 
 router = APIRouter()
 
 
-@router.post("/", tags=["Backtest Portfolio"])
-def backtest_portfolio(item: schemas.portfolio) -> Dict:
+def project_portfolio(request: Dict) -> pd.DataFrame:
     """
-    Backtest portfolio
+    Backtest one allocation and join the market index
 
     Args:
-        item (schemas.portfolio): Input request for backtesting
+        request (Dict): Backtest request with dates, portfolio and strategy
 
     Returns:
-        Dict: Backtested portfolio
+        pd.DataFrame: Fund, portfolio and market values by date
     """
-    portfolio = item.dict()["portfolio"]
+    portfolio = request["portfolio"]
     fund_codes = []
     fund_amount = []
     for i in portfolio:
@@ -30,27 +42,191 @@ def backtest_portfolio(item: schemas.portfolio) -> Dict:
         fund_amount.append(i["amount"])
     historical_data = DataLoader().load_historical_index(
         fund_codes,
-        item.dict()["start_date"],
-        item.dict()["end_date"],
+        request["start_date"],
+        request["end_date"],
     )
     projection = Portfolio(
         codes=fund_codes,
         amounts=fund_amount,
-        start_date=item.dict()["start_date"],
-        end_date=item.dict()["end_date"],
+        start_date=request["start_date"],
+        end_date=request["end_date"],
         timeseries=historical_data,
-        rebalance=item.dict()["strategy"]["rebalance"],
-        rebalance_frequency=item.dict()["strategy"]["rebalance_frequency"],
+        rebalance=request["strategy"]["rebalance"],
+        rebalance_frequency=request["strategy"]["rebalance_frequency"],
     ).backtest_strategy()
     sp500 = DataLoader().load_benchmark(
-        item.dict()["start_date"], item.dict()["end_date"]
+        request["start_date"], request["end_date"]
     )
     projection = projection.merge(
         sp500[["date", "market"]], how="left", on="date"
     )
+    return projection
+
+
+def period_return_frame(
+    projection: pd.DataFrame, metrics: Dict
+) -> pd.DataFrame:
+    """
+    Projection with the monthly and annual returns as extra columns
+
+    Period returns are set on the last date of each period and left empty
+    on other dates. The daily drawdown is already a projection column.
+
+    Args:
+        projection (pd.DataFrame): Backtested portfolio
+        metrics (Dict): Output of Metrics.metrics for the projection
+
+    Returns:
+        pd.DataFrame: Projection with {period}_{portfolio|market}_returns
+            columns
+    """
+    frame = projection
+    for period in ["monthly", "annual"]:
+        returns = metrics[period]["return"][
+            ["date", "portfolio_returns", "market_returns"]
+        ].rename(
+            columns={
+                "portfolio_returns": f"{period}_portfolio_returns",
+                "market_returns": f"{period}_market_returns",
+            }
+        )
+        frame = frame.merge(returns, how="left", on="date")
+    return frame
+
+
+@router.post("/", tags=["Backtest Portfolio"], response_class=ORJSONResponse)
+@cached(["fund_prices", "sp500", "ff_daily"])
+def backtest_portfolio(
+    item: schemas.portfolio,
+    orient: Orient = Orient.records,
+    accept: Optional[str] = Header(None),
+) -> Dict:
+    """
+    Backtest portfolio
+
+    With "Accept: application/x-ndjson" the projection is streamed as one
+    JSON object per date, followed by a final line holding the metrics.
+    With "Accept: application/vnd.apache.arrow.stream" the projection is
+    sent as Arrow record batches with the monthly and annual returns as
+    extra columns, only the scalar metrics are kept as JSON in the schema
+    metadata under "metrics".
+
+    Args:
+        item (schemas.portfolio): Input request for backtesting
+        orient (Orient): Timeseries as lists of records or of columns
+        accept (Optional[str]): Accept header
+
+    Returns:
+        Dict: Backtested portfolio
+    """
+    projection = project_portfolio(item.dict())
     metrics = Metrics().metrics(projection)
-    projection["date"] = projection["date"].dt.strftime("%Y-%m-%d")
+    if accepts(accept, NDJSON_MEDIA_TYPE):
+        columns = {i: projection[i].to_numpy() for i in projection.columns}
+        return StreamingResponse(
+            ndjson_stream(columns, trailer={"metrics": metrics}),
+            media_type=NDJSON_MEDIA_TYPE,
+        )
+    if accepts(accept, ARROW_STREAM_MEDIA_TYPE):
+        return ArrowResponse(
+            arrow_table(
+                period_return_frame(projection, metrics),
+                {"metrics": metrics["metrics"]},
+            )
+        )
     result = {}
-    result["projection"] = json.loads(projection.to_json(orient="records"))
+    result["projection"] = projection
     result["metrics"] = metrics
-    return result
+    return ORJSONResponse(result, orient=orient)
+
+
+@router.post(
+    "/batch", tags=["Backtest Portfolio"], response_class=ORJSONResponse
+)
+@cached(["fund_prices", "sp500", "ff_daily"])
+def backtest_portfolio_batch(
+    item: schemas.portfolio_batch, orient: Orient = Orient.records
+) -> Dict:
+    """
+    Backtest many allocations over the same dates and strategy
+
+    Args:
+        item (schemas.portfolio_batch): Input request for batch backtesting
+        orient (Orient): Timeseries as lists of records or of columns
+
+    Returns:
+        Dict: Each metric as one array over the allocations, and metrics,
+            timeseries and projection (if requested) of each allocation
+    """
+    request = item.dict()
+    fund_codes = []
+    for portfolio in request["portfolios"]:
+        for i in portfolio:
+            if i["fund"] not in fund_codes:
+                fund_codes.append(i["fund"])
+    fund_amounts = np.zeros((len(request["portfolios"]), len(fund_codes)))
+    for j, portfolio in enumerate(request["portfolios"]):
+        for i in portfolio:
+            fund_amounts[j, fund_codes.index(i["fund"])] += i["amount"]
+    historical_data = DataLoader().load_historical_index(
+        fund_codes,
+        request["start_date"],
+        request["end_date"],
+    )
+    projections = PortfolioBatch(
+        codes=fund_codes,
+        amounts=fund_amounts.tolist(),
+        start_date=request["start_date"],
+        end_date=request["end_date"],
+        timeseries=historical_data,
+        rebalance=request["strategy"]["rebalance"],
+        rebalance_frequency=request["strategy"]["rebalance_frequency"],
+    ).backtest_portfolios()
+    sp500 = DataLoader().load_benchmark(
+        request["start_date"], request["end_date"]
+    )
+    market = historical_data[["date"]].merge(
+        sp500[["date", "market"]], how="left", on="date"
+    )
+    metrics = Metrics().batch_metrics(
+        projections, market["market"].to_numpy(), market["date"].to_numpy()
+    )
+    result = []
+    for j in range(projections.shape[1]):
+        projection = market.copy()
+        projection.insert(1, "portfolio", projections[:, j])
+        output = {
+            "metrics": {
+                "metrics": {key: value[j] for key, value in metrics.items()},
+                **Metrics().timeseries(projection),
+            }
+        }
+        if request["projection"]:
+            output["projection"] = projection
+        result.append(output)
+    return ORJSONResponse(
+        {"metrics": metrics, "portfolios": result}, orient=orient
+    )
+
+
+@router.post(
+    "/rolling", tags=["Backtest Portfolio"], response_class=ORJSONResponse
+)
+@cached(["fund_prices", "sp500", "ff_daily"])
+def backtest_portfolio_rolling(
+    item: schemas.portfolio_rolling, orient: Orient = Orient.records
+) -> Dict:
+    """
+    Rolling risk metrics of a backtested portfolio
+
+    Args:
+        item (schemas.portfolio_rolling): Input request with the windows
+        orient (Orient): Timeseries as lists of records or of columns
+
+    Returns:
+        Dict: Return, volatility, sharpe, sortino, beta, tracking error and
+            max drawdown by date for each window
+    """
+    projection = project_portfolio(item.dict())
+    rolling = Metrics().rolling_metrics(projection, item.dict()["windows"])
+    return ORJSONResponse({"rolling": rolling}, orient=orient)
@@ -1,15 +1,58 @@
-from typing import Dict, List
+from typing import Dict, List, Optional
 
-from fastapi import APIRouter
+import pandas as pd
+from fastapi import APIRouter, Header
 
 from src import schemas
+from src.api.cache import cached
+from src.api.responses import (
+    ARROW_STREAM_MEDIA_TYPE,
+    ArrowResponse,
+    ORJSONResponse,
+    accepts,
+    arrow_table,
+)
 from src.modules.data_loader import DataLoader
 from src.modules.factor_analysis import FactorAnalysis
 
 router = APIRouter()
 
 
-@router.post("/", tags=["Factor Analysis"])
+def factor_datasets(item: schemas.factor, **kwargs) -> List[str]:
+    """
+    Datasets read by a factor regression
+
+    Args:
+        item (schemas.factor): Input request for factor regression
+
+    Returns:
+        List[str]: Prices and the factors of the requested frequency
+    """
+    return ["fund_prices", f"ff_{item.frequency.lower()}"]
+
+
+def rolling_frame(output: List[Dict]) -> pd.DataFrame:
+    """
+    Rolling regression results as one row per ticker and date
+
+    Args:
+        output (List[Dict]): Rolling regression results for each ticker
+
+    Returns:
+        pd.DataFrame: fund_code, date, parameters and rsquared columns
+    """
+    frames = []
+    for i in output:
+        frame = pd.DataFrame(i["params"])
+        frame["rsquared"] = i["rsquared"]
+        frame.insert(0, "date", pd.to_datetime(frame.index))
+        frame.insert(0, "fund_code", i["fund_code"])
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True)
+
+
+@router.post("/", tags=["Factor Analysis"], response_class=ORJSONResponse)
+@cached(factor_datasets)
 def factor_regression(item: schemas.factor) -> List[Dict]:
     """
     Run factor regression for ticker
@@ -46,16 +89,30 @@ def factor_regression(item: schemas.factor) -> List[Dict]:
         "ff_factors": ff_factors,
     }
     output = FactorAnalysis(**external_data).regress_funds()
-    return output
+    return ORJSONResponse(output)
 
 
-@router.post("/rolling/", tags=["Factor Analysis"])
-def rolling_factor_regression(item: schemas.factor) -> List[Dict]:
+@router.post(
+    "/rolling/", tags=["Factor Analysis"], response_class=ORJSONResponse
+)
+@cached(factor_datasets)
+def rolling_factor_regression(
+    item: schemas.factor, accept: Optional[str] = Header(None)
+) -> List[Dict]:
     """
-    Run rolling factor regression for ticker for 12m windows
+    Run rolling factor regression for ticker, 12m windows by default
+
+    "window" sets the number of observations per regression and
+    "expanding" fits growing windows from the start of the sample until
+    the window is full (every regression starts at the first observation
+    if no window is given).
+
+    With "Accept: application/vnd.apache.arrow.stream" the results are sent
+    as Arrow record batches holding one row per ticker and date.
 
     Args:
         item (schemas.factor): Input request for factor regression
+        accept (Optional[str]): Accept header
 
     Returns:
         List[Dict]: Factor analysis for each ticker
@@ -85,5 +142,9 @@ def rolling_factor_regression(item: schemas.factor) -> List[Dict]:
         "fund_returns": historical_returns,
         "ff_factors": ff_factors,
     }
-    output = FactorAnalysis(**external_data).rolling_regress_funds(frequency)
-    return output
+    output = FactorAnalysis(**external_data).rolling_regress_funds(
+        frequency, item.dict()["window"], item.dict()["expanding"]
+    )
+    if accepts(accept, ARROW_STREAM_MEDIA_TYPE):
+        return ArrowResponse(arrow_table(rolling_frame(output)))
+    return ORJSONResponse(output)
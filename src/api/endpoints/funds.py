@@ -2,18 +2,22 @@ from typing import Any
 
 from fastapi import APIRouter
 
+from src.api.responses import Orient, ORJSONResponse
 from src.modules.data_loader import DataLoader
 
 router = APIRouter()
 
 
-@router.get("/", tags=["Tickers"])
-def get_funds() -> Any:
+@router.get("/", tags=["Tickers"], response_class=ORJSONResponse)
+def get_funds(orient: Orient = Orient.records) -> Any:
     """
     Load available tickers
 
+    Args:
+        orient (Orient): Tickers as a list of records or of columns
+
     Returns:
         Any: JSON like object with avaliable tickers
     """
     result = DataLoader().load_available_funds()
-    return result
+    return ORJSONResponse(result, orient=orient)
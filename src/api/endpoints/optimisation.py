@@ -4,19 +4,31 @@ import numpy as np
 from fastapi import APIRouter
 
 from src import schemas
+from src.api.cache import cached
+from src.api.responses import Orient, ORJSONResponse
+from src.modules.covariance import CovarianceMethod, cached_covariance
+from src.modules.covariance import config as covariance_config
+from src.modules.covariance import estimate_covariance
 from src.modules.data_loader import DataLoader
 from src.modules.optimisation import PortfolioOptimisation
+from src.modules.parallel import config, worker_count
 
 router = APIRouter()
 
 
-@router.post("/", tags=["Portfolio Optimisation"])
-def efficient_frontier(item: schemas.optimisation) -> Dict:
+@router.post(
+    "/", tags=["Portfolio Optimisation"], response_class=ORJSONResponse
+)
+@cached(["fund_prices", "ff_monthly"])
+def efficient_frontier(
+    item: schemas.optimisation, orient: Orient = Orient.records
+) -> Dict:
     """
     Request efficient frontier
 
     Args:
         item (schemas.optimisation): Input request for optimisation
+        orient (Orient): Frontier as a list of records or of columns
 
     Returns:
         Dict: Portfolios that lie on efficient frontier
@@ -25,6 +37,10 @@ def efficient_frontier(item: schemas.optimisation) -> Dict:
     start_date = item.dict()["start_date"]
     end_date = item.dict()["end_date"]
     num_portfolios = item.dict()["num_portfolios"]
+    # Requests may lower, never raise, the worker count of the server
+    max_workers = worker_count(config["max_workers"])
+    if item.dict()["max_workers"] is not None:
+        max_workers = min(item.dict()["max_workers"], max_workers)
     frequency = "monthly"
     historical_returns = DataLoader().load_historical_returns(
         fund_codes=fund_codes,
@@ -32,16 +48,47 @@ def efficient_frontier(item: schemas.optimisation) -> Dict:
         end_date=end_date,
         frequency=frequency,
     )
-    risk_free = DataLoader().load_ff_factors(
-        regression_factors=[],
-        start_date=start_date,
-        end_date=end_date,
-        frequency=frequency,
-    )["RF"]
-    average_risk_free = np.mean(risk_free)
+    covariance_method = item.dict()["covariance"]
+    average_risk_free = (
+        DataLoader().load_risk_free(frequency).average(start_date, end_date)
+    )
     fund_returns = np.mean(historical_returns.drop(columns=["date"]))
-    fund_covariance = historical_returns.drop(columns=["date"]).cov()
-    frontier = PortfolioOptimisation().efficient_frontier(
+
+    ff_factors = None
+    if covariance_method == CovarianceMethod.factor:
+        ff_factors = DataLoader().load_ff_factors(
+            regression_factors=covariance_config["factors"],
+            start_date=start_date,
+            end_date=end_date,
+            frequency=frequency,
+        )
+
+    def estimator():
+        return estimate_covariance(
+            covariance_method, historical_returns, frequency, ff_factors
+        )
+
+    # Returns and factors are loaded above, so their versions are held
+    datasets = ["fund_prices"]
+    if covariance_method == CovarianceMethod.factor:
+        datasets.append(f"ff_{frequency}")
+    data_version = DataLoader().data_version(datasets)
+    fund_covariance = cached_covariance(
+        (
+            tuple(fund_codes),
+            start_date,
+            end_date,
+            frequency,
+            covariance_method,
+            tuple(tuple(data_version[i]) for i in datasets),
+        ),
+        estimator,
+    )
+    frontier = PortfolioOptimisation(
+        method=item.dict()["method"],
+        executor=item.dict()["executor"],
+        max_workers=max_workers,
+    ).efficient_frontier(
         fund_returns,
         fund_covariance,
         num_portfolios,
@@ -59,4 +106,4 @@ def efficient_frontier(item: schemas.optimisation) -> Dict:
 
         ticker_summary.append(ticker)
     result["tickers"] = ticker_summary
-    return result
+    return ORJSONResponse(result, orient=orient)
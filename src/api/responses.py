@@ -0,0 +1,238 @@
+from datetime import date, datetime
+from enum import Enum
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+import orjson
+import pandas as pd
+import pyarrow as pa
+from fastapi.responses import JSONResponse, Response
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+ORJSON_NDJSON_OPTIONS = ORJSON_OPTIONS | orjson.OPT_APPEND_NEWLINE
+
+
+class Orient(str, Enum):
+    records = "records"
+    columns = "columns"
+
+
+def accepts(accept: Optional[str], media_type: str) -> bool:
+    """
+    Check whether an Accept header asks for a media type
+
+    Args:
+        accept (Optional[str]): Accept header of the request
+        media_type (str): Media type to look for
+
+    Returns:
+        bool: True if media type is listed
+    """
+    if accept is None:
+        return False
+    return any(
+        i.split(";")[0].strip() == media_type for i in accept.split(",")
+    )
+
+
+def column_list(values: np.ndarray) -> list:
+    """
+    Convert column into python values, dates as %Y-%m-%d strings
+
+    Args:
+        values (np.ndarray): Column values
+
+    Returns:
+        list: Python values
+    """
+    if np.issubdtype(values.dtype, np.datetime64):
+        return np.datetime_as_string(values, unit="D").tolist()
+    return values.tolist()
+
+
+def json_column(values: np.ndarray) -> Any:
+    """
+    Convert column into values orjson can encode directly
+
+    Dates become %Y-%m-%d strings, numeric columns stay NumPy arrays
+    (NaN is encoded as null) and anything else becomes a list.
+
+    Args:
+        values (np.ndarray): Column values
+
+    Returns:
+        Any: Encodable column
+    """
+    if values.dtype.kind in "biuf":
+        return np.ascontiguousarray(values)
+    return column_list(values)
+
+
+def frame_records(frame: pd.DataFrame) -> List[Dict]:
+    """
+    DataFrame as a list of row objects
+
+    Args:
+        frame (pd.DataFrame): Data to convert
+
+    Returns:
+        List[Dict]: One dict per row
+    """
+    names = list(frame.columns)
+    columns = [column_list(frame[i].to_numpy()) for i in names]
+    return [dict(zip(names, row)) for row in zip(*columns)]
+
+
+def frame_columns(frame: pd.DataFrame) -> Dict[str, Any]:
+    """
+    DataFrame as one array per column
+
+    Args:
+        frame (pd.DataFrame): Data to convert
+
+    Returns:
+        Dict[str, Any]: Column name to values
+    """
+    return {i: json_column(frame[i].to_numpy()) for i in frame.columns}
+
+
+def series_dict(series: pd.Series) -> Dict:
+    """
+    Series as an index to value mapping
+
+    Args:
+        series (pd.Series): Data to convert
+
+    Returns:
+        Dict: Index label to value
+    """
+    index = series.index
+    if isinstance(index, pd.DatetimeIndex):
+        index = index.strftime("%Y-%m-%d")
+    return dict(zip(index.tolist(), series.tolist()))
+
+
+def dumps(content: Any, orient: Orient = Orient.records) -> bytes:
+    """
+    Encode response content, including NumPy and pandas objects, once
+
+    Args:
+        content (Any): Content to encode
+        orient (Orient): Layout used for DataFrames
+
+    Returns:
+        bytes: JSON
+    """
+
+    def default(obj):
+        if isinstance(obj, pd.DataFrame):
+            if orient == Orient.columns:
+                return frame_columns(obj)
+            return frame_records(obj)
+        if isinstance(obj, pd.Series):
+            return series_dict(obj)
+        if isinstance(obj, np.ndarray):
+            return obj.tolist()
+        if isinstance(obj, np.generic):
+            return obj.item()
+        if isinstance(obj, (datetime, date)):
+            return obj.strftime("%Y-%m-%d")
+        raise TypeError(f"Type is not JSON serializable: {type(obj)}")
+
+    return orjson.dumps(content, default=default, option=ORJSON_OPTIONS)
+
+
+class ORJSONResponse(JSONResponse):
+    """
+    JSON response encoded with orjson, DataFrames as records or columns
+
+    Args:
+        content (Any): Content to encode
+        orient (Orient): Layout used for DataFrames
+    """
+
+    def __init__(
+        self, content: Any, orient: Orient = Orient.records, **kwargs
+    ):
+        self.orient = orient
+        super().__init__(content, **kwargs)
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content, self.orient)
+
+
+def arrow_table(
+    frame: pd.DataFrame, metadata: Optional[Dict[str, Any]] = None
+) -> pa.Table:
+    """
+    DataFrame as an Arrow table, extra content JSON encoded in metadata
+
+    Args:
+        frame (pd.DataFrame): Data to convert
+        metadata (Optional[Dict[str, Any]]): Values kept in the schema
+            metadata, each encoded with dumps
+
+    Returns:
+        pa.Table
+    """
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    schema_metadata = {}
+    for key, value in (metadata or {}).items():
+        schema_metadata[key] = dumps(value)
+    return table.replace_schema_metadata(schema_metadata)
+
+
+class ArrowResponse(Response):
+    """
+    Table sent as an Arrow IPC stream
+
+    Columns are written as record batches in their binary form, so clients
+    can read them into pandas or polars without parsing text.
+
+    Args:
+        content (pa.Table): Table to send
+    """
+
+    media_type = ARROW_STREAM_MEDIA_TYPE
+
+    def render(self, content: pa.Table) -> bytes:
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, content.schema) as writer:
+            writer.write_table(content)
+        return sink.getvalue().to_pybytes()
+
+
+def ndjson_stream(
+    columns: Dict[str, np.ndarray],
+    trailer: Optional[Dict] = None,
+    chunk_size: int = 1000,
+) -> Iterator[bytes]:
+    """
+    Stream columns as one JSON object per line
+
+    Rows are encoded a chunk at a time, so only one chunk of text exists
+    in memory and the first rows are sent before the last are encoded.
+
+    Args:
+        columns (Dict[str, np.ndarray]): Equal length columns
+        trailer (Optional[Dict]): Object sent as the final line
+        chunk_size (int): Rows encoded per chunk
+
+    Yields:
+        bytes: Newline delimited JSON
+    """
+    names = list(columns)
+    n_rows = len(columns[names[0]]) if names else 0
+    for start in range(0, n_rows, chunk_size):
+        chunk = [
+            column_list(columns[i][start : start + chunk_size]) for i in names
+        ]
+        yield b"".join(
+            orjson.dumps(dict(zip(names, row)), option=ORJSON_NDJSON_OPTIONS)
+            for row in zip(*chunk)
+        )
+    if trailer is not None:
+        yield dumps(trailer) + b"\n"
@@ -1,6 +1,7 @@
 from fastapi import FastAPI
 
 from src.api.api import api_router
+from src.modules.data_loader import DataLoader
 
 tags_metadata = [
     {
@@ -24,3 +25,11 @@ tags_metadata = [
 app = FastAPI(openapi_tags=tags_metadata)
 
 app.include_router(api_router)
+
+
+@app.on_event("startup")
+def build_snapshots() -> None:
+    """Write memory-mapped snapshots before serving, if enabled"""
+    data_loader = DataLoader()
+    if data_loader.snapshot_path is not None:
+        data_loader.build_snapshots()
@@ -0,0 +1,340 @@
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+
+class CriticalLine:
+    """
+    Markowitz Critical Line Algorithm for long-only, fully invested weights
+
+    Traces the efficient frontier from the highest return portfolio down
+    to the minimum variance portfolio as a list of corner (turning point)
+    portfolios. Between two corners the free assets do not change and the
+    weights are linear in the target return, so any frontier point is an
+    interpolation of the two corners around it.
+
+    The corners are only exact for a nonsingular covariance. When assets
+    are collinear, e.g. one share class is another less a fee, free sets
+    holding all of them have no solution, check full_rank first.
+
+    Args:
+        mean (np.ndarray): Expected return of each asset
+        covariance (np.ndarray): Covariance between assets
+        lower (Optional[np.ndarray]): Lower weight bounds, 0 if None
+        upper (Optional[np.ndarray]): Upper weight bounds, 1 if None
+    """
+
+    def __init__(
+        self,
+        mean: np.ndarray,
+        covariance: np.ndarray,
+        lower: Optional[np.ndarray] = None,
+        upper: Optional[np.ndarray] = None,
+    ):
+        self.mean = np.asarray(mean, dtype=float)
+        self.covariance = np.asarray(covariance, dtype=float)
+        self.solve_mean = self.break_ties(self.mean)
+        n_assets = len(self.mean)
+        self.lower = np.zeros(n_assets) if lower is None else lower
+        self.upper = np.ones(n_assets) if upper is None else upper
+        self.weights: List[np.ndarray] = []
+        self.lambdas: List[float] = []
+        self.returns = np.empty(0)
+        self.solve()
+
+    @staticmethod
+    def full_rank(covariance: np.ndarray) -> bool:
+        """
+        Whether the covariance is nonsingular, so the line is exact
+
+        Args:
+            covariance (np.ndarray): Covariance between assets
+
+        Returns:
+            bool: False if any asset is a combination of others
+        """
+        covariance = np.asarray(covariance, dtype=float)
+        rank = np.linalg.matrix_rank(covariance, hermitian=True)
+        return rank == len(covariance)
+
+    @staticmethod
+    def break_ties(mean: np.ndarray, tolerance: float = 1e-12) -> np.ndarray:
+        """
+        Means used to trace the line: centred, nudged apart if any tie
+
+        An asset whose mean equals the means of every free asset never
+        enters the free set, since moving lambda does not change its
+        trade-off. Tied assets are nudged apart by a billionth of the
+        largest mean so every corner is reached. Adding a constant to every
+        mean does not move the line, so means are centred first and the
+        nudges are not lost to rounding. Corner returns are still computed
+        with the original means.
+
+        Args:
+            mean (np.ndarray): Expected return of each asset
+            tolerance (float): Relative gap below which means tie
+
+        Returns:
+            np.ndarray: Means used to trace the line
+        """
+        scale = max(np.abs(mean).max(initial=0), 1e-12)
+        centred = mean - mean.mean() if len(mean) else mean.copy()
+        order = np.argsort(mean, kind="stable")
+        if (np.diff(mean[order]) <= tolerance * scale).any():
+            centred[order] += np.arange(len(mean)) * 1e-9 * scale
+        return centred
+
+    def initial_weights(self) -> Tuple[List[int], np.ndarray]:
+        """
+        Highest return portfolio: fill assets by descending mean
+
+        Returns:
+            Tuple[List[int], np.ndarray]: Free asset and weights
+        """
+        weights = self.lower.astype(float).copy()
+        order = np.argsort(self.solve_mean, kind="stable")[::-1]
+        for i in order:
+            free = i
+            weights[i] = min(self.upper[i], weights[i] + 1 - weights.sum())
+            if weights.sum() >= 1:
+                break
+        return [free], weights
+
+    def free_matrices(
+        self, free: List[int], weights: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Inverse covariance of free assets and their links to bound assets
+
+        Args:
+            free (List[int]): Free assets
+            weights (np.ndarray): Current weights, bound assets are used
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]: Inverse
+                free covariance, free by bound covariance, free means and
+                bound weights
+        """
+        bound = [i for i in range(len(self.mean)) if i not in free]
+        # Pseudo-inverse, duplicate or collinear assets make it singular
+        covariance_inv = np.linalg.pinv(
+            self.covariance[np.ix_(free, free)], hermitian=True
+        )
+        covariance_fb = self.covariance[np.ix_(free, bound)]
+        mean_free = self.solve_mean[free]
+        return covariance_inv, covariance_fb, mean_free, weights[bound]
+
+    @staticmethod
+    def free_lambda(
+        covariance_inv: np.ndarray,
+        covariance_fb: np.ndarray,
+        mean_free: np.ndarray,
+        weights_bound: np.ndarray,
+        i: int,
+        bounds: Tuple[float, float],
+    ) -> Tuple[Optional[float], float]:
+        """
+        Lambda at which free asset i reaches one of its bounds
+
+        Args:
+            covariance_inv (np.ndarray): Inverse free covariance
+            covariance_fb (np.ndarray): Free by bound covariance
+            mean_free (np.ndarray): Means of free assets
+            weights_bound (np.ndarray): Weights of bound assets
+            i (int): Position of the asset among free assets
+            bounds (Tuple[float, float]): Lower and upper bound of the
+                asset, the one it moves towards is used
+
+        Returns:
+            Tuple[Optional[float], float]: Lambda (None if never reached)
+                and the bound
+        """
+        ones = np.ones(len(mean_free))
+        c1 = ones @ covariance_inv @ ones
+        c2 = covariance_inv @ mean_free
+        c3 = ones @ covariance_inv @ mean_free
+        c4 = covariance_inv @ ones
+        c = -c1 * c2[i] + c3 * c4[i]
+        if c == 0:
+            return None, 0.0
+        bound = bounds[1] if c > 0 else bounds[0]
+        l1 = weights_bound.sum()
+        l3 = covariance_inv @ covariance_fb @ weights_bound
+        l2 = ones @ l3
+        value = ((1 - l1 + l2) * c4[i] - c1 * (bound + l3[i])) / c
+        return value, bound
+
+    @staticmethod
+    def free_weights(
+        covariance_inv: np.ndarray,
+        covariance_fb: np.ndarray,
+        mean_free: np.ndarray,
+        weights_bound: np.ndarray,
+        lambda_: float,
+    ) -> np.ndarray:
+        """
+        Weights of free assets at lambda, fully invested
+
+        Args:
+            covariance_inv (np.ndarray): Inverse free covariance
+            covariance_fb (np.ndarray): Free by bound covariance
+            mean_free (np.ndarray): Means of free assets
+            weights_bound (np.ndarray): Weights of bound assets
+            lambda_ (float): Risk aversion multiplier of the mean
+
+        Returns:
+            np.ndarray: Weights of free assets
+        """
+        ones = np.ones(len(mean_free))
+        g1 = ones @ covariance_inv @ mean_free
+        g2 = ones @ covariance_inv @ ones
+        w1 = covariance_inv @ covariance_fb @ weights_bound
+        gamma = -lambda_ * g1 / g2 + (1 - weights_bound.sum() + ones @ w1) / g2
+        return (
+            -w1
+            + gamma * (covariance_inv @ ones)
+            + lambda_ * (covariance_inv @ mean_free)
+        )
+
+    def solve(self) -> None:
+        """Compute corner portfolios from highest return to minimum variance"""
+        free, weights = self.initial_weights()
+        self.weights = [weights.copy()]
+        self.lambdas = [np.inf]
+        n_assets = len(self.mean)
+        # Asset that changed side at the last corner, it may not change back
+        # at the same lambda
+        changed = None
+        while True:
+            # Events within rounding of the last corner happen at it, with
+            # collinear assets several are due at the same lambda
+            ceiling = self.lambdas[-1] * (1 + 1e-9)
+            # Case a: a free asset moves to one of its bounds
+            lambda_in, asset_in, bound_in = None, None, None
+            if len(free) > 1:
+                matrices = self.free_matrices(free, weights)
+                for j, i in enumerate(free):
+                    value, bound = self.free_lambda(
+                        *matrices, j, (self.lower[i], self.upper[i])
+                    )
+                    if (
+                        value is not None
+                        and i != changed
+                        and (lambda_in is None or value > lambda_in)
+                    ):
+                        lambda_in, asset_in, bound_in = value, i, bound
+            # Case b: a bound asset becomes free
+            lambda_out, asset_out = None, None
+            if len(free) < n_assets:
+                for i in range(n_assets):
+                    if i in free or i == changed:
+                        continue
+                    matrices = self.free_matrices(free + [i], weights)
+                    value, _ = self.free_lambda(
+                        *matrices, len(free), (weights[i], weights[i])
+                    )
+                    if (
+                        value is not None
+                        and value < ceiling
+                        and (lambda_out is None or value > lambda_out)
+                    ):
+                        lambda_out, asset_out = value, i
+            if (lambda_in is None or lambda_in < 0) and (
+                lambda_out is None or lambda_out < 0
+            ):
+                # No more corners above lambda 0: minimum variance portfolio
+                lambda_ = 0.0
+            elif lambda_out is None or (
+                lambda_in is not None and lambda_in > lambda_out
+            ):
+                lambda_ = min(lambda_in, self.lambdas[-1])
+                free.remove(asset_in)
+                weights[asset_in] = bound_in
+                changed = asset_in
+            else:
+                lambda_ = min(lambda_out, self.lambdas[-1])
+                free.append(asset_out)
+                changed = asset_out
+            matrices = self.free_matrices(free, weights)
+            weights[free] = self.free_weights(*matrices, lambda_)
+            self.weights.append(weights.copy())
+            self.lambdas.append(lambda_)
+            if lambda_ == 0:
+                break
+        self.purge()
+
+    def dominates(
+        self, weights: np.ndarray, previous: np.ndarray, tolerance: float
+    ) -> bool:
+        """
+        Whether a corner has the return of the previous one with less risk
+
+        Happens when assets with tied means enter the free set.
+
+        Args:
+            weights (np.ndarray): Corner weights
+            previous (np.ndarray): Weights of the previous corner
+            tolerance (float): Return difference counted as a tie
+
+        Returns:
+            bool: True if the previous corner is not efficient
+        """
+        if self.mean @ weights < self.mean @ previous - tolerance:
+            return False
+        variance = weights @ self.covariance @ weights
+        previous_variance = previous @ self.covariance @ previous
+        return variance < previous_variance * (1 - tolerance)
+
+    def purge(self, tolerance: float = 1e-9) -> None:
+        """Drop corners breaking the constraints or not lowering return"""
+        keep_weights, keep_lambdas = [], []
+        for weights, lambda_ in zip(self.weights, self.lambdas):
+            if abs(weights.sum() - 1) > tolerance:
+                continue
+            if (weights < self.lower - tolerance).any():
+                continue
+            if (weights > self.upper + tolerance).any():
+                continue
+            if keep_weights and (
+                self.mean @ weights > self.mean @ keep_weights[-1] + tolerance
+            ):
+                continue
+            while keep_weights and self.dominates(
+                weights, keep_weights[-1], tolerance
+            ):
+                keep_weights.pop()
+                keep_lambdas.pop()
+            keep_weights.append(weights)
+            keep_lambdas.append(lambda_)
+        self.weights, self.lambdas = keep_weights, keep_lambdas
+        self.returns = np.array([self.mean @ w for w in self.weights])
+
+    def minimum_variance(self) -> np.ndarray:
+        """Weights of the minimum variance portfolio"""
+        return self.weights[-1]
+
+    def frontier_weights(self, target: float) -> np.ndarray:
+        """
+        Efficient weights for a target return, between the corners around it
+
+        Targets outside the returns of the corners are clipped to the
+        highest return or the minimum variance portfolio.
+
+        Args:
+            target (float): Target return
+
+        Returns:
+            np.ndarray: Portfolio weights
+        """
+        returns = self.returns
+        if target >= returns[0]:
+            return self.weights[0].copy()
+        if target <= returns[-1]:
+            return self.weights[-1].copy()
+        # Corner returns decrease along the line
+        k = np.searchsorted(-returns, -target)
+        upper_return, lower_return = returns[k - 1], returns[k]
+        share = (target - lower_return) / (upper_return - lower_return)
+        return self.weights[k] + share * (
+            self.weights[k - 1] - self.weights[k]
+        )
@@ -0,0 +1,169 @@
+from enum import Enum
+from typing import Callable, Hashable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .expiry_dict import ExpiringDict
+from .regression import LinearRegression
+
+
+class CovarianceMethod(str, Enum):
+    sample = "sample"
+    ledoit_wolf = "ledoit_wolf"
+    ewma = "ewma"
+    factor = "factor"
+
+
+config = {
+    # RiskMetrics decay of exponentially weighted estimates per frequency
+    "decay": {"daily": 0.94, "monthly": 0.97},
+    # Fama-French factors of the factor model
+    "factors": ["MktRF", "SMB", "HML"],
+}
+
+# Estimates by tickers, dates, frequency and method, dropped after a day
+# like the market data they are computed from
+cache = ExpiringDict(max_len=256, max_age_seconds=86400)
+
+
+def sample_covariance(returns: np.ndarray) -> np.ndarray:
+    """
+    Unbiased sample covariance
+
+    Args:
+        returns (np.ndarray): Returns, one row per date (n x p)
+
+    Returns:
+        np.ndarray: Covariance (p x p)
+    """
+    return np.atleast_2d(np.cov(returns, rowvar=False))
+
+
+def ledoit_wolf_covariance(returns: np.ndarray) -> Tuple[np.ndarray, float]:
+    """
+    Ledoit-Wolf shrinkage of the sample covariance towards a scaled identity
+
+    The shrinkage intensity minimises the expected squared distance to the
+    true covariance, so the estimate stays well conditioned when there are
+    about as many tickers as dates.
+
+    Args:
+        returns (np.ndarray): Returns, one row per date (n x p)
+
+    Returns:
+        Tuple[np.ndarray, float]: Covariance (p x p) and shrinkage intensity
+    """
+    n_obs, n_assets = returns.shape
+    centered = returns - returns.mean(axis=0)
+    covariance = centered.T @ centered / n_obs
+    mu = np.trace(covariance) / n_assets
+    squared = centered**2
+    # Mean squared distance of each outer product to the sample covariance
+    beta = (np.sum(squared.T @ squared) / n_obs - np.sum(covariance**2)) / (
+        n_obs * n_assets
+    )
+    delta = np.sum(covariance**2) / n_assets - mu**2
+    beta = min(beta, delta)
+    shrinkage = 0.0 if beta == 0 else beta / delta
+    shrunk = (1 - shrinkage) * covariance
+    shrunk.flat[:: n_assets + 1] += shrinkage * mu
+    return shrunk, shrinkage
+
+
+def ewma_covariance(returns: np.ndarray, decay: float) -> np.ndarray:
+    """
+    Exponentially weighted covariance, latest dates weigh the most
+
+    Args:
+        returns (np.ndarray): Returns, one row per date, oldest first
+        decay (float): Weight of each date relative to the next one
+
+    Returns:
+        np.ndarray: Covariance (p x p)
+    """
+    weights = decay ** np.arange(len(returns) - 1, -1, -1, dtype=float)
+    weights /= weights.sum()
+    centered = returns - weights @ returns
+    return (centered * weights[:, None]).T @ centered
+
+
+def factor_covariance(returns: np.ndarray, factors: np.ndarray) -> np.ndarray:
+    """
+    Covariance implied by a linear factor model
+
+    Every ticker is regressed on the factors at once, the covariance is
+    B' cov(factors) B plus the residual variance of each ticker, so only
+    k x p loadings are estimated instead of p x p covariances.
+
+    Args:
+        returns (np.ndarray): Returns, one row per date (n x p)
+        factors (np.ndarray): Factor returns on the same dates (n x k)
+
+    Returns:
+        np.ndarray: Covariance (p x p)
+    """
+    exog = np.column_stack((np.ones(len(factors)), factors))
+    results = LinearRegression(exog, returns, constant=True)
+    loadings = results.params[1:]
+    covariance = loadings.T @ sample_covariance(factors) @ loadings
+    covariance.flat[:: len(covariance) + 1] += results.scale
+    return covariance
+
+
+def estimate_covariance(
+    method: CovarianceMethod,
+    returns: pd.DataFrame,
+    frequency: str,
+    factors: Optional[pd.DataFrame] = None,
+) -> pd.DataFrame:
+    """
+    Covariance between tickers with the chosen estimator
+
+    Args:
+        method (CovarianceMethod): Estimator
+        returns (pd.DataFrame): Returns with a date column and one column
+            per ticker
+        frequency (str): Returns frequency (daily or monthly)
+        factors (Optional[pd.DataFrame]): Factor returns with a date
+            column, used by the factor model
+
+    Returns:
+        pd.DataFrame: Covariance labelled by ticker
+    """
+    fund_codes = returns.columns.drop("date")
+    values = returns[fund_codes].to_numpy(dtype=float)
+    if method == CovarianceMethod.ledoit_wolf:
+        covariance, _ = ledoit_wolf_covariance(values)
+    elif method == CovarianceMethod.ewma:
+        covariance = ewma_covariance(values, config["decay"][frequency])
+    elif method == CovarianceMethod.factor:
+        aligned = returns.merge(factors, on="date")
+        covariance = factor_covariance(
+            aligned[fund_codes].to_numpy(dtype=float),
+            aligned[config["factors"]].to_numpy(dtype=float),
+        )
+    else:
+        covariance = sample_covariance(values)
+    return pd.DataFrame(covariance, index=fund_codes, columns=fund_codes)
+
+
+def cached_covariance(
+    key: Hashable, estimator: Callable[[], pd.DataFrame]
+) -> pd.DataFrame:
+    """
+    Return the estimate stored under key, computing it on first use
+
+    Args:
+        key (Hashable): Tickers, dates, frequency, method and market data
+            version of the estimate
+        estimator (Callable[[], pd.DataFrame]): Function computing it
+
+    Returns:
+        pd.DataFrame: Covariance, shared between requests so not modified
+    """
+    covariance = cache.get(key)
+    if covariance is None:
+        covariance = estimator()
+        cache[key] = covariance
+    return covariance
@@ -1,12 +1,27 @@
-import json
+import os
 from datetime import datetime, timedelta
-from typing import Any, List
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional
 
 import numpy as np
 import pandas as pd
+import pyarrow.parquet as pq
 from pydantic import BaseModel
 
-from .expiry_dict import ExpiringDict
+from .market_data import (
+    FilledPriceMatrix,
+    MarketDataStore,
+    PriceMatrix,
+    RiskFreeRate,
+    prepare_timeseries,
+)
+from .snapshot import (
+    read_snapshot,
+    slice_snapshot,
+    snapshot_version,
+    write_snapshot,
+)
+from .storage import Storage, get_storage
 
 config = {
     "fund_codes": "01_primary/fund_codes.parquet",
@@ -16,8 +31,25 @@ config = {
     "sp500": "01_primary/sp500.parquet",
     "bucket_name": "aurora-361016-market-data",
 }
+# Point at a local directory (e.g. test fixtures) to run without GCS
+config["base_path"] = os.environ.get(
+    "AURORA_DATA_PATH", f"gcs://{config['bucket_name']}/"
+)
+# Local directory used to mirror remote files between restarts
+config["mirror_path"] = os.environ.get("AURORA_MIRROR_PATH")
+# Local directory of memory-mapped Arrow snapshots shared by all workers
+config["snapshot_path"] = os.environ.get("AURORA_SNAPSHOT_PATH")
+
+# Factors are read as Arrow snapshots, prices as calendar filled panels
+snapshot_datasets = ["ff_daily", "ff_monthly"]
+filled_datasets = ["fund_prices", "sp500"]
+
+# Column names in the stored layout mapped to their names in the raw file
+raw_columns = {
+    "sp500": {"date": "Date", "market": "close"},
+}
 
-cache = ExpiringDict(max_len=20, max_age_seconds=86400)
+store = MarketDataStore(max_age_seconds=86400)
 
 
 class DataLoader(BaseModel):
@@ -26,12 +58,352 @@ class DataLoader(BaseModel):
 
     """
 
-    base_path: str = f"gcs://{config['bucket_name']}/"
+    base_path: str = config["base_path"]
+    mirror_path: Optional[str] = config["mirror_path"]
+    snapshot_path: Optional[str] = config["snapshot_path"]
+    pushdown: bool = False
 
     class Config:
         arbitrary_types_allowed = True
 
-    def load_available_funds(self) -> Any:
+    @property
+    def storage(self) -> Storage:
+        return get_storage(self.base_path, self.mirror_path)
+
+    def stored(self, key: str, dataset: str, loader: Callable[[], Any]) -> Any:
+        """
+        Load from the process-wide market data store, on first use only
+
+        The entry is tagged with the dataset file and its storage version,
+        see data_version.
+
+        Args:
+            key (str): Store key
+            dataset (str): Dataset name in config the entry is read from
+            loader (Callable[[], Any]): Function returning the entry
+
+        Returns:
+            Any: Stored entry
+        """
+        return store.get(
+            key,
+            loader,
+            partial(self.storage.version, config[dataset]),
+            self.storage.uri(config[dataset]),
+        )
+
+    def data_version(self, datasets: List[str]) -> Dict[str, List[str]]:
+        """
+        Storage versions of the given datasets held in the store
+
+        The same in every process that loaded the same files, whatever
+        else it loaded.
+
+        Args:
+            datasets (List[str]): Dataset names in config
+
+        Returns:
+            Dict[str, List[str]]: Versions held of each dataset, empty if
+                not loaded yet
+        """
+        versions = store.versions(
+            [self.storage.uri(config[dataset]) for dataset in datasets]
+        )
+        return {
+            dataset: versions[self.storage.uri(config[dataset])]
+            for dataset in datasets
+        }
+
+    def prepare_dataset(
+        self, dataset: str, data: pd.DataFrame
+    ) -> pd.DataFrame:
+        """
+        Convert raw dataset into its stored layout
+
+        Timeseries are indexed by date, sorted and cast to float once here
+        so that requests only have to slice them.
+
+        Args:
+            dataset (str): Dataset name in config
+            data (pd.DataFrame): Raw dataset as read from parquet
+
+        Returns:
+            pd.DataFrame: Prepared dataset
+        """
+        if dataset == "fund_codes":
+            return data
+        if dataset in raw_columns:
+            renames = {v: k for k, v in raw_columns[dataset].items()}
+            data = data.rename(columns=renames)[list(renames.values())]
+        data = prepare_timeseries(data)
+        if dataset.startswith("ff_"):
+            # Kenneth French's data is off by factor of 100
+            data = data / 100
+        return data
+
+    def read_dataset(self, dataset: str) -> pd.DataFrame:
+        """
+        Read full dataset from storage
+
+        Args:
+            dataset (str): Dataset name in config
+
+        Returns:
+            pd.DataFrame: Prepared dataset
+        """
+        with self.storage.open(config[dataset]) as f:
+            data = pd.read_parquet(f)
+        return self.prepare_dataset(dataset, data)
+
+    def read_window(
+        self,
+        dataset: str,
+        columns: List[str],
+        start_date: str,
+        end_date: str,
+    ) -> pd.DataFrame:
+        """
+        Read only the requested columns and dates from storage
+
+        Only the requested columns of row groups whose date statistics
+        overlap the range are fetched, the parquet footer is read once.
+
+        Args:
+            dataset (str): Dataset name in config
+            columns (List[str]): Columns to read
+            start_date (str): start date (%Y-%m-%d format)
+            end_date (str): end date (%Y-%m-%d format)
+
+        Returns:
+            pd.DataFrame: Prepared timeseries
+        """
+        renames = raw_columns.get(dataset, {})
+        date_column = renames.get("date", "date")
+        start, end = pd.Timestamp(start_date), pd.Timestamp(end_date)
+        with self.storage.open(config[dataset]) as f:
+            parquet = pq.ParquetFile(f)
+            metadata = parquet.metadata
+            date_index = parquet.schema_arrow.get_field_index(date_column)
+            row_groups = []
+            for i in range(metadata.num_row_groups):
+                statistics = (
+                    metadata.row_group(i).column(date_index).statistics
+                )
+                if statistics is not None and statistics.has_min_max:
+                    if pd.Timestamp(statistics.max) < start:
+                        continue
+                    if pd.Timestamp(statistics.min) > end + timedelta(days=1):
+                        continue
+                row_groups.append(i)
+            table = parquet.read_row_groups(
+                row_groups,
+                columns=[date_column] + [renames.get(i, i) for i in columns],
+            )
+        data = self.prepare_dataset(dataset, table.to_pandas())
+        return data.loc[start_date:end_date]
+
+    def load_dataset(self, dataset: str) -> pd.DataFrame:
+        """
+        Load dataset from the process-wide market data store
+
+        Args:
+            dataset (str): Dataset name in config
+
+        Returns:
+            pd.DataFrame: Prepared dataset
+        """
+        return self.stored(
+            self.storage.uri(config[dataset]),
+            dataset,
+            lambda: self.read_dataset(dataset),
+        )
+
+    def load_matrix(self, dataset: str) -> PriceMatrix:
+        """
+        Load timeseries dataset as a dense matrix from the market data store
+
+        Args:
+            dataset (str): Dataset name in config
+
+        Returns:
+            PriceMatrix: Prepared dataset
+        """
+        return self.stored(
+            self.storage.uri(config[dataset]),
+            dataset,
+            lambda: PriceMatrix.from_frame(self.read_dataset(dataset)),
+        )
+
+    def filled_file(self, dataset: str) -> str:
+        """
+        Location of the calendar filled panel of a dataset
+
+        Args:
+            dataset (str): Dataset name in config
+
+        Returns:
+            str: Panel file path
+        """
+        return os.path.join(self.snapshot_path, f"{dataset}_filled.panel")
+
+    def build_filled(self, dataset: str) -> None:
+        """
+        Write calendar filled panel of a dataset unless it is up to date
+
+        Args:
+            dataset (str): Dataset name in config
+        """
+        path = self.filled_file(dataset)
+        version = self.storage.version(config[dataset])
+        if FilledPriceMatrix.saved_version(path) == version:
+            return
+        matrix = PriceMatrix.from_frame(self.read_dataset(dataset))
+        FilledPriceMatrix.from_matrix(matrix).save(path, version)
+
+    def load_filled(self, dataset: str) -> FilledPriceMatrix:
+        """
+        Load timeseries reindexed to calendar days and backfilled
+
+        The fill is done once per load / refresh. With a snapshot path
+        it is kept on disk and memory-mapped, otherwise held in memory.
+
+        Args:
+            dataset (str): Dataset name in config
+
+        Returns:
+            FilledPriceMatrix: Calendar filled dataset
+        """
+        if self.snapshot_path is not None:
+            path = self.filled_file(dataset)
+
+            def reader():
+                self.build_filled(dataset)
+                return FilledPriceMatrix.load(path)
+
+            return self.stored(path, dataset, reader)
+
+        def reader():
+            matrix = PriceMatrix.from_frame(self.read_dataset(dataset))
+            return FilledPriceMatrix.from_matrix(matrix)
+
+        return self.stored(
+            f"{self.storage.uri(config[dataset])}#filled",
+            dataset,
+            reader,
+        )
+
+    def load_filled_window(
+        self,
+        dataset: str,
+        columns: List[str],
+        start_date: str,
+        end_date: str,
+    ) -> pd.DataFrame:
+        """
+        Every calendar day between two dates with gaps backfilled
+
+        Args:
+            dataset (str): Dataset name in config
+            columns (List[str]): Columns to select
+            start_date (str): start date (%Y-%m-%d format)
+            end_date (str): end date (%Y-%m-%d format)
+
+        Returns:
+            pd.DataFrame: Timeseries with a date column
+        """
+        if self.pushdown:
+            data = self.load_window(dataset, columns, start_date, end_date)
+            return self.fill_calendar(data, start_date, end_date)
+        return self.load_filled(dataset).to_frame(
+            columns, start_date, end_date
+        )
+
+    def snapshot_file(self, dataset: str) -> str:
+        """
+        Location of the Arrow snapshot of a dataset
+
+        Args:
+            dataset (str): Dataset name in config
+
+        Returns:
+            str: Snapshot file path
+        """
+        return os.path.join(self.snapshot_path, f"{dataset}.arrow")
+
+    def build_snapshot(self, dataset: str) -> None:
+        """
+        Write Arrow snapshot of a dataset unless it is already up to date
+
+        Args:
+            dataset (str): Dataset name in config
+        """
+        path = self.snapshot_file(dataset)
+        version = self.storage.version(config[dataset])
+        if snapshot_version(path) != version:
+            write_snapshot(self.read_dataset(dataset), path, version)
+
+    def build_snapshots(self) -> None:
+        """
+        Write the snapshots and calendar filled panels read by requests
+
+        Run once at startup, so workers only map files that are already
+        up to date instead of building them on their first request.
+        """
+        for dataset in snapshot_datasets:
+            self.build_snapshot(dataset)
+        for dataset in filled_datasets:
+            self.build_filled(dataset)
+
+    def load_snapshot(self, dataset: str) -> Any:
+        """
+        Load memory-mapped snapshot of a dataset, building it if needed
+
+        Args:
+            dataset (str): Dataset name in config
+
+        Returns:
+            pa.Table: Table backed by the mapped snapshot
+        """
+
+        def reader():
+            self.build_snapshot(dataset)
+            return read_snapshot(self.snapshot_file(dataset))
+
+        return self.stored(self.snapshot_file(dataset), dataset, reader)
+
+    def load_window(
+        self,
+        dataset: str,
+        columns: List[str],
+        start_date: str,
+        end_date: str,
+    ) -> pd.DataFrame:
+        """
+        Select columns and date range from a stored timeseries
+
+        In pushdown mode the window is read straight from storage instead
+        of the in-memory store. With a snapshot path the window is sliced
+        from the memory-mapped snapshot.
+
+        Args:
+            dataset (str): Dataset name in config
+            columns (List[str]): Columns to select
+            start_date (str): start date (%Y-%m-%d format)
+            end_date (str): end date (%Y-%m-%d format)
+
+        Returns:
+            pd.DataFrame: Timeseries with a date column
+        """
+        if self.pushdown:
+            data = self.read_window(dataset, columns, start_date, end_date)
+            return data.loc[start_date:end_date, columns].reset_index()
+        if self.snapshot_path is not None:
+            snapshot = self.load_snapshot(dataset)
+            return slice_snapshot(snapshot, columns, start_date, end_date)
+        matrix = self.load_matrix(dataset)
+        return matrix.to_frame(columns, start_date, end_date)
+
+    def load_available_funds(self) -> pd.DataFrame:
         """
         Load supported list of tickers from parquet file
 
@@ -39,13 +411,7 @@ class DataLoader(BaseModel):
             pd.DataFrame: ticker and long name
 
         """
-        all_funds = cache.get(config["fund_codes"])
-        if all_funds is None:
-            all_funds = pd.read_parquet(
-                f"{self.base_path}{config['fund_codes']}"
-            )
-        all_funds = all_funds.to_json(orient="records")
-        return json.loads(all_funds)
+        return self.load_dataset("fund_codes")
 
     def slice_data(
         self, timeseries: pd.DataFrame, start_date: str, end_date: str
@@ -90,18 +456,35 @@ class DataLoader(BaseModel):
         """
         data = self.slice_data(timeseries, start_date, end_date)
         if interpolation == "fill":
-            idx = pd.date_range(start_date, end_date)
-            data = data.set_index("date")
-            data.index.name = None
-            data.index = pd.DatetimeIndex(data.index)
-            data = data.reindex(idx, fill_value=np.nan)
-            data = data.interpolate(method="backfill", axis=0)
-            data = data.reset_index(drop=False)
-            data = data.rename(
-                columns={
-                    "index": "date",
-                }
-            )
+            data = self.fill_calendar(data, start_date, end_date)
+        return data
+
+    def fill_calendar(
+        self, timeseries: pd.DataFrame, start_date: str, end_date: str
+    ) -> pd.DataFrame:
+        """
+        Reindex sorted timeseries to every calendar day and backfill gaps
+
+        Args:
+            timeseries (pd.DataFrame): Sorted timeseries within the range
+            start_date (str): start date (%Y-%m-%d format)
+            end_date (str): end date (%Y-%m-%d format)
+
+        Returns:
+            pd.DataFrame
+        """
+        idx = pd.date_range(start_date, end_date)
+        data = timeseries.set_index("date")
+        data.index.name = None
+        data.index = pd.DatetimeIndex(data.index)
+        data = data.reindex(idx, fill_value=np.nan)
+        data = data.interpolate(method="backfill", axis=0)
+        data = data.reset_index(drop=False)
+        data = data.rename(
+            columns={
+                "index": "date",
+            }
+        )
         return data
 
     def load_benchmark(self, start_date: str, end_date: str) -> pd.DataFrame:
@@ -115,16 +498,8 @@ class DataLoader(BaseModel):
         Returns:
             pd.DataFrame
         """
-        benchmark = cache.get(config["sp500"])
-        if benchmark is None:
-            benchmark = pd.read_parquet(f"{self.base_path}{config['sp500']}")
-        benchmark = benchmark.rename(
-            columns={"Date": "date", "close": "market"}
-        )
-        benchmark.date = pd.to_datetime(benchmark.date)
-        benchmark = benchmark.sort_values(by="date").reset_index(drop=True)
-        benchmark = self.backfill_ts(
-            benchmark, start_date, end_date, interpolation="fill"
+        benchmark = self.load_filled_window(
+            "sp500", ["market"], start_date, end_date
         )
         return benchmark
 
@@ -143,16 +518,8 @@ class DataLoader(BaseModel):
             pd.DataFrame:
         """
         columns = ["date"] + fund_codes
-        timeseries = cache.get(config["fund_prices"])
-        if timeseries is None:
-            timeseries = pd.read_parquet(
-                f"{self.base_path}{config['fund_prices']}"
-            )[columns]
-        data = self.backfill_ts(
-            timeseries,
-            start_date=start_date,
-            end_date=end_date,
-            interpolation="fill",
+        data = self.load_filled_window(
+            "fund_prices", fund_codes, start_date, end_date
         )
         data.columns = columns
         return data
@@ -200,6 +567,28 @@ class DataLoader(BaseModel):
 
         return subset_data
 
+    def load_risk_free(self, frequency: str = "daily") -> RiskFreeRate:
+        """
+        Load cumulative Fama-French risk free returns from the data store
+
+        Built once per load / refresh of the factors, so windows of any
+        request are looked up without reading the factors again.
+
+        Args:
+            frequency (str, optional): Frequency of factors
+
+        Returns:
+            RiskFreeRate: Risk free rate for any date window
+        """
+        dataset = f"ff_{frequency}"
+        return self.stored(
+            f"{self.storage.uri(config[dataset])}#risk_free",
+            dataset,
+            lambda: RiskFreeRate.from_matrix(
+                PriceMatrix.from_frame(self.read_dataset(dataset))
+            ),
+        )
+
     def load_ff_factors(
         self,
         regression_factors: List[str],
@@ -221,22 +610,11 @@ class DataLoader(BaseModel):
         """
         columns = ["date"] + regression_factors + ["RF"]
 
-        factors = cache.get(config[f"ff_{frequency}"])
-        if factors is None:
-            factors = pd.read_parquet(
-                f"{self.base_path}{config[f'ff_{frequency}']}"
-            )[columns]
-
-        data = self.backfill_ts(
-            factors,
-            start_date=start_date,
-            end_date=end_date,
-            interpolation=None,
+        data = self.load_window(
+            f"ff_{frequency}",
+            regression_factors + ["RF"],
+            start_date,
+            end_date,
         )
-        # Kenneth French's data is off by factor of 100
-        for k in columns:
-            if k != "date":
-                data[k] = data[k].astype(float)
-                data[k] = data[k] / 100
         data.columns = columns
         return data
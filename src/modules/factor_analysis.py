@@ -1,14 +1,270 @@
-import json
-from typing import Dict, List
+from typing import Callable, Dict, List, Optional
 
 import numpy as np
 import pandas as pd
-import statsmodels.formula.api as smf
 from pydantic import BaseModel
-from statsmodels.regression.linear_model import RegressionResults
-from statsmodels.regression.rolling import RollingOLS
-from statsmodels.stats.diagnostic import het_breuschpagan
-from statsmodels.stats.stattools import durbin_watson
+
+from src.modules.parallel import Executor, config, map_shared
+from src.modules.regression import LinearRegression, RollingRegression
+
+
+class FeatureMatrix:
+    """
+    Fund excess returns and factors aligned on shared dates
+
+    Everything is held in one column-major array laid out as fund excess
+    returns, a column of ones, the regression factors and RF, so the
+    regression targets, the design matrix with its intercept and the
+    Breusch Pagan variables are all contiguous column views.
+
+    Args:
+        dates (pd.DatetimeIndex): Date of each observation
+        values (np.ndarray): Column-major array in the layout above
+        fund_codes (List[str]): Ticker of each excess return column
+        factors (List[str]): Regression factor names
+    """
+
+    def __init__(
+        self,
+        dates: pd.DatetimeIndex,
+        values: np.ndarray,
+        fund_codes: List[str],
+        factors: List[str],
+    ):
+        self.dates = dates
+        self.values = values
+        self.fund_codes = fund_codes
+        self.factors = factors
+
+    @classmethod
+    def from_frames(
+        cls,
+        fund_returns: pd.DataFrame,
+        ff_factors: pd.DataFrame,
+        fund_codes: List[str],
+        factors: List[str],
+    ) -> "FeatureMatrix":
+        """
+        Align fund returns with factors and subtract RF from every fund
+
+        Args:
+            fund_returns (pd.DataFrame): Fund returns with a date column
+            ff_factors (pd.DataFrame): Factors and RF with a date column
+            fund_codes (List[str]): Tickers to regress
+            factors (List[str]): Regression factors to use
+
+        Returns:
+            FeatureMatrix
+        """
+        _, fund_rows, factor_rows = np.intersect1d(
+            fund_returns["date"].to_numpy(),
+            ff_factors["date"].to_numpy(),
+            assume_unique=True,
+            return_indices=True,
+        )
+        n_funds = len(fund_codes)
+        values = np.empty(
+            (len(fund_rows), n_funds + len(factors) + 2), order="F"
+        )
+        risk_free = ff_factors["RF"].to_numpy()[factor_rows]
+        np.subtract(
+            fund_returns[fund_codes].to_numpy()[fund_rows],
+            risk_free[:, None],
+            out=values[:, :n_funds],
+        )
+        values[:, n_funds] = 1
+        values[:, n_funds + 1 :] = ff_factors[factors + ["RF"]].to_numpy()[
+            factor_rows
+        ]
+        dates = pd.DatetimeIndex(fund_returns["date"].to_numpy()[fund_rows])
+        complete = ~np.isnan(values).any(axis=1)
+        if not complete.all():
+            values = np.asfortranarray(values[complete])
+            dates = dates[complete]
+        return cls(dates, values, fund_codes, factors)
+
+    @classmethod
+    def from_arrays(
+        cls,
+        arrays: Dict[str, np.ndarray],
+        fund_codes: List[str],
+        factors: List[str],
+    ) -> "FeatureMatrix":
+        """
+        Rebuild from the arrays returned by arrays, e.g. in shared memory
+
+        Args:
+            arrays (Dict[str, np.ndarray]): dates and values
+            fund_codes (List[str]): Ticker of each excess return column
+            factors (List[str]): Regression factor names
+
+        Returns:
+            FeatureMatrix
+        """
+        # Dates are copied so results never reference the shared buffer
+        dates = pd.DatetimeIndex(np.array(arrays["dates"]))
+        return cls(dates, arrays["values"], fund_codes, factors)
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        """
+        Arrays holding the features, for sharing with worker processes
+
+        Returns:
+            Dict[str, np.ndarray]: dates and values
+        """
+        return {"dates": self.dates.values, "values": self.values}
+
+    @property
+    def excess_returns(self) -> np.ndarray:
+        """Fund returns less RF, one column per ticker"""
+        return self.values[:, : len(self.fund_codes)]
+
+    @property
+    def exog(self) -> np.ndarray:
+        """Design matrix, intercept followed by the regression factors"""
+        n_funds = len(self.fund_codes)
+        return self.values[:, n_funds : n_funds + len(self.factors) + 1]
+
+    @property
+    def exog_het(self) -> np.ndarray:
+        """Regression factors and RF for the Breusch Pagan test"""
+        return self.values[:, len(self.fund_codes) + 1 :]
+
+    @property
+    def param_names(self) -> List[str]:
+        """Name of each column of the design matrix"""
+        return ["Intercept"] + self.factors
+
+
+def summary_results(
+    results: LinearRegression,
+    fund_codes: List[str],
+    param_names: List[str],
+    index: pd.Index,
+    exog_het: np.ndarray,
+) -> List[Dict]:
+    """
+    Split multi-target regression results into a summary per ticker
+
+    Durbin watson test for autocorrelation
+    Breusch Pagan test for heteroscedasticity
+
+    Args:
+        results (LinearRegression): regression of every ticker
+        fund_codes (List[str]): tickers that were regressed, in order
+        param_names (List[str]): name of each regression parameter
+        index (pd.Index): date of each observation
+        exog_het (np.ndarray): variables for the Breusch Pagan test
+
+    Returns:
+        List[Dict]: Summary regression results per ticker
+    """
+    conf_lower, conf_higher = results.conf_int()
+    # 0 - positive autocorrelation, 2 - no autocorrelation, 4 - negative autocorrelation
+    dw_test = results.durbin_watson()
+    bp_lm, bp_pvalue = results.breusch_pagan(exog_het)
+    fvalue = results.fvalue
+    output = []
+    for j, fund_code in enumerate(fund_codes):
+        output_result = {
+            "fund_code": fund_code,
+            "num_observations": results.nobs,
+            "rsquared": results.rsquared[j],
+            "rsquared_adj": results.rsquared_adj[j],
+            "fvalue": fvalue[j],
+            "coefficient": pd.Series(results.params[:, j], param_names),
+            "standard_errors": pd.Series(results.bse[:, j], param_names),
+            "pvalues": pd.Series(results.pvalues[:, j], param_names),
+            "conf_lower": pd.Series(conf_lower[:, j], param_names),
+            "conf_higher": pd.Series(conf_higher[:, j], param_names),
+            "durbin_watson": dw_test[j],
+            "breusch_pagan": {"lm": bp_lm[j], "lm_pvalue": bp_pvalue[j]},
+            "residuals": pd.Series(results.resid[:, j], index),
+        }
+        output.append(output_result)
+    return output
+
+
+def regress_chunk(
+    arrays: Dict[str, np.ndarray],
+    fund_codes: List[str],
+    factors: List[str],
+    start: int,
+    stop: int,
+) -> List[Dict]:
+    """
+    Factor regression of the tickers between two positions
+
+    Args:
+        arrays (Dict[str, np.ndarray]): Arrays of a FeatureMatrix
+        fund_codes (List[str]): every ticker in the feature matrix
+        factors (List[str]): regression factors
+        start (int): position of the first ticker to regress
+        stop (int): position after the last ticker to regress
+
+    Returns:
+        List[Dict]: regression results per ticker
+    """
+    features = FeatureMatrix.from_arrays(arrays, fund_codes, factors)
+    results = LinearRegression(
+        features.exog, features.excess_returns[:, start:stop], constant=True
+    )
+    return summary_results(
+        results,
+        fund_codes[start:stop],
+        features.param_names,
+        features.dates,
+        features.exog_het,
+    )
+
+
+def rolling_regress_chunk(
+    arrays: Dict[str, np.ndarray],
+    fund_codes: List[str],
+    factors: List[str],
+    start: int,
+    stop: int,
+    window: Optional[int],
+    expanding: bool,
+) -> List[Dict]:
+    """
+    Rolling factor regression of the tickers between two positions
+
+    Args:
+        arrays (Dict[str, np.ndarray]): Arrays of a FeatureMatrix
+        fund_codes (List[str]): every ticker in the feature matrix
+        factors (List[str]): regression factors
+        start (int): position of the first ticker to regress
+        stop (int): position after the last ticker to regress
+        window (Optional[int]): observations per regression, every
+            observation so far if None
+        expanding (bool): fit growing windows until the window is full
+
+    Returns:
+        List[Dict]: Regression results per ticker
+    """
+    features = FeatureMatrix.from_arrays(arrays, fund_codes, factors)
+    results = RollingRegression(
+        features.exog,
+        features.excess_returns[:, start:stop],
+        window=window,
+        expanding=expanding,
+        constant=True,
+    )
+    index = features.dates
+    output = []
+    for j, fund_code in enumerate(fund_codes[start:stop]):
+        params = {
+            name: pd.Series(results.params[:, i, j], index)
+            for i, name in enumerate(features.param_names)
+        }
+        output_result = {
+            "fund_code": fund_code,
+            "params": params,
+            "rsquared": pd.Series(results.rsquared[:, j], index),
+        }
+        output.append(output_result)
+    return output
 
 
 class FactorAnalysis(BaseModel):
@@ -18,143 +274,98 @@ class FactorAnalysis(BaseModel):
     factors: List[str]
     fund_returns: pd.DataFrame
     ff_factors: pd.DataFrame
+    executor: Executor = config["executor"]
+    max_workers: Optional[int] = config["max_workers"]
+    chunk_size: int = 100
 
     class Config:
         arbitrary_types_allowed = True
 
-    def get_summary_results(
-        self,
-        results: RegressionResults,
-        fund_code: str,
-        exog_het: pd.DataFrame,
-    ) -> Dict:
+    def generate_features(self) -> FeatureMatrix:
         """
-        Take the result of an statsmodel results table and transforms it into a dataframe
-        https://www.statsmodels.org/stable/generated/statsmodels.regression.linear_model.RegressionResults.html
-
-        Durbin watson test for autocorrelation
-        Breusch Pagan test for heteroscedasticity
-
-        Args:
-            results (RegressionResults): statsmodel regression results
-            fund_code (str): ticker that was regressed
-            exog_het (pd.DataFrame): datafra
+        Generate feature matrix of ticker excess returns and factors
 
         Returns:
-            Dict: Summary regression results
-        """
-        pvals = results.pvalues
-        coefficient = results.params
-        conf_lower = results.conf_int()[0]
-        conf_higher = results.conf_int()[1]
-        standard_errors = results.bse
-        residuals = results.resid
-        num_obs = results.nobs
-        rsquared = results.rsquared
-        rsquared_adj = results.rsquared_adj
-        fvalue = results.fvalue
-        # 0 - positive autocorrelation, 2 - no autocorrelation, 4 - negative autocorrelation
-        dw_test = durbin_watson(residuals)
-        bp_test = het_breuschpagan(residuals, exog_het)
-        output_result = {
-            "fund_code": fund_code,
-            "num_observations": num_obs,
-            "rsquared": rsquared,
-            "rsquared_adj": rsquared_adj,
-            "fvalue": fvalue,
-            "coefficient": coefficient,
-            "standard_errors": standard_errors,
-            "pvalues": pvals,
-            "conf_lower": conf_lower,
-            "conf_higher": conf_higher,
-            "durbin_watson": dw_test,
-            "breusch_pagan": {"lm": bp_test[0], "lm_pvalue": bp_test[1]},
-            "residuals": residuals,
-        }
-        return output_result
+            FeatureMatrix: Excess returns of tickers and factors by date
+        """
+        return FeatureMatrix.from_frames(
+            self.fund_returns, self.ff_factors, self.fund_codes, self.factors
+        )
 
-    def generate_features(self, fund_code: str) -> pd.DataFrame:
+    def map_funds(
+        self, function: Callable, features: FeatureMatrix, *args
+    ) -> List[Dict]:
         """
-        Generate timeseries dataframe containing ticker returns and factors
+        Run a regression over chunks of tickers with the chosen executor
 
         Args:
-            fund_code (str): Ticker to get data for
+            function (Callable): regress_chunk or rolling_regress_chunk
+            features (FeatureMatrix): ticker excess returns and factors
+            *args: extra arguments of function
 
         Returns:
-            pd.DataFrame: _description_
-        """
-        fund_returns = self.fund_returns.copy()
-        ff_factors = self.ff_factors.copy()
-        fund_returns["date"] = fund_returns["date"].dt.strftime("%Y-%m-%d")
-        ff_factors["date"] = ff_factors["date"].dt.strftime("%Y-%m-%d")
-        fund_returns = fund_returns.set_index("date")
-        fund_returns.index.name = None
-        ff_factors = ff_factors.set_index("date")
-        ff_factors.index.name = None
-        regression_data = pd.concat(
-            [fund_returns, ff_factors], axis=1, join="inner"
-        )
-        regression_data[fund_code] = (
-            regression_data[fund_code] - regression_data["RF"]
+            List[Dict]: results per ticker, in ticker order
+        """
+        n_funds = len(features.fund_codes)
+        tasks = [
+            (
+                features.fund_codes,
+                features.factors,
+                start,
+                min(start + self.chunk_size, n_funds),
+            )
+            + args
+            for start in range(0, n_funds, self.chunk_size)
+        ]
+        results = map_shared(
+            function,
+            features.arrays(),
+            tasks,
+            self.executor,
+            self.max_workers,
         )
-        return regression_data
+        return [output for chunk in results for output in chunk]
 
     def calculate_factor_regression(
-        self, fund_code: str, regression_factors: List[str]
-    ) -> Dict:
-        """Factor analysis of ticker against specified factors
+        self, features: FeatureMatrix
+    ) -> List[Dict]:
+        """Factor analysis of tickers against specified factors
+
+        Tickers are solved against the shared factor design in multi-target
+        regressions of up to chunk_size tickers.
 
         Args:
-            fund_code (str): Ticker to regress
-            regression_factors (List[str]): regression factors to use
+            features (FeatureMatrix): ticker excess returns and factors
 
         Returns:
-            Dict: regression results
-        """
-        np.random.seed(1000)
-        regression_equation = " + ".join(regression_factors)
-        regression_data = self.generate_features(fund_code)
-        model = smf.ols(
-            formula=f"{fund_code} ~ {regression_equation}",
-            data=regression_data,
-        )
-        results = model.fit()
-        exog_het = regression_data[regression_factors + ["RF"]]
-        output = self.get_summary_results(results, fund_code, exog_het)
-        return output
+            List[Dict]: regression results per ticker
+        """
+        return self.map_funds(regress_chunk, features)
 
     def calculate_rolling_regression(
-        self, fund_code: str, regression_factors: List[str], frequency: str
-    ) -> Dict:
+        self,
+        features: FeatureMatrix,
+        window: Optional[int],
+        expanding: bool = False,
+    ) -> List[Dict]:
         """
-        Rolling regression using 12 month windows to run factor analysis over time
+        Rolling regression to run factor analysis over time
+
+        Tickers are solved against the shared factor design up to
+        chunk_size tickers at a time.
 
         Args:
-            fund_code (str): ticker to regress
-            regression_factors (List[str]): regression factors to use
-            frequency (str): returns frequency
+            features (FeatureMatrix): ticker excess returns and factors
+            window (Optional[int]): observations per regression, every
+                observation so far if None
+            expanding (bool): fit growing windows until the window is full
 
         Returns:
-            Dict: Regression results
-        """
-        np.random.seed(1000)
-        regression_equation = " + ".join(regression_factors)
-        regression_data = self.generate_features(fund_code)
-        window = 12
-        if frequency == "daily":
-            window = window * 30
-        model = RollingOLS.from_formula(
-            formula=f"{fund_code} ~ {regression_equation}",
-            data=regression_data,
-            window=window,
+            List[Dict]: Regression results per ticker
+        """
+        return self.map_funds(
+            rolling_regress_chunk, features, window, expanding
         )
-        results = model.fit()
-        output = {
-            "fund_code": fund_code,
-            "params": json.loads(results.params.to_json()),
-            "rsquared": json.loads(results.rsquared.to_json()),
-        }
-        return output
 
     def regress_funds(self) -> List[Dict]:
         """
@@ -163,24 +374,33 @@ class FactorAnalysis(BaseModel):
         Returns:
             List[Dict]: Regresion results as dictionary per ticker
         """
-        output = []
-        for i in self.fund_codes:
-            output.append(self.calculate_factor_regression(i, self.factors))
-        return output
+        return self.calculate_factor_regression(self.generate_features())
 
-    def rolling_regress_funds(self, frequency: str) -> List[Dict]:
+    def rolling_regress_funds(
+        self,
+        frequency: str,
+        window: Optional[int] = None,
+        expanding: bool = False,
+    ) -> List[Dict]:
         """
         Rolling regression against specified factors for specified tickers
 
+        Windows default to 12 months (360 days for daily returns). In
+        expanding mode without a window every regression starts from the
+        first observation.
+
         Args:
             frequency (str): Frequency of factor / ticker returns to regress with
+            window (Optional[int]): Observations per regression
+            expanding (bool): Fit growing windows until the window is full
 
         Returns:
             List[Dict]: Regresion results as dictionary per ticker
         """
-        output = []
-        for i in self.fund_codes:
-            output.append(
-                self.calculate_rolling_regression(i, self.factors, frequency)
-            )
-        return output
+        if window is None and not expanding:
+            window = 12
+            if frequency == "daily":
+                window = window * 30
+        return self.calculate_rolling_regression(
+            self.generate_features(), window, expanding
+        )
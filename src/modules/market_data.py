@@ -0,0 +1,587 @@
+import mmap
+import os
+import tempfile
+import time
+from threading import Event, RLock, Thread
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Arrays of saved panels start on cache line boundaries
+PANEL_ALIGNMENT = 64
+
+
+class MarketDataStore:
+    """
+    Process-wide store of market datasets
+
+    Each dataset is loaded once through its loader, kept in memory and
+    reloaded by a background thread once it is older than max_age_seconds.
+    Readers are always served the last loaded copy, so a refresh never
+    blocks a request.
+
+    """
+
+    def __init__(self, max_age_seconds: float = 86400):
+        assert max_age_seconds > 0
+        self.max_age = max_age_seconds
+        self.lock = RLock()
+        self._entries: Dict[str, Tuple[Any, float]] = {}
+        self._loaders: Dict[str, Callable[[], Any]] = {}
+        self._stop = Event()
+        self._refresher = None
+        # Source file and its storage version for each dataset, read
+        # before the file itself so a change during a load shows on the
+        # next refresh
+        self._sources: Dict[str, str] = {}
+        self._versions: Dict[str, str] = {}
+        self._versioners: Dict[str, Callable[[], str]] = {}
+
+    def get(
+        self,
+        key: str,
+        loader: Callable[[], Any],
+        version: Optional[Callable[[], str]] = None,
+        source: Optional[str] = None,
+    ) -> Any:
+        """
+        Return the dataset stored under key, loading it on first use
+
+        Args:
+            key (str): Dataset identifier (usually its path)
+            loader (Callable[[], Any]): Function returning the dataset
+            version (Optional[Callable[[], str]]): Function returning the
+                storage version of the source file, see versions()
+            source (Optional[str]): Source file, key if None
+
+        Returns:
+            Any: Stored dataset
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            return entry[0]
+        with self.lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                source_version = None if version is None else version()
+                entry = (loader(), time.time())
+                self._entries[key] = entry
+                self._loaders[key] = loader
+                if version is not None:
+                    self._sources[key] = key if source is None else source
+                    self._versions[key] = source_version
+                    self._versioners[key] = version
+                self._start_refresher()
+        return entry[0]
+
+    def refresh(self, key: str) -> None:
+        """
+        Reload a dataset and swap it in once loaded
+
+        Args:
+            key (str): Dataset identifier
+        """
+        loader = self._loaders[key]
+        versioner = self._versioners.get(key)
+        source_version = None if versioner is None else versioner()
+        value = loader()
+        with self.lock:
+            self._entries[key] = (value, time.time())
+            if versioner is not None:
+                self._versions[key] = source_version
+
+    def versions(self, sources: List[str]) -> Dict[str, List[str]]:
+        """
+        Storage versions of the loaded datasets read from each source file
+
+        Depends only on the given files, not on whatever else the process
+        has loaded, so results derived from them can be tagged with it.
+
+        Args:
+            sources (List[str]): Source files
+
+        Returns:
+            Dict[str, List[str]]: Distinct versions held of each file,
+                empty if none of its datasets is loaded
+        """
+        with self.lock:
+            loaded = [
+                (self._sources[key], source_version)
+                for key, source_version in self._versions.items()
+            ]
+        return {
+            source: sorted({v for s, v in loaded if s == source})
+            for source in sources
+        }
+
+    def age(self, key: str) -> float:
+        """
+        Seconds since dataset was last loaded, None if never loaded
+
+        Args:
+            key (str): Dataset identifier
+
+        Returns:
+            float: Age in seconds
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        return time.time() - entry[1]
+
+    def clear(self) -> None:
+        """Drop every stored dataset"""
+        with self.lock:
+            self._entries.clear()
+            self._loaders.clear()
+            self._sources.clear()
+            self._versions.clear()
+            self._versioners.clear()
+
+    def stop(self) -> None:
+        """Stop the background refresh thread"""
+        self._stop.set()
+
+    def _start_refresher(self) -> None:
+        if self._refresher is not None and self._refresher.is_alive():
+            return
+        self._stop.clear()
+        self._refresher = Thread(
+            target=self._refresh_loop, name="market-data-refresh", daemon=True
+        )
+        self._refresher.start()
+
+    def _refresh_loop(self) -> None:
+        while not self._stop.is_set():
+            with self.lock:
+                loaded_at = {k: v[1] for k, v in self._entries.items()}
+            now = time.time()
+            wait = self.max_age
+            for key, timestamp in loaded_at.items():
+                expires_in = timestamp + self.max_age - now
+                if expires_in > 0:
+                    wait = min(wait, expires_in)
+                    continue
+                try:
+                    self.refresh(key)
+                except Exception:
+                    # Keep serving the stale copy and retry next cycle
+                    wait = min(wait, 60)
+            self._stop.wait(wait)
+
+
+def prepare_timeseries(
+    data: pd.DataFrame, date_column: str = "date"
+) -> pd.DataFrame:
+    """
+    Convert raw timeseries into a date-indexed, sorted, float frame
+
+    Args:
+        data (pd.DataFrame): Raw timeseries with a date column
+        date_column (str): Name of the date column
+
+    Returns:
+        pd.DataFrame: Timeseries indexed by date
+    """
+    data = data.copy()
+    data[date_column] = pd.to_datetime(data[date_column])
+    data = data.set_index(date_column).sort_index()
+    data.index.name = "date"
+    data = data.astype(float)
+    return data
+
+
+class PriceMatrix:
+    """
+    Dense price panel for slicing without pandas in the request path
+
+    Args:
+        dates (np.ndarray): Sorted datetime64[ns] date axis
+        values (np.ndarray): float64 prices, one row per date
+        columns (List[str]): Ticker of each column in values
+    """
+
+    def __init__(self, dates: np.ndarray, values: np.ndarray, columns: List):
+        self.dates = np.asarray(dates, dtype="datetime64[ns]")
+        self.values = np.ascontiguousarray(values, dtype=np.float64)
+        self.columns = list(columns)
+        self.index = {column: i for i, column in enumerate(self.columns)}
+
+    @classmethod
+    def from_frame(cls, data: pd.DataFrame) -> "PriceMatrix":
+        """
+        Build from a frame prepared by prepare_timeseries
+
+        Args:
+            data (pd.DataFrame): Timeseries indexed by date
+
+        Returns:
+            PriceMatrix
+        """
+        return cls(data.index.values, data.to_numpy(), data.columns)
+
+    def rows(self, start_date: str, end_date: str) -> slice:
+        """
+        Rows between two dates (inclusive)
+
+        Args:
+            start_date (str): start date (%Y-%m-%d format)
+            end_date (str): end date (%Y-%m-%d format)
+
+        Returns:
+            slice: Row positions
+        """
+        start = np.searchsorted(self.dates, np.datetime64(start_date, "ns"))
+        end = np.searchsorted(
+            self.dates, np.datetime64(end_date, "ns"), side="right"
+        )
+        return slice(start, end)
+
+    def window(
+        self, columns: List[str], start_date: str, end_date: str
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Dates and prices of selected tickers between two dates
+
+        Args:
+            columns (List[str]): Tickers to select
+            start_date (str): start date (%Y-%m-%d format)
+            end_date (str): end date (%Y-%m-%d format)
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Dates and prices
+        """
+        rows = self.rows(start_date, end_date)
+        positions = [self.index[column] for column in columns]
+        return self.dates[rows], self.values[rows, positions]
+
+    def to_frame(
+        self, columns: List[str], start_date: str, end_date: str
+    ) -> pd.DataFrame:
+        """
+        Window of selected tickers as a frame with a date column
+
+        Args:
+            columns (List[str]): Tickers to select
+            start_date (str): start date (%Y-%m-%d format)
+            end_date (str): end date (%Y-%m-%d format)
+
+        Returns:
+            pd.DataFrame
+        """
+        dates, values = self.window(columns, start_date, end_date)
+        data = pd.DataFrame(values, columns=columns)
+        data.insert(0, "date", dates)
+        return data
+
+
+class FilledPriceMatrix(PriceMatrix):
+    """
+    Price panel reindexed to every calendar day and backfilled once
+
+    Slicing a window gives the same result as reindexing that window to
+    calendar days and backfilling it on its own: cells whose backfilled
+    value comes from after the end of the window are masked with NaN
+    using the position of the last observation of each column.
+
+    Args:
+        dates (np.ndarray): Every calendar day covered by the panel
+        values (np.ndarray): Backfilled float64 prices
+        columns (List[str]): Ticker of each column in values
+        last_observed (np.ndarray): Row of the last observed price on or
+            before each row, -1 before the first observation
+    """
+
+    def __init__(
+        self,
+        dates: np.ndarray,
+        values: np.ndarray,
+        columns: List,
+        last_observed: np.ndarray,
+    ):
+        super().__init__(dates, values, columns)
+        self.last_observed = last_observed
+
+    @classmethod
+    def from_matrix(cls, matrix: PriceMatrix) -> "FilledPriceMatrix":
+        """
+        Reindex observed prices to calendar days and backfill gaps
+
+        Args:
+            matrix (PriceMatrix): Observed prices
+
+        Returns:
+            FilledPriceMatrix
+        """
+        days = matrix.dates.astype("datetime64[D]")
+        n_columns = len(matrix.columns)
+        if len(days) == 0:
+            empty = np.empty((0, n_columns))
+            return cls(days, empty, matrix.columns, empty.astype(np.int32))
+        calendar = np.arange(days[0], days[-1] + 1)
+        rows = (days - days[0]).astype(np.int64)
+        # Extra NaN row is the fill source for cells with no later price
+        values = np.full((len(calendar) + 1, n_columns), np.nan)
+        values[rows] = matrix.values
+        position = np.arange(len(calendar))[:, None]
+        observed = ~np.isnan(values[:-1])
+        next_observed = np.where(observed, position, len(calendar))
+        next_observed = np.minimum.accumulate(next_observed[::-1])[::-1]
+        filled = np.take_along_axis(values, next_observed, axis=0)
+        last_observed = np.maximum.accumulate(
+            np.where(observed, position, -1)
+        ).astype(np.int32)
+        return cls(calendar, filled, matrix.columns, last_observed)
+
+    def window(
+        self, columns: List[str], start_date: str, end_date: str
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Backfilled prices of selected tickers for every day between dates
+
+        Args:
+            columns (List[str]): Tickers to select
+            start_date (str): start date (%Y-%m-%d format)
+            end_date (str): end date (%Y-%m-%d format)
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Dates and prices
+        """
+        positions = [self.index[column] for column in columns]
+        days = np.arange(
+            np.datetime64(start_date, "D"), np.datetime64(end_date, "D") + 1
+        )
+        n_days = len(self.dates)
+        if n_days == 0:
+            values = np.full((len(days), len(positions)), np.nan)
+            return days.astype("datetime64[ns]"), values
+        first = self.dates[0].astype("datetime64[D]")
+        rows = (days - first).astype(np.int64)
+        values = self.values[np.clip(rows, 0, n_days - 1)[:, None], positions]
+        end_row = min(rows[-1], n_days - 1) if len(rows) else -1
+        if end_row >= 0:
+            last = self.last_observed[end_row, positions]
+        else:
+            last = np.full(len(positions), -1)
+        # Columns with no price by end_date stay empty, days before the
+        # panel starts are filled from its first row like any other gap
+        values[(rows[:, None] > last) | (last < 0)] = np.nan
+        return days.astype("datetime64[ns]"), values
+
+    def save(self, path: str, version: Optional[str] = None) -> None:
+        """
+        Write panel to one file that can be memory-mapped by every worker
+
+        The version of the source and each array are stored one after
+        another in .npy format, aligned for mapping. The file is written
+        under a unique temporary name and renamed into place, so readers
+        and concurrent writers only ever see a complete panel.
+
+        Args:
+            path (str): File to write
+            version (Optional[str]): Version of the source
+        """
+        arrays = [
+            np.array("" if version is None else version),
+            np.array(self.columns, dtype=str),
+            self.dates,
+            self.values,
+            self.last_observed,
+        ]
+        directory = os.path.dirname(path) or "."
+        os.makedirs(directory, exist_ok=True)
+        handle, temp_path = tempfile.mkstemp(dir=directory)
+        try:
+            with os.fdopen(handle, "wb") as f:
+                for array in arrays:
+                    np.lib.format.write_array(f, array)
+                    f.write(b"\0" * (-f.tell() % PANEL_ALIGNMENT))
+            os.chmod(temp_path, 0o644)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    @staticmethod
+    def read_arrays(path: str, count: int) -> List[np.ndarray]:
+        """
+        Map the first arrays of a file written by save
+
+        The whole file is mapped through one handle, so the arrays always
+        come from the same panel even if it is replaced meanwhile.
+
+        Args:
+            path (str): File written by save
+            count (int): Number of arrays to map
+
+        Returns:
+            List[np.ndarray]: Read-only arrays backed by the mapping
+        """
+        arrays = []
+        with open(path, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            for _ in range(count):
+                version = np.lib.format.read_magic(f)
+                if version == (1, 0):
+                    header = np.lib.format.read_array_header_1_0(f)
+                else:
+                    header = np.lib.format.read_array_header_2_0(f)
+                shape, fortran_order, dtype = header
+                order = "F" if fortran_order else "C"
+                array = np.ndarray(
+                    shape, dtype, buffer=buffer, offset=f.tell(), order=order
+                )
+                arrays.append(array)
+                end = f.tell() + array.nbytes
+                f.seek(end + -end % PANEL_ALIGNMENT)
+        return arrays
+
+    @classmethod
+    def saved_version(cls, path: str) -> Optional[str]:
+        """
+        Source version recorded in a saved panel, None if there is none
+
+        Args:
+            path (str): File written by save
+
+        Returns:
+            Optional[str]: Version of the source the panel was built from
+        """
+        if not os.path.exists(path):
+            return None
+        (version,) = cls.read_arrays(path, 1)
+        return str(version) or None
+
+    @classmethod
+    def load(cls, path: str) -> "FilledPriceMatrix":
+        """
+        Memory-map panel written by save
+
+        Args:
+            path (str): File written by save
+
+        Returns:
+            FilledPriceMatrix
+        """
+        _, columns, dates, values, last_observed = cls.read_arrays(path, 5)
+        return cls(dates, values, columns.tolist(), last_observed)
+
+
+class RiskFreeRate:
+    """
+    Cumulative risk free returns for O(1) lookups over any date window
+
+    Rates and their log growth are accumulated once, so the average or
+    compounded rate between two dates is the difference of two cumulative
+    values. Dates may be strings or datetime64 arrays, arrays give one
+    rate per window. Windows without observations, such as one past the
+    latest release, take the last rate published before their end.
+
+    Args:
+        dates (np.ndarray): Sorted datetime64 dates of the observations
+        rates (np.ndarray): Risk free return of each period
+    """
+
+    def __init__(self, dates: np.ndarray, rates: np.ndarray):
+        self.dates = np.asarray(dates, dtype="datetime64[ns]")
+        rates = np.asarray(rates, dtype=np.float64)
+        self.rates = rates
+        self.cumulative_rate = np.concatenate(([0.0], np.cumsum(rates)))
+        self.cumulative_growth = np.concatenate(
+            ([0.0], np.cumsum(np.log1p(rates)))
+        )
+        self.periods_per_year = np.nan
+        if len(self.dates) > 1:
+            days = (self.dates[-1] - self.dates[0]) / np.timedelta64(1, "D")
+            if days > 0:
+                self.periods_per_year = (len(self.dates) - 1) / (days / 365.25)
+
+    @classmethod
+    def from_matrix(
+        cls, matrix: PriceMatrix, column: str = "RF"
+    ) -> "RiskFreeRate":
+        """
+        Build from the Fama-French factors of a PriceMatrix
+
+        Args:
+            matrix (PriceMatrix): Factors, one row per period
+            column (str): Risk free column
+
+        Returns:
+            RiskFreeRate
+        """
+        return cls(matrix.dates, matrix.values[:, matrix.index[column]])
+
+    def rows(self, start_date: Any, end_date: Any) -> Tuple[Any, Any]:
+        """
+        First and one past the last observation between dates (inclusive)
+
+        Args:
+            start_date (Any): start date(s)
+            end_date (Any): end date(s)
+
+        Returns:
+            Tuple[Any, Any]: Positions in the cumulative arrays
+        """
+        start_date = np.asarray(start_date, dtype="datetime64[ns]")
+        end_date = np.asarray(end_date, dtype="datetime64[ns]")
+        start = np.searchsorted(self.dates, start_date)
+        end = np.searchsorted(self.dates, end_date, side="right")
+        return start, end
+
+    def last_rate(self, end: Any) -> Any:
+        """
+        Rate of the last observation before a position, the first if none
+
+        Args:
+            end (Any): One past the last observation of the window(s)
+
+        Returns:
+            Any: Rate(s), NaN without any observation
+        """
+        if len(self.rates) == 0:
+            return np.full(np.shape(end), np.nan)
+        return self.rates[np.clip(end - 1, 0, len(self.rates) - 1)]
+
+    def average(self, start_date: Any, end_date: Any) -> Any:
+        """
+        Mean rate per period between dates (inclusive)
+
+        Args:
+            start_date (Any): start date(s)
+            end_date (Any): end date(s)
+
+        Returns:
+            Any: Average rate(s), last rate before end_date without
+                observations
+        """
+        start, end = self.rows(start_date, end_date)
+        count = end - start
+        total = self.cumulative_rate[end] - self.cumulative_rate[start]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(count > 0, total / count, self.last_rate(end))[()]
+
+    def annualised(self, start_date: Any, end_date: Any) -> Any:
+        """
+        Annual rate compounding the average growth between dates (inclusive)
+
+        Annualising the observations held instead of the calendar span
+        keeps the rate right for windows ending after the latest release.
+
+        Args:
+            start_date (Any): start date(s)
+            end_date (Any): end date(s)
+
+        Returns:
+            Any: Annual rate(s), last rate before end_date compounded
+                without observations
+        """
+        start, end = self.rows(start_date, end_date)
+        count = end - start
+        growth = self.cumulative_growth[end] - self.cumulative_growth[start]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            growth = np.where(
+                count > 0, growth / count, np.log1p(self.last_rate(end))
+            )
+            return np.expm1(growth * self.periods_per_year)[()]
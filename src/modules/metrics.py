@@ -1,274 +1,522 @@
-import json
-from typing import Dict, Tuple
+from typing import Any, Dict, List, Optional, Union
 
 import numpy as np
 import pandas as pd
-import statsmodels.formula.api as smf
 from pydantic import BaseModel
 
+from .data_loader import DataLoader
+from .market_data import RiskFreeRate
+
+# Scale of each ratio computed in the metrics kernels
+scales = {
+    "sharpe_ratio": "std_m",
+    "sortino_ratio": "std_downside_m",
+    "treynor_ratio": "beta",
+}
+
+
+def period_ends(dates: np.ndarray, unit: str) -> np.ndarray:
+    """
+    Positions of the last date of each month or year, and the last date
+
+    Args:
+        dates (np.ndarray): Increasing datetime64 dates
+        unit (str): "M" for months, "Y" for years
+
+    Returns:
+        np.ndarray: Positions of period ends
+    """
+    days = dates.astype("datetime64[D]")
+    periods = days.astype(f"datetime64[{unit}]")
+    ends = (days + 1).astype(f"datetime64[{unit}]") != periods
+    ends[-1] = True
+    return np.flatnonzero(ends)
+
+
+def geometric_mean(returns: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    """
+    Geometric mean of the masked returns of each column, NaN without any
+
+    Args:
+        returns (np.ndarray): Returns (K x N)
+        mask (np.ndarray): Returns to include (K x N)
+
+    Returns:
+        np.ndarray: Geometric mean of each column (N)
+    """
+    count = mask.sum(axis=0)
+    growth = np.where(mask, returns + 1.0, 1.0).prod(axis=0)
+    with np.errstate(divide="ignore"):
+        return np.where(
+            count > 0, np.power(growth, 1 / np.maximum(count, 1)) - 1.0, np.nan
+        )
 
-class Metrics(BaseModel):
-    def returns(self, series: pd.Series) -> pd.Series:
-        """
-        Calculate returns for a given series
 
-        Args:
-            series (pd.Series): Series for index / ticker
+def batch_metrics_kernel(
+    portfolios: np.ndarray,
+    market: np.ndarray,
+    dates: np.ndarray,
+    risk_free: float,
+) -> Dict[str, np.ndarray]:
+    """
+    Summary metrics of many portfolios against one market, column-wise
+
+    Month end levels are taken by position and every moment comes from
+    masked sums of the centred monthly returns of all portfolios at once,
+    so alpha, beta and r squared are closed form instead of a regression.
+    Months where a portfolio or the market is missing are left out of
+    that portfolio's moments.
+
+    Args:
+        portfolios (np.ndarray): Daily index of each portfolio (T x N)
+        market (np.ndarray): Daily market index on the same dates (T)
+        dates (np.ndarray): Increasing datetime64 dates (T)
+        risk_free (float): Annual risk free rate
+
+    Returns:
+        Dict[str, np.ndarray]: Metrics keyed by name, one per portfolio;
+            ratios over a zero scale are NaN
+    """
+    months = period_ends(dates, "M")
+    portfolio_levels = portfolios[months]
+    market_levels = market[months][:, None]
+    portfolio_returns = portfolio_levels[1:] / portfolio_levels[:-1] - 1
+    market_returns = market_levels[1:] / market_levels[:-1] - 1
+    valid = ~np.isnan(portfolio_returns) & ~np.isnan(market_returns)
+    portfolio_returns = np.where(valid, portfolio_returns, 0.0)
+    market_returns = np.where(valid, market_returns, 0.0)
+    n_months = valid.sum(axis=0)
+    n = np.maximum(n_months, 1)
+
+    mean_p = portfolio_returns.sum(axis=0) / n
+    mean_m = market_returns.sum(axis=0) / n
+    centred_p = (portfolio_returns - mean_p) * valid
+    centred_m = (market_returns - mean_m) * valid
+    var_p = np.einsum("ij,ij->j", centred_p, centred_p) / n
+    var_m = np.einsum("ij,ij->j", centred_m, centred_m) / n
+    cov_pm = np.einsum("ij,ij->j", centred_p, centred_m) / n
+    several = n_months >= 2
+    std_m = np.where(several, np.sqrt(var_p), 0.0)
+    tracking_error = np.where(
+        several, np.sqrt(np.maximum(var_p + var_m - 2 * cov_pm, 0.0)), 0.0
+    )
+
+    downside = valid & (portfolio_returns < 0)
+    n_downside = np.maximum(downside.sum(axis=0), 1)
+    mean_downside = (portfolio_returns * downside).sum(axis=0) / n_downside
+    centred_downside = (portfolio_returns - mean_downside) * downside
+    std_downside_m = np.where(
+        downside.sum(axis=0) >= 2,
+        np.sqrt((centred_downside**2).sum(axis=0) / n_downside),
+        0.0,
+    )
+
+    n_years = (dates[-1] - dates[0]) / np.timedelta64(1, "D") / 365.25
+    cagr = np.power(portfolios[-1] / portfolios[0], 1 / n_years) - 1
+    market_cagr = np.power(market[-1] / market[0], 1 / n_years) - 1
+    max_drawdown = 1.0 - np.min(
+        portfolios / np.maximum.accumulate(portfolios, axis=0), axis=0
+    )
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        beta = cov_pm / var_m
+        alpha = mean_p - beta * mean_m
+        market_correlation = cov_pm / np.sqrt(var_p * var_m)
+
+        def ratio(value: np.ndarray, scale: np.ndarray) -> np.ndarray:
+            return np.where(scale == 0, np.nan, (value - risk_free) / scale)
+
+        geometric_mean_m = geometric_mean(portfolio_returns, valid)
+        up = valid & (market_returns > 0)
+        down = valid & (market_returns < 0)
+        upside_capture_ratio = geometric_mean(
+            portfolio_returns, up
+        ) / geometric_mean(market_returns, up)
+        downside_capture_ratio = geometric_mean(
+            portfolio_returns, down
+        ) / geometric_mean(market_returns, down)
+        return {
+            "risk_free": np.full(len(cagr), risk_free),
+            "arithmetic_mean_m": mean_p,
+            "arithmetic_mean_y": np.power(1 + mean_p, 12) - 1,
+            "geometric_mean_m": geometric_mean_m,
+            "geometric_mean_y": np.power(1 + geometric_mean_m, 12) - 1,
+            "std_m": std_m,
+            "std_downside_m": std_downside_m,
+            "market_correlation": market_correlation,
+            "alpha": alpha,
+            "beta": beta,
+            "r_squared": market_correlation**2,
+            "cagr": cagr,
+            "sharpe_ratio": ratio(cagr, std_m),
+            "sortino_ratio": ratio(cagr, std_downside_m),
+            "treynor_ratio": ratio(cagr, beta),
+            "calmar_ratio": cagr / max_drawdown,
+            "max_drawdown": max_drawdown,
+            "active_return": cagr - market_cagr,
+            "tracking_error": tracking_error,
+            "information_ratio": (cagr - market_cagr) / tracking_error,
+            "upside_capture_ratio": upside_capture_ratio,
+            "downside_capture_ratio": downside_capture_ratio,
+            "capture_ratio": upside_capture_ratio / downside_capture_ratio,
+        }
 
-        Returns:
-            pd.Series: Return after each period
-        """
-        return (series / series.shift(periods=1)) - 1
 
-    def std(self, series: pd.Series) -> float:
-        """Calculate the standard deviation for a given series
+def metrics_kernel(
+    portfolio: np.ndarray,
+    market: np.ndarray,
+    dates: np.ndarray,
+    risk_free: float,
+) -> Dict[str, float]:
+    """
+    Summary metrics of a portfolio against the market
+
+    Args:
+        portfolio (np.ndarray): Daily portfolio index
+        market (np.ndarray): Daily market index on the same dates
+        dates (np.ndarray): Increasing datetime64 dates
+        risk_free (float): Annual risk free rate
+
+    Returns:
+        Dict[str, float]: Metrics keyed by name, ratios over a zero scale
+            are None
+    """
+    metrics = batch_metrics_kernel(
+        portfolio[:, None], market, dates, risk_free
+    )
+    result = {key: value[0] for key, value in metrics.items()}
+    for key, scale in scales.items():
+        if result[scale] == 0:
+            result[key] = None
+    return result
+
+
+def sliding_sum(values: np.ndarray, window: int) -> np.ndarray:
+    """
+    Sum of every window of consecutive values, from one cumulative sum
+
+    Args:
+        values (np.ndarray): Values along the first axis
+        window (int): Values per window
+
+    Returns:
+        np.ndarray: Sum of the window ending at each position, from
+            position window - 1
+    """
+    total = np.cumsum(values, axis=0)
+    total[window:] = total[window:] - total[:-window]
+    return total[window - 1 :]
+
+
+def sliding_max_drawdown(levels: np.ndarray, window: int) -> np.ndarray:
+    """
+    Largest fall from a high to a later low within every window of levels
+
+    Levels are cut into blocks of window values. Within each block running
+    maxima, minima and largest falls are accumulated forwards and
+    backwards, so every window is the suffix of one block joined to the
+    prefix of the next and costs O(1), whatever the window length.
+
+    Args:
+        levels (np.ndarray): Positive index levels
+        window (int): Levels per window
+
+    Returns:
+        np.ndarray: Max drawdown of the window ending at each position,
+            from position window - 1
+    """
+    n_levels = len(levels)
+    n_blocks = -(-n_levels // window)
+    log_levels = np.log(levels)
+    padded = np.concatenate(
+        (log_levels, np.full(n_blocks * window - n_levels, log_levels[-1]))
+    )
+    blocks = padded.reshape(n_blocks, window)
+    prefix_max = np.maximum.accumulate(blocks, axis=1)
+    prefix_min = np.minimum.accumulate(blocks, axis=1)
+    prefix_fall = np.maximum.accumulate(prefix_max - blocks, axis=1)
+    reverse = blocks[:, ::-1]
+    suffix_max = np.maximum.accumulate(reverse, axis=1)[:, ::-1]
+    suffix_min = np.minimum.accumulate(reverse, axis=1)[:, ::-1]
+    suffix_fall = np.maximum.accumulate(
+        (blocks - suffix_min)[:, ::-1], axis=1
+    )[:, ::-1]
+    start = np.arange(n_levels - window + 1)
+    end = start + window - 1
+    suffix_max, suffix_min, suffix_fall = (
+        i.ravel()[start] for i in (suffix_max, suffix_min, suffix_fall)
+    )
+    prefix_min, prefix_fall = (
+        i.ravel()[end] for i in (prefix_min, prefix_fall)
+    )
+    fall = np.maximum(
+        np.maximum(suffix_fall, prefix_fall), suffix_max - prefix_min
+    )
+    # Windows aligned with a block are the whole block
+    fall = np.where(start % window == 0, suffix_fall, fall)
+    return 1.0 - np.exp(-fall)
+
+
+def rolling_metrics_kernel(
+    portfolio: np.ndarray,
+    market: np.ndarray,
+    window: int,
+    risk_free: Union[float, np.ndarray],
+    periods_per_year: float = 365.25,
+) -> Dict[str, np.ndarray]:
+    """
+    Risk metrics over the last window returns at every date
+
+    Returns are demeaned once and every moment of a window is the
+    difference of two cumulative sums, so each date costs O(1) whatever
+    the window length. Returns, volatilities and ratios are annualised,
+    the return of a window is its compound annual growth and the
+    downside deviation is the standard deviation of its negative returns.
+
+    Args:
+        portfolio (np.ndarray): Portfolio index (T)
+        market (np.ndarray): Market index on the same dates (T)
+        window (int): Returns per window
+        risk_free (Union[float, np.ndarray]): Annual risk free rate, or one
+            per window ending after the first window dates
+        periods_per_year (float): Rows per year, calendar days by default
+
+    Returns:
+        Dict[str, np.ndarray]: Metric of the window ending at each date,
+            NaN for the first window dates
+    """
+    n_rows = len(portfolio)
+    result = {
+        key: np.full(n_rows, np.nan)
+        for key in [
+            "risk_free",
+            "return",
+            "volatility",
+            "sharpe_ratio",
+            "sortino_ratio",
+            "beta",
+            "tracking_error",
+            "max_drawdown",
+        ]
+    }
+    if window >= n_rows:
+        return result
+    portfolio_returns = portfolio[1:] / portfolio[:-1] - 1
+    market_returns = market[1:] / market[:-1] - 1
+    returns = np.stack(
+        (portfolio_returns, market_returns, portfolio_returns - market_returns)
+    )
+    negative = np.minimum(portfolio_returns, 0.0)
+    count = sliding_sum((negative < 0).astype(float), window)
+    negative_sum = sliding_sum(negative, window)
+    negative_squares = sliding_sum(negative**2, window)
+    # Demeaned returns keep the differences of cumulative sums precise
+    centred = returns - returns.mean(axis=1, keepdims=True)
+    sums = sliding_sum(centred.T, window) / window
+    squares = sliding_sum((centred**2).T, window) / window
+    cross = sliding_sum(centred[0] * centred[1], window) / window
+    variance = np.maximum(squares - sums**2, 0.0)
+    covariance = cross - sums[:, 0] * sums[:, 1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        downside = np.where(
+            count >= 2,
+            np.sqrt(
+                np.maximum(
+                    negative_squares / count - (negative_sum / count) ** 2,
+                    0.0,
+                )
+            ),
+            0.0,
+        )
+        growth = portfolio[window:] / portfolio[:-window]
+        annual_return = np.power(growth, periods_per_year / window) - 1
+        volatility = np.sqrt(variance[:, 0] * periods_per_year)
+        downside *= np.sqrt(periods_per_year)
+
+        def ratio(scale: np.ndarray) -> np.ndarray:
+            return np.where(
+                scale == 0, np.nan, (annual_return - risk_free) / scale
+            )
 
-        Args:
-            series (pd.Series): Ticker Returns
+        rolling = {
+            "risk_free": risk_free,
+            "return": annual_return,
+            "volatility": volatility,
+            "sharpe_ratio": ratio(volatility),
+            "sortino_ratio": ratio(downside),
+            "beta": covariance / variance[:, 1],
+            "tracking_error": np.sqrt(variance[:, 2] * periods_per_year),
+            "max_drawdown": sliding_max_drawdown(portfolio, window + 1),
+        }
+    for key, values in rolling.items():
+        result[key][window:] = values
+    return result
 
-        Returns:
-            float: standard deviation
-        """
-        if len(series) < 2:
-            result = 0
-        else:
-            result = np.std(series)
-        return result
 
-    def geometric_mean(self, series: np.array) -> float:
+class Metrics(BaseModel):
+    # Annual risk free rate, or the risk free returns to compound over the
+    # portfolio dates, Fama-French RF if None
+    risk_free: Optional[Union[float, RiskFreeRate]] = None
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    def risk_free_rate(self, start_date: Any, end_date: Any) -> Any:
         """
-        Calculate geometric mean of a given series
+        Annual risk free rate between dates
 
         Args:
-            series (np.array): Series of returns
+            start_date (Any): start date(s)
+            end_date (Any): end date(s)
 
         Returns:
-            float: Geometric mean
+            Any: risk_free if a rate, else risk free returns (daily
+                Fama-French RF by default) compounded to an annual rate,
+                one per pair of dates
         """
-        return np.power(np.prod(series + 1.0), 1 / len(series)) - 1.0
+        risk_free = self.risk_free
+        if risk_free is None:
+            risk_free = DataLoader().load_risk_free()
+        if isinstance(risk_free, RiskFreeRate):
+            return risk_free.annualised(start_date, end_date)
+        return risk_free
 
-    def annualise_returns(self, value: float) -> float:
+    def returns(self, series: pd.Series) -> pd.Series:
         """
-        Annualise monthly returns
+        Calculate returns for a given series
 
         Args:
-            value (float): Monthly return
+            series (pd.Series): Series for index / ticker
 
         Returns:
-            float: Annual return
+            pd.Series: Return after each period
         """
-        return np.power(1 + value, 12) - 1
+        return (series / series.shift(periods=1)) - 1
 
-    def cagr(self, series: pd.Series, dates: pd.Series) -> float:
+    def drawdown(self, portfolio: pd.DataFrame) -> pd.DataFrame:
         """
-        Calculate the compound annual growth rate from a series
+        Calculate drawdowns of a given period
 
         Args:
-            series (pd.Series): Series of index levels
-            dates (pd.Series): Dates corresponding to the series
+            portfolio (pd.DataFrame): DataFrame containing portfolio index
 
         Returns:
-            float: Compound annual growth rate
+            pd.DataFrame: Portfolio drawdown
         """
-        start_value = series[0]
-        end_value = series.iloc[-1]
-        start_date = dates[0]
-        end_date = dates.iloc[-1]
-        n_years = (end_date - start_date).days / 365.25
-        return np.power(end_value / start_value, 1 / n_years) - 1
-
-    def ratio(
-        self, portfolio_return: float, risk_free: float, std: float
-    ) -> float:
+        rolling_max = portfolio["portfolio"].cummax()
+        portfolio["drawdown"] = portfolio["portfolio"] / rolling_max - 1.0
+        return portfolio[["date", "drawdown"]]
+
+    def period_returns(
+        self, portfolio: pd.DataFrame, positions: np.ndarray
+    ) -> pd.DataFrame:
         """
-        Function to calculate sharpe, sortino / other similar ratios
+        Portfolio and market returns between period ends
 
         Args:
-            portfolio_return (float): portfolio return
-            risk_free (float): risk free
-            std (float): standard deviation
+            portfolio (pd.DataFrame): DataFrame containing portfolio index
+            positions (np.ndarray): Positions of period ends
 
         Returns:
-            float: corresponding ratio
+            pd.DataFrame: Rows at period ends after the first, with returns
         """
-        if std == 0:
-            result = None
-        else:
-            result = (portfolio_return - risk_free) / std
-        return result
+        periods = portfolio.take(positions).reset_index(drop=True)
+        periods["portfolio_returns"] = self.returns(periods["portfolio"])
+        periods["market_returns"] = self.returns(periods["market"])
+        return periods.dropna().reset_index(drop=True)
 
-    def drawdown(self, portfolio: pd.DataFrame) -> pd.DataFrame:
+    def timeseries(self, portfolio: pd.DataFrame) -> Dict:
         """
-        Calculate drawdowns of a given period
+        Annual and monthly returns and daily drawdowns of a portfolio
 
         Args:
-            portfolio (pd.DataFrame): DataFrame containing portfolio index
+            portfolio (pd.DataFrame): DataFrame containing portfolio index over time
 
         Returns:
-            pd.DataFrame: Portfolio drawdown
+            Dict: Timeseries as DataFrames
         """
-        rolling_max = portfolio["portfolio"].cummax()
-        portfolio["drawdown"] = portfolio["portfolio"] / rolling_max - 1.0
-        return portfolio[["date", "drawdown"]]
+        dates = portfolio["date"].to_numpy()
+        portfolio_m = self.period_returns(portfolio, period_ends(dates, "M"))
+        portfolio_y = self.period_returns(portfolio, period_ends(dates, "Y"))
+        daily_drawdowns = self.drawdown(portfolio)
+        return {
+            "annual": {
+                "return": portfolio_y,
+            },
+            "monthly": {
+                "return": portfolio_m,
+            },
+            "daily": {"drawdown": daily_drawdowns},
+        }
 
-    def market_correlation(
-        self, portfolio: np.array, market: np.array
-    ) -> float:
+    def metrics(self, portfolio: pd.DataFrame) -> Dict:
         """
-        Calculate correlation between portfolio and market
+        Calculate metrics for a portfolio
 
         Args:
-            portfolio (np.array): portfolio returns
-            market (np.array): market returns
+            portfolio (pd.DataFrame): DataFrame containing portfolio index over time
 
         Returns:
-            float: correlation coefficient
+            Dict: Massive set of metrics, timeseries as DataFrames
         """
-        return np.corrcoef(portfolio, market)[0, 1]
+        dates = portfolio["date"].to_numpy()
+        metrics = metrics_kernel(
+            portfolio["portfolio"].to_numpy(dtype=float),
+            portfolio["market"].to_numpy(dtype=float),
+            dates,
+            self.risk_free_rate(dates[0], dates[-1]),
+        )
+        return {"metrics": metrics, **self.timeseries(portfolio)}
 
-    def regress_market(self, data: pd.DataFrame) -> Tuple:
+    def batch_metrics(
+        self, portfolios: np.ndarray, market: np.ndarray, dates: np.ndarray
+    ) -> Dict[str, np.ndarray]:
         """
-        Calculate alpha and beta for portfolio, using linear regression against benchmark
+        Calculate metrics for many portfolios over the same dates at once
 
         Args:
-            data (pd.DataFrame): DataFrame containing portfolio and benchmark returns
+            portfolios (np.ndarray): Index of each portfolio (T x N)
+            market (np.ndarray): Market index (T)
+            dates (np.ndarray): Dates of the rows (T)
 
         Returns:
-            Tuple: Tuple containing: alpha, beta and r squared
+            Dict[str, np.ndarray]: Every metric of metrics, one value per
+                portfolio
         """
-        model = smf.ols(
-            formula="portfolio_returns ~ market_returns", data=data
-        )
-        results = model.fit()
-        return (
-            results.params["Intercept"],
-            results.params["market_returns"],
-            results.rsquared,
+        return batch_metrics_kernel(
+            np.asarray(portfolios, dtype=float),
+            np.asarray(market, dtype=float),
+            dates,
+            self.risk_free_rate(dates[0], dates[-1]),
         )
 
-    def metrics(self, portfolio: pd.DataFrame) -> Dict:
+    def rolling_metrics(
+        self, portfolio: pd.DataFrame, windows: List[int]
+    ) -> Dict[int, pd.DataFrame]:
         """
-        Calculate metrics for a portfolio
+        Calculate rolling risk metrics of a portfolio for each window
 
         Args:
             portfolio (pd.DataFrame): DataFrame containing portfolio index over time
+            windows (List[int]): Returns per window
 
         Returns:
-            Dict: Massive set of metrics
+            Dict[int, pd.DataFrame]: Metrics by date for each window
         """
-        # Needs to be dynamically loaded eventually
-        risk_free = 0.01
-        portfolio_m = portfolio.loc[
-            (
-                (portfolio["date"].dt.is_month_end)
-                | (portfolio["date"] == max(portfolio["date"]))
-            )
-        ].reset_index(drop=True)
-        portfolio_y = portfolio.loc[
-            (
-                (portfolio["date"].dt.is_year_end)
-                | (portfolio["date"] == max(portfolio["date"]))
-            )
-        ].reset_index(drop=True)
-        portfolio_m["portfolio_returns"] = self.returns(
-            portfolio_m["portfolio"]
-        )
-        portfolio_m["market_returns"] = self.returns(portfolio_m["market"])
-        portfolio_m = portfolio_m.dropna().reset_index(drop=True)
-        portfolio_y["portfolio_returns"] = self.returns(
-            portfolio_y["portfolio"]
-        )
-        portfolio_y["market_returns"] = self.returns(portfolio_y["market"])
-        portfolio_y = portfolio_y.dropna().reset_index(drop=True)
-        arithmetic_mean_m = portfolio_m["portfolio_returns"].mean()
-        geometric_mean_m = self.geometric_mean(
-            portfolio_m["portfolio_returns"].values
-        )
-        arithmetic_mean_y = self.annualise_returns(arithmetic_mean_m)
-        geometric_mean_y = self.annualise_returns(geometric_mean_m)
-        cagr = self.cagr(portfolio["portfolio"], portfolio["date"])
-        market_cagr = self.cagr(portfolio["market"], portfolio["date"])
-        negative_returns = portfolio_m.loc[
-            portfolio_m["portfolio_returns"] < 0
-        ]
-        monthly_std = self.std(portfolio_m["portfolio_returns"])
-        negative_std = self.std(negative_returns["portfolio_returns"])
-        daily_drawdowns = self.drawdown(portfolio)
-        max_drawdown = daily_drawdowns["drawdown"].values.min() * -1.0
-        daily_drawdowns
-        market_correlation = self.market_correlation(
-            portfolio_m["portfolio_returns"].values,
-            portfolio_m["market_returns"].values,
-        )
-        alpha, beta, r_squared = self.regress_market(portfolio_m)
-        sharpe_ratio = self.ratio(
-            portfolio_return=cagr, risk_free=risk_free, std=monthly_std
-        )
-        sortino_ratio = self.ratio(
-            portfolio_return=cagr, risk_free=risk_free, std=negative_std
-        )
-        treynor_ratio = self.ratio(
-            portfolio_return=cagr, risk_free=risk_free, std=beta
-        )
-        calmar_ratio = cagr / max_drawdown
-        active_return = cagr - market_cagr
-        tracking_error = self.std(
-            portfolio_m["portfolio_returns"] - portfolio_m["market_returns"]
-        )
-        information_ratio = active_return / tracking_error
-        positive_market_periods = portfolio_m.loc[
-            portfolio_m["market_returns"] > 0
-        ]
-        negative_market_periods = portfolio_m.loc[
-            portfolio_m["market_returns"] < 0
-        ]
-        upside_capture_ratio = self.geometric_mean(
-            positive_market_periods["portfolio_returns"]
-        ) / self.geometric_mean(positive_market_periods["market_returns"])
-        downside_capture_ratio = self.geometric_mean(
-            negative_market_periods["portfolio_returns"]
-        ) / self.geometric_mean(negative_market_periods["market_returns"])
-        capture_ratio = upside_capture_ratio / downside_capture_ratio
-        portfolio_m["date"] = portfolio_m["date"].dt.strftime("%Y-%m-%d")
-        portfolio_y["date"] = portfolio_y["date"].dt.strftime("%Y-%m-%d")
-        daily_drawdowns["date"] = daily_drawdowns["date"].dt.strftime(
-            "%Y-%m-%d"
-        )
-        result = {
-            "metrics": {
-                "arithmetic_mean_m": arithmetic_mean_m,
-                "arithmetic_mean_y": arithmetic_mean_y,
-                "geometric_mean_m": geometric_mean_m,
-                "geometric_mean_y": geometric_mean_y,
-                "std_m": monthly_std,
-                "std_downside_m": negative_std,
-                "market_correlation": market_correlation,
-                "alpha": alpha,
-                "beta": beta,
-                "r_squared": r_squared,
-                "cagr": cagr,
-                "sharpe_ratio": sharpe_ratio,
-                "sortino_ratio": sortino_ratio,
-                "treynor_ratio": treynor_ratio,
-                "calmar_ratio": calmar_ratio,
-                "max_drawdown": max_drawdown,
-                "active_return": active_return,
-                "tracking_error": tracking_error,
-                "information_ratio": information_ratio,
-                "upside_capture_ratio": upside_capture_ratio,
-                "downside_capture_ratio": downside_capture_ratio,
-                "capture_ratio": capture_ratio,
-            },
-            "annual": {
-                "return": json.loads(portfolio_y.to_json(orient="records")),
-            },
-            "monthly": {
-                "return": json.loads(portfolio_m.to_json(orient="records")),
-            },
-            "daily": {
-                "drawdown": json.loads(
-                    daily_drawdowns.to_json(orient="records")
+        dates = portfolio["date"].to_numpy()
+        values = portfolio["portfolio"].to_numpy(dtype=float)
+        market = portfolio["market"].to_numpy(dtype=float)
+        result = {}
+        for window in windows:
+            # Windows longer than the portfolio have no metrics to compute
+            risk_free = np.nan
+            if window < len(dates):
+                risk_free = self.risk_free_rate(
+                    dates[: len(dates) - window], dates[window:]
                 )
-            },
-        }
+            rolling = pd.DataFrame(
+                rolling_metrics_kernel(values, market, window, risk_free)
+            )
+            rolling.insert(0, "date", dates)
+            result[window] = rolling
         return result
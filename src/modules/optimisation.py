@@ -1,11 +1,14 @@
-import json
-from typing import Any, List
+from enum import Enum
+from typing import Dict, List, Optional
 
 import numpy as np
 import pandas as pd
 from pydantic import BaseModel
 from scipy.optimize import minimize
 
+from src.modules.cla import CriticalLine
+from src.modules.parallel import Executor, config, map_shared
+
 
 def portfolio_std(weights: List, fund_covariance: pd.DataFrame) -> float:
     """
@@ -24,7 +27,58 @@ def portfolio_std(weights: List, fund_covariance: pd.DataFrame) -> float:
     return std
 
 
+def portfolio_std_gradient(
+    weights: np.ndarray, fund_covariance: np.ndarray
+) -> np.ndarray:
+    """
+    Gradient of portfolio standard deviation with respect to the weights
+
+    Args:
+        weights (np.ndarray): fund weights
+        fund_covariance (np.ndarray): fund covariance
+
+    Returns:
+        np.ndarray: d std / d weights, covariance @ weights / std
+    """
+    marginal = fund_covariance @ weights
+    return marginal / np.sqrt(weights @ marginal)
+
+
+class FrontierMethod(str, Enum):
+    cla = "cla"
+    slsqp = "slsqp"
+
+
+def slsqp_chunk(
+    arrays: Dict[str, np.ndarray], targets: List[float]
+) -> List[np.ndarray]:
+    """
+    Minimum std portfolios of consecutive targets, warm-started in order
+
+    Args:
+        arrays (Dict[str, np.ndarray]): returns and covariance of tickers
+        targets (List[float]): Increasing target returns
+
+    Returns:
+        List[np.ndarray]: Portfolio weights for each target
+    """
+    optimisation = PortfolioOptimisation()
+    efficient_portfolios = []
+    weights = None
+    for target in targets:
+        weights = optimisation.minimum_std_weights(
+            arrays["returns"], arrays["covariance"], target, weights
+        )
+        efficient_portfolios.append(weights)
+    return efficient_portfolios
+
+
 class PortfolioOptimisation(BaseModel):
+    method: FrontierMethod = FrontierMethod.cla
+    executor: Executor = config["executor"]
+    max_workers: Optional[int] = config["max_workers"]
+    chunk_size: int = 10
+
     class Config:
         arbitrary_types_allowed = True
 
@@ -44,49 +98,146 @@ class PortfolioOptimisation(BaseModel):
         annualised_return = np.sum(fund_returns * weights)
         return annualised_return
 
-    def optimise_std(
+    def minimum_std_weights(
         self,
-        fund_returns: pd.Series,
-        fund_covariance: pd.DataFrame,
+        fund_returns: np.ndarray,
+        fund_covariance: np.ndarray,
         target: float,
-    ) -> List[float]:
+        initial_weights: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
         """
-        Use optimisation to find portfolio with minimum std for a given return
+        Long-only weights with minimum std for a given return
+
+        The objective and both constraints come with analytic jacobians, so
+        SLSQP needs no finite difference evaluations and can afford a tight
+        tolerance on the flat neighbourhood of the optimum.
 
         Args:
-            fund_returns (pd.Series): Returns for each ticker
-            fund_covariance (pd.DataFrame): Covariance between each ticker
+            fund_returns (np.ndarray): Returns for each ticker
+            fund_covariance (np.ndarray): Covariance between each ticker
             target (float): Target return
+            initial_weights (Optional[np.ndarray]): Starting point, equal
+                weights if None
 
         Returns:
-            List[float]: Optimised portfolio weight
+            np.ndarray: Optimised portfolio weights
         """
-        args = fund_covariance
         num_funds = len(fund_returns)
-
-        def portfolio_return(weights):
-            annualised_return = np.sum(fund_returns * weights)
-            return annualised_return
-
         constraints = (
-            {"type": "eq", "fun": lambda x: portfolio_return(x) - target},
-            {"type": "eq", "fun": lambda x: np.sum(x) - 1},
+            {
+                "type": "eq",
+                "fun": lambda x: fund_returns @ x - target,
+                "jac": lambda x: fund_returns,
+            },
+            {
+                "type": "eq",
+                "fun": lambda x: np.sum(x) - 1,
+                "jac": lambda x: np.ones(num_funds),
+            },
         )
         bounds = tuple((0, 1) for i in range(num_funds))
-        initial_weights = num_funds * [
-            1.0 / num_funds,
-        ]
+        if initial_weights is None:
+            initial_weights = np.full(num_funds, 1.0 / num_funds)
         result = minimize(
             portfolio_std,
             initial_weights,
-            args=args,
+            args=fund_covariance,
+            jac=portfolio_std_gradient,
             method="SLSQP",
             bounds=bounds,
             constraints=constraints,
+            options={"ftol": 1e-12, "maxiter": 500},
         ).x
+        return result
+
+    def optimise_std(
+        self,
+        fund_returns: pd.Series,
+        fund_covariance: pd.DataFrame,
+        target: float,
+    ) -> List[float]:
+        """
+        Use optimisation to find portfolio with minimum std for a given return
+
+        Args:
+            fund_returns (pd.Series): Returns for each ticker
+            fund_covariance (pd.DataFrame): Covariance between each ticker
+            target (float): Target return
+
+        Returns:
+            List[float]: Optimised portfolio weight
+        """
+        result = self.minimum_std_weights(
+            np.asarray(fund_returns, dtype=float),
+            np.asarray(fund_covariance, dtype=float),
+            target,
+        )
         result = [round(elem, 6) for elem in result]
         return result
 
+    def slsqp_portfolios(
+        self, returns: np.ndarray, covariance: np.ndarray, targets: List
+    ) -> List[np.ndarray]:
+        """
+        Minimum std portfolio for each target with SLSQP
+
+        Targets are split into chunks of chunk_size consecutive targets,
+        solved with the chosen executor. Within a chunk each target starts
+        from the solution of the previous one, every chunk starts from
+        equal weights, so results do not depend on the executor or the
+        number of workers.
+
+        Args:
+            returns (np.ndarray): Returns for each ticker
+            covariance (np.ndarray): Covariance between each ticker
+            targets (List): Increasing target returns
+
+        Returns:
+            List[np.ndarray]: Portfolio weights for each target
+        """
+        tasks = [
+            (targets[start : start + self.chunk_size],)
+            for start in range(0, len(targets), self.chunk_size)
+        ]
+        results = map_shared(
+            slsqp_chunk,
+            {"returns": returns, "covariance": covariance},
+            tasks,
+            self.executor,
+            self.max_workers,
+        )
+        return [weights for chunk in results for weights in chunk]
+
+    def critical_line_portfolios(
+        self, returns: np.ndarray, covariance: np.ndarray, targets: List
+    ) -> List[np.ndarray]:
+        """
+        Exact minimum std portfolio for each target from corner portfolios
+
+        Targets above the minimum variance return are on the efficient
+        frontier, targets below it on the frontier of the negated returns,
+        so both are interpolated between the corners of a critical line.
+
+        Args:
+            returns (np.ndarray): Returns for each ticker
+            covariance (np.ndarray): Covariance between each ticker
+            targets (List): Target returns
+
+        Returns:
+            List[np.ndarray]: Portfolio weights for each target
+        """
+        efficient = CriticalLine(returns, covariance)
+        inefficient = CriticalLine(-returns, covariance)
+        minimum_variance_return = efficient.returns[-1]
+        efficient_portfolios = []
+        for target in targets:
+            if target >= minimum_variance_return:
+                weights = efficient.frontier_weights(target)
+            else:
+                weights = inefficient.frontier_weights(-target)
+            efficient_portfolios.append(weights)
+        return efficient_portfolios
+
     def efficient_frontier_portfolios(
         self,
         fund_returns: pd.Series,
@@ -110,12 +261,23 @@ class PortfolioOptimisation(BaseModel):
         efficient_range = []
         for i in range(portfolios):
             efficient_range.append(fund_returns.min() + return_range * i)
-        efficient_portfolios = []
-        for j in efficient_range:
-            efficient_portfolios.append(
-                self.optimise_std(fund_returns, fund_covariance, j)
+        returns = np.asarray(fund_returns, dtype=float)
+        covariance = np.asarray(fund_covariance, dtype=float)
+        # Collinear tickers have no exact critical line, SLSQP is used
+        if self.method == FrontierMethod.cla and CriticalLine.full_rank(
+            covariance
+        ):
+            efficient_portfolios = self.critical_line_portfolios(
+                returns, covariance, efficient_range
             )
-        return efficient_portfolios
+        else:
+            efficient_portfolios = self.slsqp_portfolios(
+                returns, covariance, efficient_range
+            )
+        return [
+            [round(elem, 6) for elem in weights]
+            for weights in efficient_portfolios
+        ]
 
     def efficient_frontier(
         self,
@@ -124,7 +286,7 @@ class PortfolioOptimisation(BaseModel):
         portfolios: pd.DataFrame,
         fund_codes: List[str],
         average_risk_free: float,
-    ) -> Any:
+    ) -> pd.DataFrame:
         """
         Get range of portfolios that lie on the efficient frontier and summary statistics
 
@@ -136,7 +298,7 @@ class PortfolioOptimisation(BaseModel):
             average_risk_free (float): Risk free for given period of returns
 
         Returns:
-            Any: json like object that contains range of portfolios
+            pd.DataFrame: Range of portfolios
         """
         efficient_portfolios = self.efficient_frontier_portfolios(
             fund_returns, fund_covariance, portfolios
@@ -162,4 +324,4 @@ class PortfolioOptimisation(BaseModel):
         )
         idx = result[["std"]].idxmin()[0]
         result = result.iloc[0:idx]
-        return json.loads(result.to_json(orient="records"))
+        return result
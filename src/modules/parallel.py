@@ -0,0 +1,213 @@
+import multiprocessing
+import os
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import Executor as PoolExecutor
+from concurrent.futures import (
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from enum import Enum
+from functools import lru_cache
+from itertools import repeat
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+
+class Executor(str, Enum):
+    serial = "serial"
+    thread = "thread"
+    process = "process"
+
+
+# Default executor and worker cap of CPU bound modules
+config = {
+    "executor": Executor(os.environ.get("AURORA_EXECUTOR", "serial")),
+    "max_workers": os.environ.get("AURORA_MAX_WORKERS"),
+}
+if config["max_workers"] is not None:
+    config["max_workers"] = int(config["max_workers"])
+
+
+def worker_count(max_workers: Optional[int]) -> int:
+    """
+    Number of workers in a pool
+
+    Args:
+        max_workers (Optional[int]): Cap on workers, one per core if None
+
+    Returns:
+        int: Workers, at least one
+    """
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    return max(1, max_workers)
+
+
+@lru_cache(maxsize=None)
+def get_pool(executor: Executor) -> PoolExecutor:
+    """
+    Pool shared by every request using the same executor
+
+    Sized at the server cap, AURORA_MAX_WORKERS, so there is one pool per
+    executor whatever the workers asked for by requests. Processes are
+    started from a fork server, so workers do not inherit the threads or
+    open handles of the API process.
+
+    Args:
+        executor (Executor): thread or process
+
+    Returns:
+        PoolExecutor
+    """
+    max_workers = worker_count(config["max_workers"])
+    if executor == Executor.process:
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload(["numpy", "pandas", "scipy.stats"])
+        return ProcessPoolExecutor(max_workers, mp_context=context)
+    return ThreadPoolExecutor(max_workers)
+
+
+def bounded_map(
+    pool: PoolExecutor,
+    function: Callable,
+    tasks: Iterable[Tuple],
+    limit: int,
+) -> List:
+    """
+    Call function(*task) in the pool with at most limit tasks in flight
+
+    Caps the workers a request uses in a pool shared with other requests,
+    results in task order.
+
+    Args:
+        pool (PoolExecutor): Shared pool
+        function (Callable): Function to call
+        tasks (Iterable[Tuple]): Arguments of each task
+        limit (int): Tasks submitted but not finished at any time
+
+    Returns:
+        List: Result of each task
+    """
+    futures: List[Future] = []
+    pending = set()
+    try:
+        for task in tasks:
+            if len(pending) >= limit:
+                _, pending = wait(pending, return_when=FIRST_COMPLETED)
+            future = pool.submit(function, *task)
+            futures.append(future)
+            pending.add(future)
+        return [future.result() for future in futures]
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+def attach_shared(
+    handles: Dict[str, Tuple],
+) -> Tuple[Dict[str, np.ndarray], List[SharedMemory]]:
+    """
+    Map arrays placed in shared memory by another process
+
+    Args:
+        handles (Dict[str, Tuple]): Block name, shape, dtype and memory
+            order of each array
+
+    Returns:
+        Tuple[Dict[str, np.ndarray], List[SharedMemory]]: Arrays backed by
+            the shared blocks and the blocks to close once done
+    """
+    arrays = {}
+    blocks = []
+    for key, (name, shape, dtype, order) in handles.items():
+        block = SharedMemory(name=name)
+        blocks.append(block)
+        arrays[key] = np.ndarray(shape, dtype, buffer=block.buf, order=order)
+    return arrays, blocks
+
+
+def call_shared(
+    function: Callable, handles: Dict[str, Tuple], task: Tuple
+) -> Any:
+    """
+    Run one task in a worker process against arrays in shared memory
+
+    Args:
+        function (Callable): Called as function(arrays, *task)
+        handles (Dict[str, Tuple]): Shared arrays, see attach_shared
+        task (Tuple): Task arguments
+
+    Returns:
+        Any: Result of function
+    """
+    arrays, blocks = attach_shared(handles)
+    try:
+        return function(arrays, *task)
+    finally:
+        arrays.clear()
+        for block in blocks:
+            block.close()
+
+
+def map_shared(
+    function: Callable,
+    arrays: Dict[str, np.ndarray],
+    tasks: List[Tuple],
+    executor: Executor = Executor.serial,
+    max_workers: Optional[int] = None,
+) -> List:
+    """
+    Call function(arrays, *task) for every task, results in task order
+
+    With the process executor the arrays are copied once into shared
+    memory and mapped by each worker, only the task arguments and the
+    results are pickled. Each task runs the same code whatever the
+    executor, so results are identical to a serial run.
+
+    Args:
+        function (Callable): Module level function to call
+        arrays (Dict[str, np.ndarray]): Inputs shared by every task
+        tasks (List[Tuple]): Arguments of each task
+        executor (Executor): serial, thread or process
+        max_workers (Optional[int]): Cap on workers, one per core if None
+
+    Returns:
+        List: Result of each task
+    """
+    workers = worker_count(max_workers)
+    if executor == Executor.serial or workers == 1 or len(tasks) < 2:
+        return [function(arrays, *task) for task in tasks]
+    if executor == Executor.thread:
+        return bounded_map(
+            get_pool(executor),
+            function,
+            ((arrays, *task) for task in tasks),
+            workers,
+        )
+    blocks = []
+    try:
+        handles = {}
+        for key, array in arrays.items():
+            block = SharedMemory(create=True, size=max(array.nbytes, 1))
+            blocks.append(block)
+            order = "F" if np.isfortran(array) else "C"
+            shared = np.ndarray(
+                array.shape, array.dtype, buffer=block.buf, order=order
+            )
+            shared[...] = array
+            del shared
+            handles[key] = (block.name, array.shape, array.dtype.str, order)
+        return bounded_map(
+            get_pool(executor),
+            call_shared,
+            zip(repeat(function), repeat(handles), tasks),
+            workers,
+        )
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
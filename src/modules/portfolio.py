@@ -1,10 +1,79 @@
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
 import numpy as np
 import pandas as pd
 from pydantic import BaseModel
 
 
+def rebalanced_growth(
+    prices: np.ndarray, boundaries: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Growth of each constituent since the last rebalancing
+
+    Rows are split into periods at the rebalancing rows; a rebalancing row
+    closes the period before it and opens the next one.
+
+    Args:
+        prices (np.ndarray): Index levels, one row per date
+        boundaries (np.ndarray): Sorted rebalancing rows, first and last row
+            included
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Period of each row and growth of
+            each constituent since the start of that period
+    """
+    rows = np.arange(len(prices))
+    period = np.maximum(np.searchsorted(boundaries, rows) - 1, 0)
+    growth = prices / prices[boundaries[period]]
+    return period, growth
+
+
+def period_start_values(
+    growth: np.ndarray, boundaries: np.ndarray, amounts: np.ndarray
+) -> np.ndarray:
+    """
+    Value of portfolios at the start of every rebalancing period
+
+    Each period's growth factor is the weighted growth of its constituents
+    and start values are the cumulative product of those factors.
+
+    Args:
+        growth (np.ndarray): Growth since the start of each row's period
+        boundaries (np.ndarray): Sorted rebalancing rows, first and last row
+            included
+        amounts (np.ndarray): Initial amounts (n funds x N portfolios)
+
+    Returns:
+        np.ndarray: Start values (periods x N portfolios)
+    """
+    totals = amounts.sum(axis=0)
+    period_growth = growth[boundaries[1:]] @ (amounts / totals)
+    ones = np.ones((1, amounts.shape[1]))
+    return totals * np.cumprod(np.vstack([ones, period_growth]), axis=0)
+
+
+def rebalanced_values(
+    prices: np.ndarray, boundaries: np.ndarray, amounts: np.ndarray
+) -> np.ndarray:
+    """
+    Value of portfolios rebalanced to their initial weights at given rows
+
+    Args:
+        prices (np.ndarray): Index levels (T x n funds)
+        boundaries (np.ndarray): Sorted rebalancing rows, first and last row
+            included
+        amounts (np.ndarray): Initial amounts (n funds x N portfolios)
+
+    Returns:
+        np.ndarray: Portfolio values (T x N portfolios)
+    """
+    period, growth = rebalanced_growth(prices, boundaries)
+    start_values = period_start_values(growth, boundaries, amounts)
+    weights = amounts / amounts.sum(axis=0)
+    return start_values[period] * (growth @ weights)
+
+
 class Portfolio(BaseModel):
     codes: List[str]
     amounts: List[float]
@@ -46,15 +115,60 @@ class Portfolio(BaseModel):
         Returns:
             pd.DataFrame: Backtested portfolio
         """
-        n_funds = len(self.codes)
-        fund_diagonal = np.zeros((n_funds, n_funds))
-        np.fill_diagonal(fund_diagonal, initial_amounts)
-        result = timeseries[self.codes].dot(fund_diagonal)
-        result.columns = self.codes
-        result["portfolio"] = result.sum(axis=1)
+        holdings = timeseries[self.codes].to_numpy(dtype=float, copy=True)
+        np.multiply(holdings, initial_amounts, out=holdings)
+        result = pd.DataFrame(
+            holdings, columns=self.codes, index=timeseries.index
+        )
+        result["portfolio"] = holdings.sum(axis=1)
         result["date"] = timeseries["date"]
         return result
 
+    def rebalancing_dates(self) -> List[str]:
+        """
+        Dates on which the portfolio is rebalanced, including start and end
+
+        Returns:
+            List[str]: Rebalancing dates (%Y-%m-%d format)
+        """
+        rebalance_frequency = self.frequency_map[
+            self.rebalance_frequency.lower()
+        ]
+        date_range = pd.Series(
+            pd.date_range(start=self.start_date, end=self.end_date, freq="D")
+        )
+        month_end_dates = date_range[date_range.dt.is_month_end].reset_index(
+            drop=True
+        )
+        rebalancing_dates = (
+            month_end_dates[month_end_dates.index % rebalance_frequency == 0]
+            .reset_index(drop=True)
+            .dt.strftime("%Y-%m-%d")
+            .values.tolist()
+        )
+        if self.start_date not in rebalancing_dates:
+            rebalancing_dates.insert(0, self.start_date)
+        if self.end_date not in rebalancing_dates:
+            rebalancing_dates.append(self.end_date)
+        return rebalancing_dates
+
+    def rebalancing_rows(self) -> np.ndarray:
+        """
+        Rows of timeseries on which the portfolio is rebalanced
+
+        Returns:
+            np.ndarray: Sorted row positions, first and last row included
+        """
+        dates = self.timeseries["date"].values
+        if not self.rebalance:
+            return np.array([0, len(dates) - 1])
+        rows = np.searchsorted(
+            dates,
+            pd.to_datetime(self.rebalancing_dates()).values,
+            side="right",
+        )
+        return np.unique(np.clip(rows - 1, 0, len(dates) - 1))
+
     def backtest_strategy(self) -> pd.DataFrame:
         """
         Backtest portfolio with given strategy of rebalancing
@@ -63,50 +177,39 @@ class Portfolio(BaseModel):
             pd.DataFrame: Backtested portfolio
         """
         if self.rebalance:
-            weights = [i / sum(self.amounts) for i in self.amounts]
-            rebalance_frequency = self.frequency_map[
-                self.rebalance_frequency.lower()
-            ]
-            date_range = pd.Series(
-                pd.date_range(
-                    start=self.start_date, end=self.end_date, freq="D"
-                )
-            )
-            month_end_dates = date_range[
-                date_range.dt.is_month_end
-            ].reset_index(drop=True)
-            rebalancing_dates = (
-                month_end_dates[
-                    month_end_dates.index % rebalance_frequency == 0
-                ]
-                .reset_index(drop=True)
-                .dt.strftime("%Y-%m-%d")
-                .values.tolist()
-            )
-            if self.start_date not in rebalancing_dates:
-                rebalancing_dates.insert(0, self.start_date)
-            if self.end_date not in rebalancing_dates:
-                rebalancing_dates.append(self.end_date)
-            current_total = sum(self.amounts)
-            portfolio_history = []
-            start_period = rebalancing_dates[0]
-            for i in range(0, len(rebalancing_dates) - 1):
-                end_period = rebalancing_dates[i + 1]
-                price_timeseries = self.timeseries.loc[
-                    (self.timeseries.date >= start_period)
-                    & (self.timeseries.date <= end_period)
-                ].reset_index(drop=True)
-                price_timeseries = self.normalise_index(price_timeseries)
-                amounts = np.multiply(weights, current_total)
-                strategy_slice = self.backtest_portfolio(
-                    amounts, price_timeseries
-                )
-                current_total = strategy_slice.iloc[-1]["portfolio"]
-                duplicate = 0 if i == 0 else 1
-                portfolio_history.append(strategy_slice.iloc[duplicate:])
-                start_period = strategy_slice.iloc[-1]["date"]
-            result = pd.concat(portfolio_history)
+            boundaries = self.rebalancing_rows()
+            prices = self.timeseries[self.codes].to_numpy(dtype=float)
+            amounts = np.array(self.amounts, dtype=float).reshape(-1, 1)
+            period, growth = rebalanced_growth(prices, boundaries)
+            start_values = period_start_values(growth, boundaries, amounts)
+            weights = amounts[:, 0] / amounts.sum()
+            holdings = start_values[period] * weights * growth
+            result = pd.DataFrame(holdings, columns=self.codes)
+            result["portfolio"] = holdings.sum(axis=1)
+            result["date"] = self.timeseries["date"].values
         else:
             self.timeseries = self.normalise_index(self.timeseries)
             result = self.backtest_portfolio(self.amounts, self.timeseries)
         return result
+
+
+class PortfolioBatch(Portfolio):
+    """
+    Many allocations over the same tickers, dates and strategy
+
+    amounts holds one list of amounts per portfolio, ordered as codes.
+
+    """
+
+    amounts: List[List[float]]
+
+    def backtest_portfolios(self) -> np.ndarray:
+        """
+        Backtest every allocation in one pass
+
+        Returns:
+            np.ndarray: Portfolio values (dates x portfolios)
+        """
+        prices = self.timeseries[self.codes].to_numpy(dtype=float)
+        amounts = np.array(self.amounts, dtype=float).T
+        return rebalanced_values(prices, self.rebalancing_rows(), amounts)
@@ -0,0 +1,236 @@
+from typing import Optional, Tuple
+
+import numpy as np
+from scipy import stats
+
+
+def has_constant(exog: np.ndarray) -> bool:
+    """
+    Check whether a design matrix holds an explicit or implicit constant
+
+    Follows the detection statsmodels applies to models without a formula:
+    a constant non-zero column counts, otherwise the design has a constant
+    if adding a column of ones does not increase its rank.
+
+    Args:
+        exog (np.ndarray): Design matrix, one row per observation
+
+    Returns:
+        bool: True if the design spans a constant
+    """
+    constant = np.flatnonzero(exog.max(axis=0) == exog.min(axis=0))
+    if (exog[:, constant].mean(axis=0) != 0).any():
+        return True
+    augmented = np.column_stack((np.ones(len(exog)), exog))
+    return np.linalg.matrix_rank(augmented) == np.linalg.matrix_rank(exog)
+
+
+class LinearRegression:
+    """
+    Ordinary least squares of many targets on one design matrix
+
+    The design is factorised once with a singular value decomposition and
+    every column of endog is solved against it, so fitting many tickers
+    costs about the same as fitting one. Results match statsmodels OLS with
+    a non-robust covariance, one column per target.
+
+    Args:
+        exog (np.ndarray): Design matrix (n x k), including any constant
+        endog (np.ndarray): Targets (n x m), or a single target (n)
+        constant (Optional[bool]): Whether exog has a constant, detected
+            with has_constant if not given
+    """
+
+    def __init__(
+        self,
+        exog: np.ndarray,
+        endog: np.ndarray,
+        constant: Optional[bool] = None,
+    ):
+        exog = np.asarray(exog, dtype=np.float64)
+        endog = np.asarray(endog, dtype=np.float64)
+        if endog.ndim == 1:
+            endog = endog[:, None]
+        if constant is None:
+            constant = has_constant(exog)
+        self.k_constant = int(constant)
+        self.nobs = float(len(exog))
+        u, singular_values, vt = np.linalg.svd(exog, full_matrices=False)
+        cutoff = 1e-15 * singular_values.max()
+        inverse = np.zeros_like(singular_values)
+        inverse[singular_values > cutoff] = (
+            1 / singular_values[singular_values > cutoff]
+        )
+        pinv_exog = (vt.T * inverse) @ u.T
+        self.rank = np.linalg.matrix_rank(np.diag(singular_values))
+        self.normalized_cov_params = pinv_exog @ pinv_exog.T
+        self.params = pinv_exog @ endog
+        self.resid = endog - exog @ self.params
+        self.df_model = float(self.rank - self.k_constant)
+        self.df_resid = self.nobs - self.rank
+        self.ssr = np.einsum("ij,ij->j", self.resid, self.resid)
+        centered = endog - endog.mean(axis=0)
+        if self.k_constant:
+            total = np.einsum("ij,ij->j", centered, centered)
+        else:
+            total = np.einsum("ij,ij->j", endog, endog)
+        self.ess = total - self.ssr
+        self.rsquared = 1 - self.ssr / total
+        self.rsquared_adj = 1 - (
+            (self.nobs - self.k_constant) / self.df_resid * (1 - self.rsquared)
+        )
+        self.scale = self.ssr / self.df_resid
+        self.bse = np.sqrt(
+            np.outer(np.diag(self.normalized_cov_params), self.scale)
+        )
+        self.tvalues = self.params / self.bse
+        self.pvalues = 2 * stats.t.sf(np.abs(self.tvalues), self.df_resid)
+
+    @property
+    def fvalue(self) -> np.ndarray:
+        """F-statistic of each target, mean squared model over residual"""
+        if self.df_model == 0:
+            return np.full_like(self.ess, np.nan)
+        return (self.ess / self.df_model) / self.scale
+
+    def conf_int(self, alpha: float = 0.05) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Confidence interval of the parameters
+
+        Args:
+            alpha (float): Significance level, 0.05 for a 95% interval
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Lower and upper bounds (k x m)
+        """
+        q = stats.t.ppf(1 - alpha / 2, self.df_resid)
+        return self.params - q * self.bse, self.params + q * self.bse
+
+    def durbin_watson(self) -> np.ndarray:
+        """
+        Durbin-Watson statistic of the residuals of each target
+
+        Returns:
+            np.ndarray: 0 positive, 2 no, 4 negative autocorrelation
+        """
+        diff = np.diff(self.resid, axis=0)
+        return np.einsum("ij,ij->j", diff, diff) / self.ssr
+
+    def breusch_pagan(self, exog_het: np.ndarray) -> Tuple[np.ndarray]:
+        """
+        Breusch-Pagan (Koenker) test for heteroscedasticity of each target
+
+        Squared residuals of every target are regressed on exog_het at once,
+        matching statsmodels het_breuschpagan with robust=True.
+
+        Args:
+            exog_het (np.ndarray): Variables suspected of driving the
+                residual variance (n x p)
+
+        Returns:
+            Tuple[np.ndarray]: Lagrange multiplier statistic and p-value
+        """
+        exog_het = np.asarray(exog_het, dtype=np.float64)
+        auxiliary = LinearRegression(exog_het, self.resid**2)
+        lm = self.nobs * auxiliary.rsquared
+        return lm, stats.chi2.sf(lm, exog_het.shape[1] - 1)
+
+
+class RollingRegression:
+    """
+    Ordinary least squares over a moving window of many targets
+
+    X'X, X'y, y'y and the sum of y are kept as cumulative sums, so the
+    inner products of every window are the difference of two rows and
+    each step costs a k x k solve, whatever the window length. All targets
+    share the design and are solved together. Results match statsmodels
+    RollingOLS: step t holds the fit of the window ending at t and steps
+    without a full window are NaN.
+
+    Args:
+        exog (np.ndarray): Design matrix (n x k), including any constant
+        endog (np.ndarray): Targets (n x m), or a single target (n)
+        window (Optional[int]): Observations per window, every observation
+            up to each step if not given
+        min_nobs (Optional[int]): Fewest observations fitted in expanding
+            mode, the number of regressors if not given
+        expanding (bool): Fit growing windows from min_nobs observations
+            until the window is full
+        constant (Optional[bool]): Whether exog has a constant, detected
+            with has_constant if not given
+    """
+
+    def __init__(
+        self,
+        exog: np.ndarray,
+        endog: np.ndarray,
+        window: Optional[int] = None,
+        min_nobs: Optional[int] = None,
+        expanding: bool = False,
+        constant: Optional[bool] = None,
+    ):
+        exog = np.asarray(exog, dtype=np.float64)
+        endog = np.asarray(endog, dtype=np.float64)
+        if endog.ndim == 1:
+            endog = endog[:, None]
+        n_obs, k = exog.shape
+        window = n_obs if window is None else window
+        min_nobs = k if min_nobs is None else min_nobs
+        if min_nobs < k or min_nobs > window:
+            raise ValueError(
+                "min_nobs must be at least the number of regressors "
+                "and at most the window"
+            )
+        if constant is None:
+            constant = has_constant(exog)
+        self.k_constant = int(constant)
+        shift = np.zeros(endog.shape[1])
+        if self.k_constant and n_obs:
+            # Differences of cumulative sums lose precision when targets
+            # are far from zero, so targets are demeaned and the mean is
+            # added back through the constant once the windows are solved
+            shift = endog.mean(axis=0)
+            endog = endog - shift
+            constant_params = np.linalg.lstsq(exog, np.ones(n_obs), None)[0]
+
+        first = min_nobs if expanding else window
+
+        def outer(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+            total = np.zeros((n_obs + 1, a.shape[1], b.shape[1]))
+            np.multiply(a[:, :, None], b[:, None, :], out=total[1:])
+            return total
+
+        def window_sums(total: np.ndarray) -> np.ndarray:
+            # Row 0 is zero, so once rows hold running sums row t minus
+            # row t - window is the sum over the window ending at t. Rows
+            # are updated in place to avoid n x k x m temporaries.
+            for t in range(1, n_obs + 1):
+                np.add(total[t - 1], total[t], out=total[t])
+            for t in range(n_obs, window - 1, -1):
+                np.subtract(total[t], total[t - window], out=total[t])
+            return total[first:]
+
+        window_xpx = window_sums(outer(exog, exog))
+        window_xpy = window_sums(outer(exog, endog))
+        window_ypy = window_sums(outer(np.ones((n_obs, 1)), endog**2))[:, 0]
+        window_y = window_sums(outer(np.ones((n_obs, 1)), endog))[:, 0]
+        self.nobs = np.minimum(np.arange(1, n_obs + 1), window)
+
+        self.params = np.full((n_obs, k, endog.shape[1]), np.nan)
+        self.rsquared = np.full((n_obs, endog.shape[1]), np.nan)
+        if first > n_obs:
+            return
+        params = self.params[first - 1 :]
+        # Pseudo-inverse like LinearRegression, so a window where a factor
+        # is constant or collinear gets the minimum norm fit, not an error
+        np.matmul(
+            np.linalg.pinv(window_xpx, hermitian=True), window_xpy, out=params
+        )
+        ssr = window_ypy - np.einsum("tkm,tkm->tm", params, window_xpy)
+        if self.k_constant:
+            nobs = self.nobs[first - 1 :, None]
+            total = window_ypy - window_y**2 / nobs
+            params += constant_params[:, None] * shift
+        else:
+            total = window_ypy
+        self.rsquared[first - 1 :] = 1 - ssr / total
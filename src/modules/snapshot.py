@@ -0,0 +1,105 @@
+import os
+import tempfile
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+
+def write_snapshot(
+    data: pd.DataFrame, path: str, version: Optional[str] = None
+) -> None:
+    """
+    Write date-indexed timeseries as an uncompressed Arrow IPC file
+
+    The file holds a single record batch without compression or nulls
+    (NaN is kept as a value) so every column can be mapped zero-copy.
+
+    Args:
+        data (pd.DataFrame): Timeseries indexed by date
+        path (str): File to write
+        version (Optional[str]): Version of the source, kept in metadata
+    """
+    columns = {"date": pa.array(data.index.values)}
+    for column in data.columns:
+        columns[column] = pa.array(data[column].to_numpy(dtype=float))
+    metadata = {} if version is None else {"version": version}
+    table = pa.table(columns, metadata=metadata)
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    # Replace atomically so workers mapping the old file keep a valid copy
+    handle, temp_path = tempfile.mkstemp(dir=directory)
+    os.close(handle)
+    os.chmod(temp_path, 0o644)
+    try:
+        feather.write_feather(
+            table,
+            temp_path,
+            compression="uncompressed",
+            chunksize=max(len(table), 1),
+        )
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def read_snapshot(path: str) -> pa.Table:
+    """
+    Memory-map snapshot written by write_snapshot
+
+    Args:
+        path (str): Snapshot file
+
+    Returns:
+        pa.Table: Table backed by the mapped file
+    """
+    # The table keeps the mapping alive after the file is closed
+    with pa.memory_map(path, "r") as source:
+        return pa.ipc.open_file(source).read_all()
+
+
+def snapshot_version(path: str) -> Optional[str]:
+    """
+    Source version recorded in a snapshot, None if there is no snapshot
+
+    Args:
+        path (str): Snapshot file
+
+    Returns:
+        Optional[str]: Version of the source the snapshot was built from
+    """
+    if not os.path.exists(path):
+        return None
+    with pa.memory_map(path, "r") as source:
+        metadata = pa.ipc.open_file(source).schema.metadata
+    if metadata is None or b"version" not in metadata:
+        return None
+    return metadata[b"version"].decode()
+
+
+def slice_snapshot(
+    table: pa.Table, columns: List[str], start_date: str, end_date: str
+) -> pd.DataFrame:
+    """
+    Select columns and date range from a mapped snapshot
+
+    Rows are located with a binary search on the mapped date column and
+    sliced without copying, only the selected window is converted.
+
+    Args:
+        table (pa.Table): Snapshot table
+        columns (List[str]): Columns to select
+        start_date (str): start date (%Y-%m-%d format)
+        end_date (str): end date (%Y-%m-%d format)
+
+    Returns:
+        pd.DataFrame: Timeseries with a date column
+    """
+    dates = table.column("date").chunk(0).to_numpy()
+    start = np.searchsorted(dates, np.datetime64(start_date), side="left")
+    end = np.searchsorted(dates, np.datetime64(end_date), side="right")
+    window = table.slice(start, end - start).select(["date"] + columns)
+    return window.to_pandas()
@@ -0,0 +1,219 @@
+import os
+import shutil
+import tempfile
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import IO, Any, Callable, Optional
+
+from fsspec.core import url_to_fs
+
+
+def replace_file(path: str, write: Callable[[IO[bytes]], Any]) -> None:
+    """
+    Write a file through a temporary file, so readers never see it partial
+
+    Args:
+        path (str): File to replace
+        write (Callable[[IO[bytes]], Any]): Writes the content to a file
+    """
+    handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    try:
+        with os.fdopen(handle, "wb") as f:
+            write(f)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+class Storage(ABC):
+    """
+    Read-only access to market data files addressed by relative key
+
+    """
+
+    @abstractmethod
+    def uri(self, key: str) -> str:
+        """
+        Full location of key, used to identify datasets
+
+        Args:
+            key (str): Relative path of the file
+
+        Returns:
+            str: Location of the file
+        """
+
+    @abstractmethod
+    def open(self, key: str) -> IO[bytes]:
+        """
+        Open file for binary reading
+
+        Args:
+            key (str): Relative path of the file
+
+        Returns:
+            IO[bytes]: File object
+        """
+
+    @abstractmethod
+    def version(self, key: str) -> str:
+        """
+        Identifier that changes whenever the file changes
+
+        Args:
+            key (str): Relative path of the file
+
+        Returns:
+            str: ETag, generation or modification time of the file
+        """
+
+
+class LocalStorage(Storage):
+    """
+    Files on the local filesystem
+
+    Args:
+        root (str): Directory containing the files
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def uri(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def open(self, key: str) -> IO[bytes]:
+        return open(self.uri(key), "rb")
+
+    def version(self, key: str) -> str:
+        stat = os.stat(self.uri(key))
+        return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+
+class RemoteStorage(Storage):
+    """
+    Files on any fsspec supported filesystem (gcs://, s3://, ...)
+
+    Args:
+        base_path (str): URL of the directory containing the files
+    """
+
+    def __init__(self, base_path: str):
+        self.base_path = base_path
+        self.fs, self.root = url_to_fs(base_path)
+
+    def uri(self, key: str) -> str:
+        return f"{self.base_path}{key}"
+
+    def open(self, key: str) -> IO[bytes]:
+        return self.fs.open(f"{self.root.rstrip('/')}/{key}", "rb")
+
+    def version(self, key: str) -> str:
+        info = self.fs.info(f"{self.root.rstrip('/')}/{key}")
+        for field in ("etag", "ETag", "generation", "md5Hash"):
+            if info.get(field) is not None:
+                return str(info[field])
+        for field in ("mtime", "updated", "LastModified", "created"):
+            if info.get(field) is not None:
+                return f"{info[field]}-{info['size']}"
+        raise ValueError(f"No version information for {key}")
+
+
+class MirroredStorage(Storage):
+    """
+    Read-through on-disk mirror of another storage
+
+    A file is downloaded the first time it is opened and again only when
+    the version reported by the source differs from the mirrored copy. If
+    the source cannot be reached the mirrored copy is used as is.
+
+    Args:
+        source (Storage): Storage to mirror
+        mirror_path (str): Local directory holding the mirrored files
+    """
+
+    def __init__(self, source: Storage, mirror_path: str):
+        self.source = source
+        self.mirror = LocalStorage(mirror_path)
+
+    def uri(self, key: str) -> str:
+        return self.source.uri(key)
+
+    def open(self, key: str) -> IO[bytes]:
+        return self.mirror.open(self.sync(key))
+
+    def version(self, key: str) -> str:
+        self.sync(key)
+        return self.mirrored_version(key)
+
+    def mirrored_version(self, key: str) -> Optional[str]:
+        """
+        Source version of the mirrored copy of key, None if not mirrored
+
+        Args:
+            key (str): Relative path of the file
+
+        Returns:
+            Optional[str]: Version recorded when the file was downloaded
+        """
+        path = self.mirror.uri(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(f"{path}.version") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def sync(self, key: str) -> str:
+        """
+        Download key if the mirrored copy is missing or out of date
+
+        Args:
+            key (str): Relative path of the file
+
+        Returns:
+            str: key, for chaining into the mirror
+        """
+        mirrored = self.mirrored_version(key)
+        try:
+            version = self.source.version(key)
+        except (OSError, ValueError):
+            if mirrored is None:
+                raise
+            return key
+        if version == mirrored:
+            return key
+        path = self.mirror.uri(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        def download(f: IO[bytes]) -> None:
+            with self.source.open(key) as src:
+                shutil.copyfileobj(src, f)
+
+        replace_file(path, download)
+        # After the data, a crash in between only causes a new download
+        replace_file(f"{path}.version", lambda f: f.write(version.encode()))
+        return key
+
+
+@lru_cache(maxsize=None)
+def get_storage(base_path: str, mirror_path: Optional[str] = None) -> Storage:
+    """
+    Storage for a base path, local directories are read in place
+
+    Args:
+        base_path (str): Local directory or URL containing the files
+        mirror_path (Optional[str]): Local directory to mirror remote files
+
+    Returns:
+        Storage: Storage backend
+    """
+    fs, root = url_to_fs(base_path)
+    if "file" in fs.protocol or "local" in fs.protocol:
+        return LocalStorage(root)
+    storage = RemoteStorage(base_path)
+    if mirror_path is not None:
+        storage = MirroredStorage(storage, mirror_path)
+    return storage
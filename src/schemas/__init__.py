@@ -1,3 +1,3 @@
-from .backtest import portfolio
+from .backtest import portfolio, portfolio_batch, portfolio_rolling
 from .factor import factor
 from .optimisation import optimisation
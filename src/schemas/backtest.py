@@ -1,4 +1,6 @@
-from pydantic import BaseModel
+from typing import List
+
+from pydantic import BaseModel, conint
 
 
 class portfolio(BaseModel):
@@ -19,3 +21,53 @@ class portfolio(BaseModel):
                 "strategy": {"rebalance": True, "rebalance_frequency": "Y"},
             }
         }
+
+
+class portfolio_batch(BaseModel):
+    start_date: str
+    end_date: str
+    portfolios: list
+    strategy: dict
+    projection: bool = False
+
+    class Config:
+        schema_extra = {
+            "example": {
+                "start_date": "2018-12-31",
+                "end_date": "2020-06-30",
+                "portfolios": [
+                    [
+                        {"fund": "ABMD", "amount": 1000},
+                        {"fund": "ATVI", "amount": 1000},
+                    ],
+                    [
+                        {"fund": "ABMD", "amount": 500},
+                        {"fund": "AAPL", "amount": 1500},
+                    ],
+                ],
+                "strategy": {"rebalance": True, "rebalance_frequency": "Y"},
+                "projection": False,
+            }
+        }
+
+
+class portfolio_rolling(BaseModel):
+    start_date: str
+    end_date: str
+    portfolio: list
+    strategy: dict
+    windows: List[conint(ge=2)] = [365]
+
+    class Config:
+        schema_extra = {
+            "example": {
+                "start_date": "2015-12-31",
+                "end_date": "2020-06-30",
+                "portfolio": [
+                    {"fund": "ABMD", "amount": 1000},
+                    {"fund": "ATVI", "amount": 1000},
+                ],
+                "strategy": {"rebalance": True, "rebalance_frequency": "Y"},
+                "windows": [91, 365],
+            }
+        }
@@ -1,6 +1,7 @@
 from enum import Enum
+from typing import Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, conint, validator
 
 
 class Frequency(str, Enum):
@@ -14,6 +15,18 @@ class factor(BaseModel):
     funds: list
     factors: list
     frequency: Frequency
+    window: Optional[conint(ge=2)] = None
+    expanding: bool = False
+
+    @validator("window")
+    def window_fits_regressors(cls, window, values):
+        # Every regression needs an observation per factor and intercept
+        factors = values.get("factors")
+        if window is not None and factors and window <= len(factors):
+            raise ValueError(
+                "window must be larger than the number of factors"
+            )
+        return window
 
     class Config:
         schema_extra = {
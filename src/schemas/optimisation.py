@@ -1,4 +1,10 @@
-from pydantic import BaseModel
+from typing import Optional
+
+from pydantic import BaseModel, conint
+
+from src.modules.covariance import CovarianceMethod
+from src.modules.optimisation import FrontierMethod
+from src.modules.parallel import Executor, config
 
 
 class optimisation(BaseModel):
@@ -6,6 +12,10 @@ class optimisation(BaseModel):
     end_date: str
     funds: list
     num_portfolios: int
+    covariance: CovarianceMethod = CovarianceMethod.sample
+    method: FrontierMethod = FrontierMethod.cla
+    executor: Executor = config["executor"]
+    max_workers: Optional[conint(ge=1)] = None
 
     class Config:
         schema_extra = {
@@ -0,0 +1,90 @@
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.modules.storage import LocalStorage
+
+funds = {
+    "F00000UEXJ": "iShares UK Equity Index Fund",
+    "F00000OJMA": "Legal & General US Index Trust",
+    "F00000OOB2": "HSBC European Index Fund",
+    "F00000001": "Fixture Bond Fund",
+    "F00000002": "Fixture Emerging Markets Fund",
+}
+
+
+def write_market_data(root: str) -> None:
+    """
+    Write a small, seeded copy of every market dataset
+
+    Prices are random walks and factors are noise, so values pinned in
+    tests only hold for this data and not for the production bucket.
+
+    Args:
+        root (str): Directory to write the 01_primary files into
+    """
+    rng = np.random.default_rng(0)
+    path = os.path.join(root, "01_primary")
+    os.makedirs(path)
+    dates = pd.bdate_range("2010-01-01", "2021-12-31")
+    returns = rng.normal(0.0003, 0.01, (len(dates), len(funds)))
+    prices = pd.DataFrame(
+        100 * np.exp(np.cumsum(returns, axis=0)), columns=list(funds)
+    )
+    prices.insert(0, "date", dates.strftime("%Y-%m-%d"))
+    prices.to_parquet(
+        os.path.join(path, "fund_prices.parquet"),
+        index=False,
+        row_group_size=500,
+    )
+    pd.DataFrame(
+        {"Code": list(funds), "Company": list(funds.values())}
+    ).to_parquet(os.path.join(path, "fund_codes.parquet"))
+    sp500 = pd.DataFrame(
+        {
+            "Date": dates,
+            "close": 2000
+            * np.exp(np.cumsum(rng.normal(0.0003, 0.01, len(dates)))),
+        }
+    )
+    sp500.to_parquet(os.path.join(path, "sp500.parquet"))
+    for name, index, scale, rate in [
+        ("ff_daily", dates, 1, 0.005),
+        ("ff_monthly", pd.date_range(dates[0], dates[-1], freq="M"), 4, 0.1),
+    ]:
+        # Percentages, like Kenneth French's files
+        factors = pd.DataFrame(
+            {
+                "date": index,
+                "MktRF": rng.normal(0.03 * scale, scale, len(index)),
+                "SMB": rng.normal(0, scale / 2, len(index)),
+                "HML": rng.normal(0, scale / 2, len(index)),
+                "RF": np.full(len(index), rate),
+            }
+        )
+        factors.to_parquet(os.path.join(path, f"{name}.parquet"))
+
+
+def pytest_configure(config):
+    # Runs before test modules import the API, so every DataLoader reads
+    # the generated files through LocalStorage and the suite runs offline
+    root = tempfile.mkdtemp(prefix="aurora-market-data-")
+    write_market_data(root)
+    config.market_data_path = root
+    os.environ["AURORA_DATA_PATH"] = root
+    os.environ.pop("AURORA_MIRROR_PATH", None)
+    os.environ.pop("AURORA_SNAPSHOT_PATH", None)
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(config.market_data_path, ignore_errors=True)
+
+
+@pytest.fixture(scope="session")
+def local_storage(pytestconfig) -> LocalStorage:
+    """Storage holding the generated market data"""
+    return LocalStorage(pytestconfig.market_data_path)
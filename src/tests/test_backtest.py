@@ -1,3 +1,6 @@
+import json
+
+import pyarrow as pa
 import pytest
 from fastapi.testclient import TestClient
 
@@ -39,10 +42,10 @@ def test_fund_response_backtest_rebalancefalse():
     assert response.json()["projection"][0]["date"] == "2018-12-31"
 
     assert response.json()["projection"][-1]["portfolio"] == pytest.approx(
-        2467.0695460478
+        2329.8289357016
     )
     assert response.json()["projection"][-1]["drawdown"] == pytest.approx(
-        -0.0294445297
+        -0.0336581984
     )
     assert response.json()["projection"][-1]["date"] == "2020-01-30"
 
@@ -66,28 +69,147 @@ def test_fund_response_backtest_rebalancetrue():
     assert response.json()["projection"][0]["date"] == "2018-12-31"
 
     assert response.json()["projection"][-1]["portfolio"] == pytest.approx(
-        2465.5738044157
+        2334.9781227022
     )
     assert response.json()["projection"][-1]["drawdown"] == pytest.approx(
-        -0.0294748496
+        -0.0315224731
     )
     assert response.json()["projection"][-1]["date"] == "2020-01-30"
 
     assert response.json()["metrics"]["metrics"]["cagr"] == pytest.approx(
-        0.21350801373437478
+        0.15395155343354894
     )
     assert response.json()["metrics"]["metrics"]["std_m"] == pytest.approx(
-        0.027241926252289553
+        0.03337438825474902
     )
     assert response.json()["metrics"]["metrics"][
         "std_downside_m"
-    ] == pytest.approx(0.005651932970421152)
+    ] == pytest.approx(0.014918333521224915)
+    assert response.json()["metrics"]["metrics"]["risk_free"] == pytest.approx(
+        0.01312976498542231
+    )
     assert response.json()["metrics"]["metrics"][
         "sharpe_ratio"
-    ] == pytest.approx(7.470397351849188)
+    ] == pytest.approx(4.2194567694611855)
     assert response.json()["metrics"]["metrics"][
         "sortino_ratio"
-    ] == pytest.approx(36.006798877377776)
+    ] == pytest.approx(9.439512010357845)
     assert response.json()["metrics"]["metrics"][
         "max_drawdown"
-    ] == pytest.approx(0.06304792760097977)
+    ] == pytest.approx(0.06789731379031927)
+
+
+def test_backtest_batch_matches_single_backtest():
+    portfolio = [
+        {"fund": "F00000UEXJ", "amount": 1000},
+        {"fund": "F00000OJMA", "amount": 1000},
+    ]
+    request = {
+        "start_date": "2018-12-31",
+        "end_date": "2020-01-30",
+        "strategy": {"rebalance": True, "rebalance_frequency": "Y"},
+    }
+    single = client.post(
+        "/backtest/", json={**request, "portfolio": portfolio}
+    )
+    batch = client.post(
+        "/backtest/batch",
+        json={
+            **request,
+            "portfolios": [portfolio, [{"fund": "F00000UEXJ", "amount": 10}]],
+            "projection": True,
+        },
+    )
+    assert batch.status_code == 200
+    assert len(batch.json()["portfolios"]) == 2
+    result = batch.json()["portfolios"][0]
+    assert result["projection"][-1]["portfolio"] == pytest.approx(
+        single.json()["projection"][-1]["portfolio"]
+    )
+    for metric, value in single.json()["metrics"]["metrics"].items():
+        assert result["metrics"]["metrics"][metric] == pytest.approx(value)
+
+
+def test_backtest_ndjson_stream():
+    response = client.post(
+        "/backtest/",
+        json={
+            "start_date": "2018-12-31",
+            "end_date": "2020-01-30",
+            "portfolio": [{"fund": "F00000UEXJ", "amount": 1000}],
+            "strategy": {"rebalance": False, "rebalance_frequency": "Y"},
+        },
+        headers={"Accept": "application/x-ndjson"},
+    )
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(i) for i in response.text.splitlines()]
+    assert lines[0]["date"] == "2018-12-31"
+    assert lines[0]["portfolio"] == 1000
+    assert lines[-2]["date"] == "2020-01-30"
+    assert "cagr" in lines[-1]["metrics"]["metrics"]
+
+
+def test_backtest_arrow_stream():
+    request = {
+        "start_date": "2018-12-31",
+        "end_date": "2020-01-30",
+        "portfolio": [{"fund": "F00000UEXJ", "amount": 1000}],
+        "strategy": {"rebalance": False, "rebalance_frequency": "Y"},
+    }
+    response = client.post(
+        "/backtest/",
+        json=request,
+        headers={"Accept": "application/vnd.apache.arrow.stream"},
+    )
+    table = pa.ipc.open_stream(response.content).read_all()
+    metrics = json.loads(table.schema.metadata[b"metrics"])
+    assert all(not isinstance(i, (dict, list)) for i in metrics.values())
+    frame = table.to_pandas()
+    expected = client.post("/backtest/", json=request).json()["metrics"]
+    assert metrics == pytest.approx(expected["metrics"])
+    monthly = frame.dropna(subset=["monthly_portfolio_returns"])
+    assert len(monthly) == len(expected["monthly"]["return"])
+    assert monthly["monthly_portfolio_returns"].tolist() == pytest.approx(
+        [i["portfolio_returns"] for i in expected["monthly"]["return"]]
+    )
+    annual = frame.dropna(subset=["annual_market_returns"])
+    assert annual["date"].dt.strftime("%Y-%m-%d").tolist() == [
+        i["date"] for i in expected["annual"]["return"]
+    ]
+
+
+def test_backtest_rolling():
+    response = client.post(
+        "/backtest/rolling",
+        json={
+            "start_date": "2018-12-31",
+            "end_date": "2020-06-30",
+            "portfolio": [
+                {"fund": "F00000UEXJ", "amount": 1000},
+                {"fund": "F00000OJMA", "amount": 1000},
+            ],
+            "strategy": {"rebalance": True, "rebalance_frequency": "Y"},
+            "windows": [30, 365],
+        },
+    )
+    assert response.status_code == 200
+    rolling = response.json()["rolling"]
+    assert list(rolling) == ["30", "365"]
+    assert rolling["365"][364]["volatility"] is None
+    assert rolling["365"][-1]["max_drawdown"] >= 0
+
+
+def test_backtest_rolling_window_longer_than_portfolio():
+    response = client.post(
+        "/backtest/rolling",
+        json={
+            "start_date": "2019-01-01",
+            "end_date": "2019-03-01",
+            "portfolio": [{"fund": "F00000UEXJ", "amount": 1000}],
+            "strategy": {"rebalance": True, "rebalance_frequency": "Y"},
+            "windows": [100],
+        },
+    )
+    assert response.status_code == 200
+    rolling = response.json()["rolling"]["100"]
+    assert all(row["volatility"] is None for row in rolling)
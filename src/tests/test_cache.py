@@ -0,0 +1,107 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+
+from src.api.cache import ResponseCache, cached, matches, response_cache
+from src.api.responses import ORJSONResponse
+from src.modules.data_loader import DataLoader, config, store
+
+
+class Item(BaseModel):
+    value: int
+
+
+calls = []
+app = FastAPI()
+
+
+@app.post("/double")
+@cached(["fund_prices"])
+def double(item: Item, scale: int = 2):
+    calls.append(item.value)
+    return ORJSONResponse({"result": item.value * scale})
+
+
+client = TestClient(app)
+
+
+def test_response_cache_eviction():
+    cache = ResponseCache(max_entries=2, max_bytes=10)
+    cache.put("a", b"1234", "text/plain")
+    cache.put("b", b"1234", "text/plain")
+    assert cache.get("a") == (b"1234", "text/plain")
+    # Third entry is over max_entries, b is the least recently used
+    cache.put("c", b"12", "text/plain")
+    assert cache.get("b") is None
+    assert len(cache) == 2 and cache.size == 6
+    # Over max_bytes, a then c are dropped to make room
+    cache.put("d", b"123456789", "text/plain")
+    assert cache.get("a") is None and cache.get("c") is None
+    assert cache.size == 9
+    # Larger than the whole cache, not stored
+    cache.put("e", b"12345678901", "text/plain")
+    assert cache.get("e") is None and len(cache) == 1
+
+
+def test_matches():
+    assert matches('"abc"', '"abc"')
+    assert matches('"xyz", W/"abc"', '"abc"')
+    assert matches("*", '"abc"')
+    assert not matches('"xyz"', '"abc"')
+    assert not matches(None, '"abc"')
+
+
+def test_cached_endpoint():
+    response_cache.clear()
+    calls.clear()
+    first = client.post("/double", json={"value": 3})
+    second = client.post("/double", json={"value": 3})
+    assert first.json() == second.json() == {"result": 6}
+    assert first.headers["etag"] == second.headers["etag"]
+    assert second.headers["content-type"] == "application/json"
+    assert calls == [3]
+
+    # Query parameters and the body are part of the key
+    assert client.post("/double?scale=3", json={"value": 3}).json() == {
+        "result": 9
+    }
+    client.post("/double", json={"value": 4})
+    assert calls == [3, 3, 4]
+
+    not_modified = client.post(
+        "/double",
+        json={"value": 3},
+        headers={"If-None-Match": first.headers["etag"]},
+    )
+    assert not_modified.status_code == 304
+    assert not_modified.headers["etag"] == first.headers["etag"]
+    assert calls == [3, 3, 4]
+
+    # Loading another dataset keeps responses
+    store.clear()
+    response_cache.clear()
+    client.post("/double", json={"value": 3})
+    third = client.post("/double", json={"value": 3})
+    DataLoader().load_dataset("fund_codes")
+    assert client.post("/double", json={"value": 3}).headers["etag"] == (
+        third.headers["etag"]
+    )
+    assert calls == [3, 3, 4, 3]
+
+    # Reloading an unchanged file keeps responses, a changed file
+    # invalidates them once reloaded
+    versions = ["v1"]
+    source = DataLoader().storage.uri(config["fund_prices"])
+    store.get("test-cache-prices", lambda: None, lambda: versions[-1], source)
+    fourth = client.post("/double", json={"value": 3})
+    assert fourth.headers["etag"] != third.headers["etag"]
+    store.refresh("test-cache-prices")
+    assert client.post("/double", json={"value": 3}).headers["etag"] == (
+        fourth.headers["etag"]
+    )
+    versions.append("v2")
+    store.refresh("test-cache-prices")
+    fifth = client.post("/double", json={"value": 3})
+    assert fifth.headers["etag"] != fourth.headers["etag"]
+    assert calls == [3, 3, 4, 3, 3, 3]
+    store.clear()
@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+from scipy.optimize import minimize
+
+from src.modules.cla import CriticalLine
+
+
+def minimum_variance(mean, covariance, target=None):
+    constraints = [{"type": "eq", "fun": lambda x: np.sum(x) - 1}]
+    if target is not None:
+        constraints.append({"type": "eq", "fun": lambda x: mean @ x - target})
+    return minimize(
+        lambda x: x @ covariance @ x,
+        np.full(len(mean), 1 / len(mean)),
+        jac=lambda x: 2 * covariance @ x,
+        method="SLSQP",
+        bounds=[(0, 1)] * len(mean),
+        constraints=constraints,
+        options={"ftol": 1e-16, "maxiter": 1000},
+    ).x
+
+
+def test_critical_line_matches_numerical_frontier():
+    rng = np.random.default_rng(0)
+    returns = rng.normal(0.008, 0.04, (120, 6)) + rng.normal(0, 0.01, 6)
+    mean = returns.mean(axis=0)
+    covariance = np.cov(returns, rowvar=False)
+    line = CriticalLine(mean, covariance)
+    assert np.all(np.diff(line.returns) <= 0)
+    assert line.weights[0][np.argmax(mean)] == 1
+    expected = minimum_variance(mean, covariance)
+    assert line.minimum_variance() @ covariance @ line.minimum_variance() == (
+        pytest.approx(expected @ covariance @ expected, rel=1e-8)
+    )
+    for target in np.linspace(line.returns[-1], line.returns[0], 7):
+        weights = line.frontier_weights(target)
+        expected = minimum_variance(mean, covariance, target)
+        assert weights.sum() == pytest.approx(1)
+        assert weights.min() >= -1e-12
+        assert mean @ weights == pytest.approx(target)
+        assert weights @ covariance @ weights == pytest.approx(
+            expected @ covariance @ expected, rel=1e-8
+        )
+
+
+def sample_covariance(n_assets, seed=1):
+    rng = np.random.default_rng(seed)
+    returns = rng.normal(0.008, 0.04, (120, n_assets))
+    return np.cov(returns, rowvar=False)
+
+
+@pytest.mark.parametrize(
+    "mean", [[0.01, 0.01, 0.01], [0.02, 0.02, 0.01], [0.01, 0.02, 0.02]]
+)
+def test_critical_line_tied_means(mean):
+    mean = np.array(mean)
+    covariance = sample_covariance(len(mean))
+    line = CriticalLine(mean, covariance)
+    weights = line.minimum_variance()
+    expected = minimum_variance(mean, covariance)
+    assert weights.sum() == pytest.approx(1)
+    assert weights == pytest.approx(expected, abs=1e-6)
+    assert line.returns[0] == pytest.approx(mean.max())
+
+
+def test_critical_line_duplicate_fund():
+    rng = np.random.default_rng(2)
+    returns = rng.normal(0.008, 0.04, (120, 4)) + rng.normal(0, 0.01, 4)
+    best = np.argmax(returns.mean(axis=0))
+    # The best fund twice and a fund that is a mix of two others, so the
+    # covariance is singular
+    returns = np.column_stack(
+        [
+            returns,
+            returns[:, best],
+            0.3 * returns[:, 0] + 0.7 * returns[:, 2],
+        ]
+    )
+    mean = returns.mean(axis=0)
+    covariance = np.cov(returns, rowvar=False)
+    line = CriticalLine(mean, covariance)
+    weights = line.minimum_variance()
+    expected = minimum_variance(mean, covariance)
+    assert weights.sum() == pytest.approx(1)
+    assert weights.min() >= -1e-12
+    assert weights @ covariance @ weights == pytest.approx(
+        expected @ covariance @ expected, rel=1e-6
+    )
+    for target in np.linspace(line.returns[-1], line.returns[0], 5):
+        weights = line.frontier_weights(target)
+        expected = minimum_variance(mean, covariance, target)
+        assert mean @ weights == pytest.approx(target)
+        assert weights @ covariance @ weights == pytest.approx(
+            expected @ covariance @ expected, rel=1e-6
+        )
+
+
+def test_critical_line_full_rank():
+    rng = np.random.default_rng(9)
+    returns = rng.normal(0.008, 0.04, (120, 4))
+    assert CriticalLine.full_rank(np.cov(returns, rowvar=False))
+    # A share class with a higher fee moves with the fund it tracks
+    returns = np.column_stack([returns, returns[:, 0] - 0.001])
+    assert not CriticalLine.full_rank(np.cov(returns, rowvar=False))
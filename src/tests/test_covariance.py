@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.modules.covariance import (
+    CovarianceMethod,
+    cache,
+    cached_covariance,
+    estimate_covariance,
+    ewma_covariance,
+    factor_covariance,
+    ledoit_wolf_covariance,
+)
+
+
+def test_ledoit_wolf_covariance():
+    rng = np.random.default_rng(0)
+    returns = rng.normal(0, 0.04, (30, 20))
+    n_obs, n_assets = returns.shape
+    centered = returns - returns.mean(axis=0)
+    sample = centered.T @ centered / n_obs
+    mu = np.trace(sample) / n_assets
+    target = mu * np.eye(n_assets)
+    delta = np.sum((sample - target) ** 2) / n_assets
+    beta = sum(np.sum((np.outer(x, x) - sample) ** 2) for x in centered) / (
+        n_obs**2 * n_assets
+    )
+    expected = min(beta, delta) / delta
+    covariance, shrinkage = ledoit_wolf_covariance(returns)
+    assert shrinkage == pytest.approx(expected)
+    np.testing.assert_allclose(
+        covariance, (1 - expected) * sample + expected * target
+    )
+    assert np.linalg.cond(covariance) < np.linalg.cond(sample)
+
+
+def test_ewma_covariance():
+    rng = np.random.default_rng(0)
+    returns = pd.DataFrame(rng.normal(0, 0.04, (60, 3)))
+    expected = returns.ewm(alpha=0.03).cov(bias=True).loc[59]
+    np.testing.assert_allclose(
+        ewma_covariance(returns.to_numpy(), 0.97), expected
+    )
+
+
+def test_factor_covariance():
+    rng = np.random.default_rng(0)
+    factors = rng.normal(0, 0.04, (120, 2))
+    returns = factors @ rng.normal(1, 0.3, (2, 4)) + rng.normal(
+        0, 0.01, (120, 4)
+    )
+    exog = np.column_stack((np.ones(120), factors))
+    params = np.linalg.lstsq(exog, returns, rcond=None)[0]
+    resid = returns - exog @ params
+    expected = params[1:].T @ np.cov(factors, rowvar=False) @ params[1:]
+    expected += np.diag(np.sum(resid**2, axis=0) / (120 - 3))
+    np.testing.assert_allclose(factor_covariance(returns, factors), expected)
+
+
+@pytest.mark.parametrize("method", list(CovarianceMethod))
+def test_estimate_covariance(method):
+    rng = np.random.default_rng(0)
+    dates = pd.date_range("2010-01-31", periods=60, freq="M")
+    returns = pd.DataFrame(rng.normal(0, 0.04, (60, 3)), columns=list("ABC"))
+    returns.insert(0, "date", dates)
+    factors = pd.DataFrame(
+        rng.normal(0, 0.04, (60, 3)), columns=["MktRF", "SMB", "HML"]
+    )
+    factors.insert(0, "date", dates)
+    covariance = estimate_covariance(method, returns, "monthly", factors)
+    assert list(covariance.index) == list(covariance.columns) == list("ABC")
+    np.testing.assert_allclose(covariance, covariance.T)
+    assert np.all(np.linalg.eigvalsh(covariance) > 0)
+    if method == CovarianceMethod.sample:
+        np.testing.assert_allclose(covariance, returns[list("ABC")].cov())
+
+
+def test_cached_covariance():
+    cache.clear()
+    calls = []
+
+    def estimator():
+        calls.append(1)
+        return pd.DataFrame(np.eye(2))
+
+    key = (("A", "B"), "2015-12-31", "2019-12-31", "monthly", "sample")
+    first = cached_covariance(key, estimator)
+    assert cached_covariance(key, estimator) is first
+    assert len(calls) == 1
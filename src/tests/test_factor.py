@@ -1,7 +1,11 @@
+import numpy as np
+import pandas as pd
 import pytest
 from fastapi.testclient import TestClient
 
+from src.api.responses import dumps
 from src.main import app
+from src.modules.factor_analysis import FactorAnalysis, FeatureMatrix
 
 client = TestClient(app)
 
@@ -33,19 +37,19 @@ def test_apple_regression_12month():
     )
     assert response.json()[0]["fund_code"] == "F00000UEXJ"
     assert response.json()[0]["num_observations"] == 12
-    assert response.json()[0]["rsquared"] == pytest.approx(0.4168539352208934)
-    assert response.json()[0]["fvalue"] == pytest.approx(1.9062299500271107)
+    assert response.json()[0]["rsquared"] == pytest.approx(0.48280567539812713)
+    assert response.json()[0]["fvalue"] == pytest.approx(2.489357945009844)
     assert response.json()[0]["coefficient"]["Intercept"] == pytest.approx(
-        -0.0016291295180895075
+        0.009900634827085633
     )
     assert response.json()[0]["coefficient"]["MktRF"] == pytest.approx(
-        0.369107130361537
+        0.22307269617267036
     )
     assert response.json()[0]["coefficient"]["SMB"] == pytest.approx(
-        0.4497440405163511
+        -0.053882577092907724
     )
     assert response.json()[0]["coefficient"]["HML"] == pytest.approx(
-        0.4028992514591269
+        1.3836455068592524
     )
 
 
@@ -63,13 +67,94 @@ def test_rolling_regression():
     assert response.json()[0]["fund_code"] == "F00000UEXJ"
     assert response.json()[0]["params"]["Intercept"][
         "2019-12-31"
-    ] == pytest.approx(0.0010084235)
+    ] == pytest.approx(0.0157210322)
     assert response.json()[0]["params"]["MktRF"][
         "2019-12-31"
-    ] == pytest.approx(0.6055344585)
+    ] == pytest.approx(0.5370506266)
     assert response.json()[0]["params"]["SMB"]["2019-12-31"] == pytest.approx(
-        -0.2810892952
+        0.0954615096
     )
     assert response.json()[0]["params"]["HML"]["2019-12-31"] == pytest.approx(
-        0.2496138221
+        -0.5917408111
     )
+
+
+@pytest.mark.parametrize("window", [0, -1, 3])
+def test_rolling_regression_rejects_short_window(window):
+    response = client.post(
+        "/factor_analysis/rolling/",
+        json={
+            "start_date": "2017-12-31",
+            "end_date": "2019-12-31",
+            "funds": ["F00000UEXJ"],
+            "factors": ["MktRF", "SMB", "HML"],
+            "frequency": "monthly",
+            "window": window,
+        },
+    )
+    assert response.status_code == 422
+
+
+def test_feature_matrix():
+    fund_returns = pd.DataFrame(
+        {
+            "date": pd.to_datetime(["2020-01-01", "2020-01-02", "2020-01-03"]),
+            "AAPL": [0.01, 0.02, 0.03],
+            "AMZN": [0.04, 0.05, 0.06],
+        }
+    )
+    ff_factors = pd.DataFrame(
+        {
+            "date": pd.to_datetime(["2020-01-02", "2020-01-03", "2020-01-06"]),
+            "MktRF": [0.1, 0.2, 0.3],
+            "SMB": [0.4, 0.5, 0.6],
+            "RF": [0.001, 0.002, 0.003],
+        }
+    )
+    features = FeatureMatrix.from_frames(
+        fund_returns, ff_factors, ["AMZN", "AAPL"], ["MktRF"]
+    )
+    assert list(features.dates) == list(
+        pd.to_datetime(["2020-01-02", "2020-01-03"])
+    )
+    np.testing.assert_allclose(
+        features.excess_returns, [[0.049, 0.019], [0.058, 0.028]]
+    )
+    np.testing.assert_allclose(features.exog, [[1, 0.1], [1, 0.2]])
+    np.testing.assert_allclose(features.exog_het, [[0.1, 0.001], [0.2, 0.002]])
+    assert np.shares_memory(features.exog, features.values)
+    assert features.param_names == ["Intercept", "MktRF"]
+
+
+def test_factor_analysis_executors_match():
+    rng = np.random.default_rng(0)
+    dates = pd.date_range("2020-01-01", periods=60)
+    funds = [f"F{i:08d}" for i in range(5)]
+    fund_returns = pd.DataFrame(rng.normal(0, 0.01, (60, 5)), columns=funds)
+    fund_returns.insert(0, "date", dates)
+    ff_factors = pd.DataFrame(
+        rng.normal(0, 0.01, (60, 3)), columns=["MktRF", "SMB", "RF"]
+    )
+    ff_factors.insert(0, "date", dates)
+    results = []
+    for executor in ["serial", "thread", "process"]:
+        analysis = FactorAnalysis(
+            fund_codes=funds,
+            start_date="2020-01-01",
+            end_date="2020-02-29",
+            factors=["MktRF", "SMB"],
+            fund_returns=fund_returns,
+            ff_factors=ff_factors,
+            executor=executor,
+            max_workers=2,
+            chunk_size=2,
+        )
+        results.append(
+            dumps(
+                [
+                    analysis.regress_funds(),
+                    analysis.rolling_regress_funds("daily"),
+                ]
+            )
+        )
+    assert results[0] == results[1] == results[2]
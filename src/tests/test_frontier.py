@@ -1,7 +1,18 @@
+import numpy as np
+import pandas as pd
 import pytest
 from fastapi.testclient import TestClient
+from scipy.optimize import approx_fprime
 
+from src.api.cache import response_cache
 from src.main import app
+from src.modules.covariance import cache
+from src.modules.data_loader import DataLoader, config, store
+from src.modules.optimisation import (
+    PortfolioOptimisation,
+    portfolio_std,
+    portfolio_std_gradient,
+)
 
 client = TestClient(app)
 
@@ -19,6 +30,34 @@ def test_frontier_response_code():
     assert response.status_code == 200
 
 
+def test_frontier_covariance_follows_data_version():
+    request = {
+        "start_date": "2016-12-31",
+        "end_date": "2019-12-31",
+        "funds": ["F00000UEXJ", "F00000OOB2"],
+        "num_portfolios": 2,
+    }
+    versions = ["v1"]
+    source = DataLoader().storage.uri(config["fund_prices"])
+    store.get(
+        "test-frontier-prices", lambda: None, lambda: versions[-1], source
+    )
+    cache.clear()
+    client.post("/optimisation/", json=request)
+    # Loading datasets the estimate is not computed from keeps it
+    DataLoader().load_risk_free("daily")
+    response_cache.clear()
+    client.post("/optimisation/", json=request)
+    assert len(cache) == 1
+    # Estimates of replaced prices are not reused
+    versions.append("v2")
+    store.refresh("test-frontier-prices")
+    response_cache.clear()
+    assert client.post("/optimisation/", json=request).status_code == 200
+    assert len(cache) == 2
+    store.clear()
+
+
 def test_frontier_three_funds():
     response = client.post(
         "/optimisation/",
@@ -26,16 +65,82 @@ def test_frontier_three_funds():
             "start_date": "2015-12-31",
             "end_date": "2019-12-31",
             "funds": ["F00000UEXJ", "F00000OJMA", "F00000OOB2"],
-            "num_portfolios": 4,
+            "num_portfolios": 10,
         },
     )
-    assert response.json()["frontier"][0]["returns"] == pytest.approx(0.013781)
-    assert response.json()["frontier"][0]["std"] == pytest.approx(0.035669)
+    assert response.json()["frontier"][0]["returns"] == pytest.approx(0.012673)
+    assert response.json()["frontier"][0]["std"] == pytest.approx(0.04176)
     assert (
         response.json()["frontier"][0]["portfolio_weights"]["F00000OJMA"] == 1
     )
-    assert response.json()["frontier"][1]["returns"] == pytest.approx(0.011762)
-    assert response.json()["frontier"][1]["std"] == pytest.approx(0.030697)
+    assert response.json()["frontier"][1]["returns"] == pytest.approx(0.011778)
+    assert response.json()["frontier"][1]["std"] == pytest.approx(0.029778)
     assert response.json()["frontier"][1]["portfolio_weights"][
         "F00000UEXJ"
-    ] == pytest.approx(0.142057)
+    ] == pytest.approx(0.394033, abs=1e-5)
+
+
+def test_portfolio_std_gradient():
+    rng = np.random.default_rng(0)
+    returns = rng.normal(0, 0.04, (60, 4))
+    covariance = np.cov(returns, rowvar=False)
+    weights = np.array([0.1, 0.2, 0.3, 0.4])
+    expected = approx_fprime(weights, portfolio_std, 1e-8, covariance)
+    np.testing.assert_allclose(
+        portfolio_std_gradient(weights, covariance), expected, rtol=1e-5
+    )
+
+
+def test_frontier_portfolios_meet_targets():
+    rng = np.random.default_rng(0)
+    returns = pd.DataFrame(rng.normal(0.008, 0.04, (120, 6)))
+    fund_returns = returns.mean()
+    portfolios = PortfolioOptimisation().efficient_frontier_portfolios(
+        fund_returns, returns.cov(), 5
+    )
+    targets = np.linspace(fund_returns.min(), fund_returns.max(), 5)
+    for weights, target in zip(portfolios, targets):
+        assert np.sum(weights) == pytest.approx(1, abs=1e-5)
+        assert np.dot(weights, fund_returns) == pytest.approx(target, abs=1e-5)
+        assert min(weights) >= 0
+
+
+def test_slsqp_frontier_executors_match():
+    rng = np.random.default_rng(0)
+    returns = pd.DataFrame(rng.normal(0.008, 0.04, (120, 4)))
+    results = []
+    for executor in ["serial", "thread", "process"]:
+        optimisation = PortfolioOptimisation(
+            method="slsqp", executor=executor, max_workers=2, chunk_size=2
+        )
+        results.append(
+            optimisation.efficient_frontier_portfolios(
+                returns.mean(), returns.cov(), 5
+            )
+        )
+    assert results[0] == results[1] == results[2]
+
+
+def test_cla_frontier_collinear_funds_match_slsqp():
+    rng = np.random.default_rng(9)
+    returns = rng.normal(0.008, 0.04, (120, 4)) + rng.normal(0, 0.01, 4)
+    # Share class of the first fund with a higher fee
+    returns = pd.DataFrame(np.column_stack([returns, returns[:, 0] - 0.001]))
+    fund_returns = returns.mean()
+    covariance = returns.cov()
+    frontiers = [
+        PortfolioOptimisation(method=method).efficient_frontier_portfolios(
+            fund_returns, covariance, 7
+        )
+        for method in ["cla", "slsqp"]
+    ]
+    for weights, expected in zip(*frontiers):
+        assert np.dot(weights, fund_returns) == pytest.approx(
+            np.dot(expected, fund_returns), abs=1e-5
+        )
+        assert portfolio_std(np.array(weights), covariance.values) == (
+            pytest.approx(
+                portfolio_std(np.array(expected), covariance.values),
+                rel=1e-4,
+            )
+        )
@@ -0,0 +1,190 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.modules.data_loader import DataLoader
+from src.modules.market_data import (
+    FilledPriceMatrix,
+    MarketDataStore,
+    PriceMatrix,
+    RiskFreeRate,
+    prepare_timeseries,
+)
+
+
+def test_store_loads_once():
+    calls = []
+    store = MarketDataStore(max_age_seconds=3600)
+
+    def loader():
+        calls.append(1)
+        return len(calls)
+
+    assert store.get("prices", loader) == 1
+    assert store.get("prices", loader) == 1
+    assert len(calls) == 1
+    store.stop()
+
+
+def test_store_refreshes_in_background():
+    calls = []
+    store = MarketDataStore(max_age_seconds=0.05)
+
+    def loader():
+        calls.append(1)
+        return len(calls)
+
+    assert store.get("prices", loader) == 1
+    time.sleep(0.3)
+    assert store.get("prices", loader) > 1
+    store.stop()
+
+
+def test_store_versions_follow_source_files():
+    versions = {"prices": "v1", "factors": "f1"}
+    stores = [MarketDataStore(max_age_seconds=3600) for _ in range(2)]
+    for store in stores:
+        store.get("prices", lambda: 1, lambda: versions["prices"])
+        store.get(
+            "prices#filled", lambda: 2, lambda: versions["prices"], "prices"
+        )
+        # Datasets without a source version are not tracked
+        store.get("derived", lambda: 3)
+    # Loading other files does not change the versions of prices
+    stores[1].get("factors", lambda: 4, lambda: versions["factors"])
+    assert stores[0].versions(["prices"]) == {"prices": ["v1"]}
+    assert stores[0].versions(["prices"]) == stores[1].versions(["prices"])
+    assert stores[0].versions(["factors"]) == {"factors": []}
+    versions["prices"] = "v2"
+    stores[0].refresh("prices")
+    assert stores[0].versions(["prices"]) == {"prices": ["v1", "v2"]}
+    stores[0].refresh("prices#filled")
+    assert stores[0].versions(["prices"]) == {"prices": ["v2"]}
+    stores[0].clear()
+    assert stores[0].versions(["prices"]) == {"prices": []}
+    for store in stores:
+        store.stop()
+
+
+def test_risk_free_rate_without_observations():
+    risk_free = RiskFreeRate(np.array([], dtype="datetime64[ns]"), [])
+    assert np.isnan(risk_free.average("2020-01-01", "2020-12-31"))
+    assert np.isnan(risk_free.annualised("2020-01-01", "2020-12-31"))
+
+
+def test_prepare_timeseries():
+    data = pd.DataFrame(
+        {"date": ["2020-01-03", "2020-01-01"], "AAPL": ["2", "1"]}
+    )
+    result = prepare_timeseries(data)
+    assert list(result.index) == list(
+        pd.to_datetime(["2020-01-01", "2020-01-03"])
+    )
+    assert result.index.name == "date"
+    assert result["AAPL"].dtype == float
+
+
+def test_price_matrix_window():
+    data = pd.DataFrame(
+        {"AAPL": [1.0, 2.0, 3.0, 4.0], "AMZN": [5.0, 6.0, 7.0, 8.0]},
+        index=pd.to_datetime(
+            ["2020-01-01", "2020-01-02", "2020-01-06", "2020-01-07"]
+        ),
+    )
+    matrix = PriceMatrix.from_frame(data)
+    dates, values = matrix.window(["AMZN", "AAPL"], "2020-01-02", "2020-01-06")
+    assert list(dates) == list(
+        np.array(["2020-01-02", "2020-01-06"], dtype="datetime64[ns]")
+    )
+    assert values.tolist() == [[6.0, 2.0], [7.0, 3.0]]
+    assert matrix.rows("2020-01-03", "2020-01-05") == slice(2, 2)
+
+
+def test_filled_price_matrix_matches_window_fill(tmp_path):
+    data = pd.DataFrame(
+        {
+            "AAPL": [1.0, np.nan, 3.0, 4.0, np.nan],
+            "AMZN": [np.nan, 6.0, 7.0, np.nan, 9.0],
+        },
+        index=pd.to_datetime(
+            [
+                "2020-01-02",
+                "2020-01-03",
+                "2020-01-06",
+                "2020-01-08",
+                "2020-01-10",
+            ]
+        ),
+    )
+    matrix = PriceMatrix.from_frame(data)
+    filled = FilledPriceMatrix.from_matrix(matrix)
+    path = str(tmp_path / "prices_filled.panel")
+    filled.save(path, "v1")
+    mapped = FilledPriceMatrix.load(path)
+    assert FilledPriceMatrix.saved_version(path) == "v1"
+    assert os.listdir(tmp_path) == ["prices_filled.panel"]
+    assert mapped.columns == ["AAPL", "AMZN"]
+    assert not mapped.values.flags.writeable
+    windows = [
+        ("2020-01-01", "2020-01-12"),
+        ("2020-01-03", "2020-01-07"),
+        ("2020-01-04", "2020-01-09"),
+        ("2019-12-25", "2020-01-01"),
+    ]
+    for start_date, end_date in windows:
+        expected = DataLoader().fill_calendar(
+            matrix.to_frame(["AMZN", "AAPL"], start_date, end_date),
+            start_date,
+            end_date,
+        )
+        for panel in (filled, mapped):
+            dates, values = panel.window(
+                ["AMZN", "AAPL"], start_date, end_date
+            )
+            assert np.array_equal(dates, expected["date"].values)
+            assert np.array_equal(
+                values, expected[["AMZN", "AAPL"]].values, equal_nan=True
+            )
+
+
+def test_risk_free_rate_windows():
+    dates = pd.bdate_range("2015-01-01", "2019-12-31")
+    rates = np.random.default_rng(0).uniform(0, 0.0002, len(dates))
+    risk_free = RiskFreeRate(dates.values, rates)
+    window = (dates >= "2016-03-01") & (dates <= "2017-06-30")
+    assert risk_free.average("2016-03-01", "2017-06-30") == pytest.approx(
+        rates[window].mean()
+    )
+    periods_per_year = (len(dates) - 1) / (
+        (dates[-1] - dates[0]).days / 365.25
+    )
+    assert risk_free.annualised("2016-03-01", "2017-06-30") == pytest.approx(
+        np.prod(1 + rates[window]) ** (periods_per_year / window.sum()) - 1
+    )
+    starts = dates.values[[0, 10, 20]]
+    ends = dates.values[[5, 15, 25]]
+    np.testing.assert_allclose(
+        risk_free.average(starts, ends),
+        [rates[i : i + 6].mean() for i in (0, 10, 20)],
+    )
+    # Windows past the latest release take the last published rate
+    assert risk_free.average("2020-01-01", "2020-12-31") == rates[-1]
+    assert risk_free.annualised("2020-01-01", "2020-12-31") == (
+        pytest.approx((1 + rates[-1]) ** periods_per_year - 1)
+    )
+    # A gap between releases takes the rate before it
+    assert (
+        risk_free.average("2016-01-02", "2016-01-03")
+        == rates[dates < "2016-01-02"][-1]
+    )
+    annualised = risk_free.annualised(
+        np.array(["2016-03-01", "2020-01-01"], dtype="datetime64[ns]"),
+        np.array(["2017-06-30", "2020-12-31"], dtype="datetime64[ns]"),
+    )
+    assert not np.isnan(annualised).any()
+    assert annualised[0] == pytest.approx(
+        risk_free.annualised("2016-03-01", "2017-06-30")
+    )
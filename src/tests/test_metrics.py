@@ -0,0 +1,181 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.modules.market_data import RiskFreeRate
+from src.modules.metrics import (
+    Metrics,
+    batch_metrics_kernel,
+    metrics_kernel,
+    period_ends,
+    rolling_metrics_kernel,
+    sliding_max_drawdown,
+)
+
+# Metrics of projection() from the statsmodels based implementation
+EXPECTED = {
+    "risk_free": 0.01,
+    "arithmetic_mean_m": 0.001735937875645574,
+    "arithmetic_mean_y": 0.02103129958293226,
+    "geometric_mean_m": 0.0005939908219305678,
+    "geometric_mean_y": 0.007151222487688402,
+    "std_m": 0.047616352230963346,
+    "std_downside_m": 0.029092275780432972,
+    "market_correlation": 0.8629458452847959,
+    "alpha": -0.0011237077459054655,
+    "beta": 0.7696599326702177,
+    "r_squared": 0.7446755318942904,
+    "cagr": 0.0087326089438442,
+    "sharpe_ratio": -0.026616718769390684,
+    "sortino_ratio": -0.043564520896238315,
+    "treynor_ratio": -0.001646689664302493,
+    "calmar_ratio": 0.020029004991896363,
+    "max_drawdown": 0.4359981410647893,
+    "active_return": -0.010272615321389234,
+    "tracking_error": 0.027020833583414252,
+    "information_ratio": -0.3801738865559907,
+    "upside_capture_ratio": 0.7137622938172334,
+    "downside_capture_ratio": 0.7734185896395132,
+    "capture_ratio": 0.9228667417341426,
+}
+
+
+def projection():
+    dates = pd.date_range("2015-01-01", "2019-12-30")
+    rng = np.random.default_rng(0)
+    market_returns = rng.normal(0.0003, 0.01, len(dates))
+    portfolio_returns = (
+        0.0001 + 0.8 * market_returns + rng.normal(0, 0.005, len(dates))
+    )
+    return pd.DataFrame(
+        {
+            "date": dates,
+            "portfolio": 1000 * np.cumprod(1 + portfolio_returns),
+            "market": 2000 * np.cumprod(1 + market_returns),
+        }
+    )
+
+
+def test_period_ends():
+    dates = pd.date_range("2019-12-30", "2021-01-05").to_numpy()
+    months = period_ends(dates, "M")
+    years = period_ends(dates, "Y")
+    assert len(months) == 14
+    assert str(dates[months[1]])[:10] == "2020-01-31"
+    assert [str(dates[i])[:10] for i in years] == [
+        "2019-12-31",
+        "2020-12-31",
+        "2021-01-05",
+    ]
+
+
+def test_metrics_match_previous_implementation():
+    portfolio = projection()
+    result = Metrics(risk_free=0.01).metrics(portfolio)
+    assert result["metrics"] == pytest.approx(EXPECTED, rel=1e-9)
+    assert len(result["monthly"]["return"]) == 59
+    assert len(result["annual"]["return"]) == 4
+    assert result["daily"]["drawdown"]["drawdown"].min() == pytest.approx(
+        -EXPECTED["max_drawdown"]
+    )
+
+
+def test_metrics_kernel_flat_portfolio():
+    portfolio = projection()
+    with np.errstate(invalid="ignore", divide="ignore"):
+        metrics = metrics_kernel(
+            np.full(len(portfolio), 1000.0),
+            portfolio["market"].to_numpy(),
+            portfolio["date"].to_numpy(),
+            0.01,
+        )
+    assert metrics["std_m"] == 0
+    assert metrics["sharpe_ratio"] is None
+    assert metrics["beta"] == 0
+
+
+def test_batch_metrics_match_single_portfolio():
+    portfolio = projection()
+    rng = np.random.default_rng(1)
+    portfolios = 1000 * np.cumprod(
+        1 + rng.normal(0.0003, 0.01, (len(portfolio), 3)), axis=0
+    )
+    portfolios[:, 0] = portfolio["portfolio"]
+    portfolios[100:140, 2] = np.nan
+    market = portfolio["market"].to_numpy()
+    dates = portfolio["date"].to_numpy()
+    metrics = Metrics(risk_free=0.01).batch_metrics(portfolios, market, dates)
+    assert {key: value[0] for key, value in metrics.items()} == (
+        pytest.approx(EXPECTED, rel=1e-9)
+    )
+    for j in range(1, 3):
+        expected = metrics_kernel(portfolios[:, j], market, dates, 0.01)
+        for key, value in expected.items():
+            assert metrics[key][j] == pytest.approx(value, nan_ok=True)
+    assert np.isfinite(metrics["beta"]).all()
+
+
+def test_metrics_with_risk_free_returns():
+    portfolio = projection()
+    dates = pd.bdate_range(portfolio["date"].iloc[0], "2021-12-31")
+    risk_free = RiskFreeRate(dates.values, np.full(len(dates), 0.0001))
+    metrics = Metrics(risk_free=risk_free)
+    assert metrics.metrics(portfolio)["metrics"]["risk_free"] == (
+        pytest.approx(
+            risk_free.annualised(
+                portfolio["date"].iloc[0], portfolio["date"].iloc[-1]
+            )
+        )
+    )
+    rolling = metrics.rolling_metrics(portfolio, [30, len(portfolio)])
+    assert rolling[30]["risk_free"].iloc[30:].notna().all()
+    # No window fits, so no rates are looked up
+    assert rolling[len(portfolio)]["volatility"].isna().all()
+
+
+@pytest.mark.parametrize("window", [1, 2, 7, 50, 300])
+def test_sliding_max_drawdown(window):
+    rng = np.random.default_rng(0)
+    levels = np.exp(np.cumsum(rng.normal(0, 0.02, 300)))
+    expected = [
+        1 - np.min(i / np.maximum.accumulate(i))
+        for i in np.lib.stride_tricks.sliding_window_view(levels, window)
+    ]
+    np.testing.assert_allclose(
+        sliding_max_drawdown(levels, window), expected, atol=1e-12
+    )
+
+
+@pytest.mark.parametrize("window", [2, 30, 365])
+def test_rolling_metrics_kernel(window):
+    portfolio = projection()
+    values = portfolio["portfolio"].to_numpy()
+    market = portfolio["market"].to_numpy()
+    rolling = rolling_metrics_kernel(values, market, window, 0.01)
+    assert np.isnan(rolling["volatility"][:window]).all()
+    for end in [window, len(values) // 2, len(values) - 1]:
+        levels = values[end - window : end + 1]
+        returns = levels[1:] / levels[:-1] - 1
+        market_returns = (
+            np.diff(market[end - window : end + 1])
+            / market[end - window : end]
+        )
+        annual_return = (levels[-1] / levels[0]) ** (365.25 / window) - 1
+        volatility = np.std(returns) * np.sqrt(365.25)
+        expected = {
+            "return": annual_return,
+            "volatility": volatility,
+            "sharpe_ratio": (annual_return - 0.01) / volatility,
+            "beta": np.cov(returns, market_returns, ddof=0)[0, 1]
+            / np.var(market_returns),
+            "tracking_error": np.std(returns - market_returns)
+            * np.sqrt(365.25),
+            "max_drawdown": 1 - np.min(levels / np.maximum.accumulate(levels)),
+        }
+        negative = returns[returns < 0]
+        if len(negative) >= 2:
+            expected["sortino_ratio"] = (annual_return - 0.01) / (
+                np.std(negative) * np.sqrt(365.25)
+            )
+        for key, value in expected.items():
+            assert rolling[key][end] == pytest.approx(value, rel=1e-8)
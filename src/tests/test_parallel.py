@@ -0,0 +1,46 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from src.modules.parallel import Executor, get_pool, map_shared
+
+
+def column_sums(arrays, start, stop):
+    return arrays["values"][:, start:stop].sum(axis=0).tolist()
+
+
+@pytest.mark.parametrize("executor", list(Executor))
+def test_map_shared_keeps_task_order(executor):
+    values = np.asfortranarray(np.arange(24, dtype=float).reshape(4, 6))
+    tasks = [(0, 2), (2, 4), (4, 6)]
+    result = map_shared(
+        column_sums, {"values": values}, tasks, executor, max_workers=2
+    )
+    assert result == [column_sums({"values": values}, *i) for i in tasks]
+
+
+def concurrent_calls(arrays, delay):
+    with arrays["lock"]:
+        arrays["running"][0] += 1
+        arrays["running"][1] = max(arrays["running"])
+    time.sleep(delay)
+    with arrays["lock"]:
+        arrays["running"][0] -= 1
+    return delay
+
+
+@pytest.mark.parametrize("max_workers", [1, 2, 3])
+def test_map_shared_caps_workers_in_shared_pool(max_workers):
+    # Counters are not arrays, thread workers see the same objects
+    arrays = {"lock": threading.Lock(), "running": [0, 0]}
+    tasks = [(0.01,)] * 8
+    result = map_shared(
+        concurrent_calls, arrays, tasks, Executor.thread, max_workers
+    )
+    assert result == [0.01] * 8
+    assert arrays["running"][1] <= max_workers
+    # One pool per executor whatever the workers requested
+    assert get_pool(Executor.thread) is get_pool(Executor.thread)
+    assert get_pool.cache_info().currsize <= len(Executor)
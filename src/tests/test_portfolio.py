@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.modules.portfolio import Portfolio, rebalanced_values
+
+
+def price_history():
+    timeseries = pd.DataFrame(
+        {"A": [1.0, 2.0, 2.0, 4.0], "B": [1.0, 1.0, 1.0, 1.0]}
+    )
+    timeseries["date"] = pd.date_range("2020-01-30", "2020-02-02")
+    return timeseries
+
+
+def test_monthly_rebalancing():
+    result = Portfolio(
+        codes=["A", "B"],
+        amounts=[50, 50],
+        start_date="2020-01-30",
+        end_date="2020-02-02",
+        timeseries=price_history(),
+        rebalance=True,
+        rebalance_frequency="M",
+    ).backtest_strategy()
+    assert result["A"].tolist() == pytest.approx([50, 100, 75, 150])
+    assert result["B"].tolist() == pytest.approx([50, 50, 75, 75])
+    assert result["portfolio"].tolist() == pytest.approx([100, 150, 150, 225])
+    assert list(result["date"]) == list(price_history()["date"])
+
+
+def test_rebalanced_values_for_many_portfolios():
+    prices = price_history()[["A", "B"]].to_numpy()
+    amounts = np.array([[50.0, 100.0, 0.0], [50.0, 0.0, 10.0]])
+    values = rebalanced_values(prices, np.array([0, 1, 3]), amounts)
+    assert values[:, 0] == pytest.approx([100, 150, 150, 225])
+    assert values[:, 1] == pytest.approx([100, 200, 200, 400])
+    assert values[:, 2] == pytest.approx([10, 10, 10, 10])
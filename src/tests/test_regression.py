@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+import statsmodels.api as sm
+from statsmodels.regression.rolling import RollingOLS
+from statsmodels.stats.diagnostic import het_breuschpagan
+from statsmodels.stats.stattools import durbin_watson
+
+from src.modules.regression import (
+    LinearRegression,
+    RollingRegression,
+    has_constant,
+)
+
+
+def test_linear_regression_matches_statsmodels():
+    rng = np.random.default_rng(0)
+    factors = rng.normal(0, 0.02, (60, 3))
+    exog = sm.add_constant(factors)
+    endog = exog @ rng.normal(0, 1, (4, 5)) + rng.normal(0, 0.01, (60, 5))
+    results = LinearRegression(exog, endog)
+    conf_lower, conf_higher = results.conf_int()
+    bp_lm, bp_pvalue = results.breusch_pagan(factors)
+    for j in range(endog.shape[1]):
+        expected = sm.OLS(endog[:, j], exog).fit()
+        bp_test = het_breuschpagan(expected.resid, factors)
+        assert results.params[:, j] == pytest.approx(expected.params)
+        assert results.bse[:, j] == pytest.approx(expected.bse)
+        assert results.pvalues[:, j] == pytest.approx(expected.pvalues)
+        assert conf_lower[:, j] == pytest.approx(expected.conf_int()[:, 0])
+        assert conf_higher[:, j] == pytest.approx(expected.conf_int()[:, 1])
+        assert results.rsquared[j] == pytest.approx(expected.rsquared)
+        assert results.rsquared_adj[j] == pytest.approx(expected.rsquared_adj)
+        assert results.fvalue[j] == pytest.approx(expected.fvalue)
+        assert results.durbin_watson()[j] == pytest.approx(
+            durbin_watson(expected.resid)
+        )
+        assert bp_lm[j] == pytest.approx(bp_test[0])
+        assert bp_pvalue[j] == pytest.approx(bp_test[1])
+
+
+def test_has_constant():
+    rng = np.random.default_rng(0)
+    factors = rng.normal(0, 1, (20, 2))
+    assert not has_constant(factors)
+    assert has_constant(np.column_stack((factors, np.full(20, 0.5))))
+    assert not has_constant(np.column_stack((factors, np.zeros(20))))
+    dummies = np.column_stack(
+        (factors, np.arange(20) < 10, np.arange(20) >= 10)
+    )
+    assert has_constant(dummies.astype(float))
+
+
+@pytest.mark.parametrize(
+    "window, expanding", [(12, False), (30, True), (None, True)]
+)
+def test_rolling_regression_matches_statsmodels(window, expanding):
+    rng = np.random.default_rng(0)
+    exog = sm.add_constant(rng.normal(0, 0.02, (100, 3)))
+    endog = exog @ rng.normal(0, 1, (4, 3)) + rng.normal(0, 0.01, (100, 3))
+    results = RollingRegression(exog, endog, window, expanding=expanding)
+    for j in range(endog.shape[1]):
+        expected = RollingOLS(
+            endog[:, j], exog, window, expanding=expanding
+        ).fit()
+        np.testing.assert_allclose(
+            results.params[:, :, j], expected.params, rtol=1e-8
+        )
+        np.testing.assert_allclose(
+            results.rsquared[:, j], expected.rsquared, rtol=1e-8
+        )
+
+
+def test_rolling_regression_constant_factor_window():
+    rng = np.random.default_rng(0)
+    factors = rng.normal(0, 0.02, (60, 2))
+    # Second factor does not move over the first 20 observations
+    factors[:20, 1] = 0.01
+    exog = sm.add_constant(factors)
+    endog = exog @ np.array([0.001, 0.8, 0.3]) + rng.normal(0, 0.01, 60)
+    results = RollingRegression(exog, endog, window=20)
+    expected = LinearRegression(exog[:20], endog[:20])
+    # The split between intercept and the constant factor is arbitrary,
+    # the fit itself is unique
+    np.testing.assert_allclose(
+        exog[:20] @ results.params[19, :, 0],
+        exog[:20] @ expected.params[:, 0],
+        rtol=1e-8,
+    )
+    assert results.rsquared[19, 0] == pytest.approx(expected.rsquared[0])
+    assert np.isfinite(results.params[19:]).all()
@@ -0,0 +1,78 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from src.api.responses import (
+    ArrowResponse,
+    Orient,
+    accepts,
+    arrow_table,
+    dumps,
+    ndjson_stream,
+)
+
+
+def test_accepts():
+    assert accepts("application/x-ndjson", "application/x-ndjson")
+    assert accepts(
+        "text/html, application/x-ndjson;q=0.9", "application/x-ndjson"
+    )
+    assert not accepts("application/json", "application/x-ndjson")
+    assert not accepts(None, "application/x-ndjson")
+
+
+def test_ndjson_stream():
+    columns = {
+        "date": np.array(["2020-01-01", "2020-01-02"], dtype="datetime64[ns]"),
+        "portfolio": np.array([1.5, np.nan]),
+    }
+    chunks = list(
+        ndjson_stream(columns, trailer={"metrics": {}}, chunk_size=1)
+    )
+    assert len(chunks) == 3
+    lines = [json.loads(i) for i in b"".join(chunks).splitlines()]
+    assert lines == [
+        {"date": "2020-01-01", "portfolio": 1.5},
+        {"date": "2020-01-02", "portfolio": None},
+        {"metrics": {}},
+    ]
+
+
+def test_dumps_frame_orient():
+    frame = pd.DataFrame(
+        {
+            "date": pd.to_datetime(["2020-01-01", "2020-01-02"]),
+            "portfolio": [1.5, np.nan],
+        }
+    )
+    content = {"projection": frame, "sharpe": np.float64(0.5)}
+    assert json.loads(dumps(content)) == {
+        "projection": [
+            {"date": "2020-01-01", "portfolio": 1.5},
+            {"date": "2020-01-02", "portfolio": None},
+        ],
+        "sharpe": 0.5,
+    }
+    assert json.loads(dumps(content, Orient.columns)) == {
+        "projection": {
+            "date": ["2020-01-01", "2020-01-02"],
+            "portfolio": [1.5, None],
+        },
+        "sharpe": 0.5,
+    }
+
+
+def test_arrow_response():
+    frame = pd.DataFrame(
+        {
+            "date": pd.to_datetime(["2020-01-01", "2020-01-02"]),
+            "portfolio": [1.5, np.nan],
+        }
+    )
+    response = ArrowResponse(arrow_table(frame, {"metrics": {"beta": 1.0}}))
+    assert response.media_type == "application/vnd.apache.arrow.stream"
+    table = pa.ipc.open_stream(response.body).read_all()
+    pd.testing.assert_frame_equal(table.to_pandas(), frame)
+    assert json.loads(table.schema.metadata[b"metrics"]) == {"beta": 1.0}
@@ -0,0 +1,71 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from src.modules.data_loader import DataLoader
+from src.modules.snapshot import (
+    read_snapshot,
+    slice_snapshot,
+    snapshot_version,
+    write_snapshot,
+)
+
+
+def test_snapshot_round_trip(tmp_path):
+    data = pd.DataFrame(
+        {"AAPL": [1.0, np.nan, 3.0, 4.0], "AMZN": [5.0, 6.0, 7.0, 8.0]},
+        index=pd.date_range("2020-01-01", periods=4, name="date"),
+    )
+    path = str(tmp_path / "fund_prices.arrow")
+    write_snapshot(data, path, version="1")
+    assert snapshot_version(path) == "1"
+
+    allocated = pa.total_allocated_bytes()
+    table = read_snapshot(path)
+    assert pa.total_allocated_bytes() == allocated
+
+    result = slice_snapshot(table, ["AAPL"], "2020-01-02", "2020-01-03")
+    assert list(result.columns) == ["date", "AAPL"]
+    assert list(result["date"]) == list(
+        pd.to_datetime(["2020-01-02", "2020-01-03"])
+    )
+    assert np.isnan(result["AAPL"][0])
+    assert result["AAPL"][1] == 3.0
+
+
+@pytest.mark.skipif(
+    not os.path.isdir("/proc/self/fd"), reason="needs /proc/self/fd"
+)
+def test_snapshot_reads_close_files(tmp_path):
+    data = pd.DataFrame(
+        {"AAPL": [1.0, 2.0]},
+        index=pd.date_range("2020-01-01", periods=2, name="date"),
+    )
+    path = str(tmp_path / "fund_prices.arrow")
+    write_snapshot(data, path, version="1")
+    open_files = len(os.listdir("/proc/self/fd"))
+    tables = [read_snapshot(path) for _ in range(5)]
+    for _ in range(5):
+        snapshot_version(path)
+    assert len(os.listdir("/proc/self/fd")) == open_files
+    # Tables stay readable once their file is closed
+    assert tables[-1]["AAPL"].to_pylist() == [1.0, 2.0]
+
+
+def test_build_snapshots(tmp_path):
+    data_loader = DataLoader(snapshot_path=str(tmp_path))
+    data_loader.build_snapshots()
+    assert sorted(os.listdir(tmp_path)) == [
+        "ff_daily.arrow",
+        "ff_monthly.arrow",
+        "fund_prices_filled.panel",
+        "sp500_filled.panel",
+    ]
+    factors = data_loader.load_ff_factors(
+        ["MktRF"], "2019-01-01", "2019-01-31", "monthly"
+    )
+    assert list(factors.columns) == ["date", "MktRF", "RF"]
+    assert len(factors) == 1
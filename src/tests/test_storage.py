@@ -0,0 +1,82 @@
+import fsspec
+import pytest
+
+from src.modules.data_loader import DataLoader
+from src.modules.storage import (
+    LocalStorage,
+    MirroredStorage,
+    RemoteStorage,
+    get_storage,
+    replace_file,
+)
+
+
+def write_remote(path, content):
+    with fsspec.filesystem("memory").open(path, "wb") as f:
+        f.write(content)
+
+
+def test_local_storage(tmp_path):
+    (tmp_path / "prices.parquet").write_bytes(b"abc")
+    storage = get_storage(str(tmp_path))
+    assert isinstance(storage, LocalStorage)
+    with storage.open("prices.parquet") as f:
+        assert f.read() == b"abc"
+
+
+def test_mirror_downloads_only_changed_files(tmp_path):
+    write_remote("/market/prices.parquet", b"v1")
+    remote = RemoteStorage("memory://market/")
+    storage = MirroredStorage(remote, str(tmp_path))
+    with storage.open("prices.parquet") as f:
+        assert f.read() == b"v1"
+    mirrored = tmp_path / "prices.parquet"
+    mtime = mirrored.stat().st_mtime_ns
+
+    with storage.open("prices.parquet") as f:
+        assert f.read() == b"v1"
+    assert mirrored.stat().st_mtime_ns == mtime
+
+    write_remote("/market/prices.parquet", b"v2")
+    with storage.open("prices.parquet") as f:
+        assert f.read() == b"v2"
+
+
+def test_mirror_replaces_version_atomically(tmp_path):
+    write_remote("/atomic/prices.parquet", b"v1")
+    storage = MirroredStorage(RemoteStorage("memory://atomic/"), str(tmp_path))
+    storage.sync("prices.parquet")
+    assert sorted(i.name for i in tmp_path.iterdir()) == [
+        "prices.parquet",
+        "prices.parquet.version",
+    ]
+    version = storage.mirrored_version("prices.parquet")
+
+    def fail(f):
+        f.write(b"partial")
+        raise OSError("disk full")
+
+    with pytest.raises(OSError):
+        replace_file(str(tmp_path / "prices.parquet.version"), fail)
+    # The old version is kept whole and the temporary file removed
+    assert storage.mirrored_version("prices.parquet") == version
+    assert len(list(tmp_path.iterdir())) == 2
+
+
+def test_mirror_serves_copy_when_source_unavailable(tmp_path):
+    write_remote("/offline/prices.parquet", b"v1")
+    storage = MirroredStorage(
+        RemoteStorage("memory://offline/"), str(tmp_path)
+    )
+    storage.sync("prices.parquet")
+    fsspec.filesystem("memory").rm("/offline/prices.parquet")
+    with storage.open("prices.parquet") as f:
+        assert f.read() == b"v1"
+
+
+def test_data_loader_reads_local_storage(local_storage):
+    loader = DataLoader()
+    assert isinstance(loader.storage, LocalStorage)
+    assert loader.storage.root == local_storage.root
+    funds = loader.load_available_funds()
+    assert funds["Code"].iloc[0] == "F00000UEXJ"